@@ -0,0 +1,354 @@
+import argparse
+import bisect
+import json
+import logging
+import os
+import threading
+from datetime import datetime
+
+from checkpoint import CheckpointWriter, load_json, recover_checkpoints
+from normalized_results import iter_stored_entries
+from price_history import observation_key
+from rate_buffer import DATE_FORMAT, iter_entry_rates
+
+AGGREGATES_DIR = 'aggregates'
+STATE_FILE = 'aggregates.json'
+JOURNAL_FILE = 'observations.jsonl'
+VIEWS_FILE = 'views.json'
+FORMAT = 'aggregates/1'
+
+# Champs d'une observation, dans l'ordre où ils sont stockés
+FIELDS = ('hotel', 'room', 'city', 'check_in', 'check_out', 'nights', 'code', 'rate_class', 'currency')
+
+# Agrégats matérialisés (min, médiane, max) : nom -> champs de regroupement
+VIEWS = {
+    # Prix d'un hôtel par date d'arrivée, durée, code et classe de tarif (toutes chambres)
+    'hotel_stay': ('hotel', 'check_in', 'nights', 'code', 'rate_class', 'currency'),
+    # Prix d'une ville par code et classe de tarif (ex. meilleur tarif corporate par ville)
+    'city_code': ('city', 'code', 'rate_class', 'currency'),
+}
+
+# Couverture : observations et hôtels distincts par ville, séjour et code
+COVERAGE_FIELDS = ('city', 'check_in', 'nights', 'code')
+
+
+class SortedGroup:
+    """Prix d'un groupe, maintenus triés (insertion et suppression par bisect)"""
+
+    __slots__ = ('values',)
+
+    def __init__(self):
+        self.values = []
+
+    def add(self, value):
+        bisect.insort(self.values, value)
+
+    def remove(self, value):
+        index = bisect.bisect_left(self.values, value)
+        if index < len(self.values) and self.values[index] == value:
+            del self.values[index]
+
+    def stats(self):
+        values = self.values
+        count = len(values)
+        if not count:
+            return None
+        middle = count // 2
+        median = values[middle] if count % 2 else (values[middle - 1] + values[middle]) / 2
+        return {'count': count, 'min': values[0], 'median': median, 'max': values[-1]}
+
+
+class RateAggregates:
+    """Agrégats de prix maintenus de façon incrémentale à chaque tarif reçu
+
+    Seul le dernier prix de chaque observation (hôtel, chambre, séjour, code,
+    classe, devise) compte : un nouveau relevé remplace l'ancien prix dans tous
+    les groupes concernés. Les lectures (stats, query, coverage) ne parcourent
+    que les groupes demandés grâce à un index sur le premier champ de chaque vue.
+
+    Chaque prix modifié est ajouté au journal observations.jsonl ; l'état
+    complet (aggregates.json) n'est réécrit, et le journal vidé, qu'à save().
+    Toutes les `save_every` mises à jour, views.json est réécrit par un thread
+    dédié : le thread de sauvegarde des workers ne fait que le signaler.
+    """
+
+    def __init__(self, directory=AGGREGATES_DIR, save_every=1000, fsync_every=50):
+        self.directory = directory
+        self.state_path = os.path.join(directory, STATE_FILE)
+        self.journal_path = os.path.join(directory, JOURNAL_FILE)
+        self.views_path = os.path.join(directory, VIEWS_FILE)
+        self.save_every = save_every
+        self.fsync_every = fsync_every
+        self.checkpoint = CheckpointWriter()
+        self._lock = threading.Lock()
+        self._updates_since_save = 0
+        self._batches_since_sync = 0
+
+        self._observations = {}  # empreinte -> (champs..., prix en centimes)
+        self._groups = {view: {} for view in VIEWS}  # vue -> {clé: SortedGroup}
+        self._index = {view: {} for view in VIEWS}  # vue -> {premier champ: ensemble des clés}
+        self._coverage = {}  # ville -> {(date d'arrivée, nuits, code): [observations, ensemble des hôtels]}
+
+        os.makedirs(directory, exist_ok=True)
+        recover_checkpoints(directory)
+        state = load_json(self.state_path)
+        for key, observation in state.get('observations', {}).items():
+            self._apply(key, tuple(observation[:-1]), observation[-1])
+        # Changements postérieurs au dernier état complet (lignes tronquées ignorées)
+        complete = True
+        if os.path.exists(self.journal_path):
+            with open(self.journal_path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    complete = line.endswith('\n')
+                    try:
+                        key, *observation = json.loads(line)
+                    except ValueError:
+                        continue
+                    self._apply(key, tuple(observation[:-1]), observation[-1])
+        self._journal = open(self.journal_path, 'a', encoding='utf-8')
+        if not complete:
+            self._journal.write('\n')
+
+        # Écriture de views.json hors du thread de sauvegarde
+        self._views_due = False
+        self._views_ready = threading.Condition(self._lock)
+        self._closed = False
+        self._views_writer = None
+        if save_every:
+            self._views_writer = threading.Thread(target=self._write_views_loop, name='AggregatesViews', daemon=True)
+            self._views_writer.start()
+
+    def record_stay(self, stay, rates, seen=None):
+        """Intègre les tarifs d'un séjour (même format que PriceHistory.record_stay)
+
+        `seen` (reconstruction) associe à chaque empreinte la date du relevé
+        intégré : un relevé plus ancien est alors ignoré, quel que soit l'ordre
+        de lecture.
+        """
+        check_in = _format_date(stay['check_in'])
+        check_out = _format_date(stay['check_out'])
+        code = stay['code'] or ''
+        lines = []
+        with self._lock:
+            for rate_class, currency, price_cents in rates:
+                if price_cents is None:
+                    continue
+                label = rate_class.label
+                key = observation_key(stay['hotel'], stay['room'], check_in, check_out, code, label, currency)
+                if seen is not None:
+                    if key in seen and seen[key] > stay['scraped_at']:
+                        continue
+                    seen[key] = stay['scraped_at']
+                fields = (
+                    stay['hotel'], stay['room'], stay['city'], check_in, check_out,
+                    stay['nights'], code, label, currency
+                )
+                if self._apply(key, fields, price_cents):
+                    lines.append(json.dumps([key, *fields, price_cents], ensure_ascii=False))
+
+            if lines:
+                self._journal.write('\n'.join(lines) + '\n')
+                self._journal.flush()
+                self._batches_since_sync += 1
+                if self._batches_since_sync >= self.fsync_every:
+                    self._sync_journal()
+
+            self._updates_since_save += 1
+            if self._views_writer is not None and self._updates_since_save >= self.save_every:
+                self._views_due = True
+                self._updates_since_save = 0
+                self._views_ready.notify()
+
+    def record_entry(self, entry, seen=None):
+        """Intègre une entrée de fichier de résultats (dictionnaire avec 'Tarifs')"""
+        stay = {
+            'scraped_at': entry['Date_Scraping'],
+            'hotel': entry['Hotel'],
+            'room': entry['Chambre'],
+            'city': entry['Ville'],
+            'check_in': entry['Date_Arrivee'],
+            'check_out': entry['Date_Depart'],
+            'nights': entry['Nombre_Nuits'],
+            'code': entry.get('Code_Corporate'),
+        }
+        self.record_stay(stay, list(iter_entry_rates(entry)), seen)
+
+    def clear(self):
+        """Repart d'un état vide (reconstruction) : état, journal et vues sur disque compris"""
+        with self._lock:
+            self._observations = {}
+            self._groups = {view: {} for view in VIEWS}
+            self._index = {view: {} for view in VIEWS}
+            self._coverage = {}
+            self._views_due = False
+            self._updates_since_save = 0
+            self._journal.truncate(0)
+            for path in (self.state_path, self.views_path):
+                if os.path.exists(path):
+                    os.remove(path)
+
+    def _apply(self, key, fields, price_cents):
+        """Remplace le prix d'une observation dans toutes les vues ; retourne False s'il est inchangé"""
+        previous = self._observations.get(key)
+        if previous is not None and previous[-1] == price_cents:
+            return False
+        self._observations[key] = fields + (price_cents,)
+
+        values = dict(zip(FIELDS, fields))
+        old_values = dict(zip(FIELDS, previous)) if previous is not None else None
+        for view, group_fields in VIEWS.items():
+            if old_values is not None:
+                self._groups[view][tuple(old_values[field] for field in group_fields)].remove(previous[-1])
+            group_key = tuple(values[field] for field in group_fields)
+            group = self._groups[view].get(group_key)
+            if group is None:
+                group = self._groups[view][group_key] = SortedGroup()
+                self._index[view].setdefault(group_key[0], set()).add(group_key)
+            group.add(price_cents)
+
+        if previous is None:
+            coverage_key = tuple(values[field] for field in COVERAGE_FIELDS[1:])
+            city_coverage = self._coverage.setdefault(values['city'], {})
+            coverage = city_coverage.get(coverage_key)
+            if coverage is None:
+                coverage = city_coverage[coverage_key] = [0, set()]
+            coverage[0] += 1
+            coverage[1].add(values['hotel'])
+        return True
+
+    def stats(self, view, group_key):
+        """Min, médiane et max (en centimes) d'un groupe, ou None"""
+        with self._lock:
+            group = self._groups[view].get(tuple(group_key))
+            return group.stats() if group is not None else None
+
+    def query(self, view, first, **criteria):
+        """Groupes d'une vue dont le premier champ vaut `first`, filtrés par les autres champs
+
+        Retourne une liste de (dictionnaire des champs du groupe, statistiques).
+        """
+        fields = VIEWS[view]
+        results = []
+        with self._lock:
+            for group_key in self._index[view].get(first, ()):
+                values = dict(zip(fields, group_key))
+                stats = self._groups[view][group_key].stats()
+                if stats is not None and all(values[field] == value for field, value in criteria.items()):
+                    results.append((values, stats))
+        return results
+
+    def coverage(self, city):
+        """Couverture d'une ville : {(date d'arrivée, nuits, code): (observations, hôtels)}"""
+        with self._lock:
+            return {
+                key: (observations, len(hotels))
+                for key, (observations, hotels) in self._coverage.get(city, {}).items()
+            }
+
+    def save(self):
+        """Écrit l'état complet et les vues, puis vide le journal"""
+        with self._lock:
+            self.checkpoint.write_json(self.state_path, {
+                'format': FORMAT,
+                'observations': {key: list(observation) for key, observation in self._observations.items()}
+            })
+            self.checkpoint.write_json(self.views_path, self._views_snapshot())
+            self.checkpoint.sync()
+            # Le journal est rejouable sur l'état complet : le vider seulement une fois l'état durable
+            self._journal.truncate(0)
+            self._sync_journal()
+            self._views_due = False
+            self._updates_since_save = 0
+
+    def close(self):
+        """Arrête le thread des vues et écrit l'état final"""
+        with self._lock:
+            self._closed = True
+            self._views_ready.notify()
+        if self._views_writer is not None:
+            self._views_writer.join()
+        self.save()
+        self._journal.close()
+
+    def _views_snapshot(self):
+        """Copie des vues matérialisées pour les lecteurs (appelée sous le verrou)"""
+        views = {
+            view: [list(group_key) + [group.stats()] for group_key, group in groups.items() if group.values]
+            for view, groups in self._groups.items()
+        }
+        views['coverage'] = [
+            [city, *key, observations, len(hotels)]
+            for city, city_coverage in self._coverage.items()
+            for key, (observations, hotels) in city_coverage.items()
+        ]
+        return {'format': FORMAT, 'fields': VIEWS, 'views': views}
+
+    def _write_views_loop(self):
+        while True:
+            with self._lock:
+                while not self._views_due and not self._closed:
+                    self._views_ready.wait()
+                if self._closed:
+                    return
+                # Copie sous le verrou, sérialisation et écriture hors verrou
+                views = self._views_snapshot()
+                self._views_due = False
+            try:
+                self.checkpoint.write_json(self.views_path, views)
+            except Exception as e:
+                logging.error(f"Erreur écriture des vues agrégées: {str(e)}")
+
+    def _sync_journal(self):
+        try:
+            os.fsync(self._journal.fileno())
+        except OSError as e:
+            logging.error(f"Erreur fsync journal des agrégats: {str(e)}")
+        self._batches_since_sync = 0
+
+    def __len__(self):
+        return len(self._observations)
+
+
+def _format_date(value):
+    return value if isinstance(value, str) else value.strftime(DATE_FORMAT)
+
+
+def rebuild(aggregates, directories):
+    """Reconstruit les agrégats à partir de zéro, un fichier de résultats en mémoire à la fois
+
+    Pour chaque observation, le relevé le plus récent l'emporte quel que soit
+    l'ordre des fichiers.
+    """
+    aggregates.clear()
+    seen = {}  # empreinte -> date du relevé retenu
+    for directory in directories:
+        for filename in sorted(os.listdir(directory)):
+            if filename.endswith('.json'):
+                for entry in iter_stored_entries(load_json(os.path.join(directory, filename))):
+                    aggregates.record_entry(entry, seen)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    parser = argparse.ArgumentParser(description="Agrégats de prix matérialisés")
+    parser.add_argument('--rebuild', nargs='*', metavar='DOSSIER',
+                        help="Reconstruire à partir des dossiers scraping_results_* (tous si aucun)")
+    parser.add_argument('--directory', default=AGGREGATES_DIR)
+    parser.add_argument('--view', choices=sorted(VIEWS), default='city_code')
+    parser.add_argument('--first', help="Valeur du premier champ de la vue (ex. ville ou hôtel)")
+    args = parser.parse_args()
+
+    aggregates = RateAggregates(args.directory, save_every=0)
+    if args.rebuild is not None:
+        start = datetime.now()
+        directories = args.rebuild or sorted(
+            item for item in os.listdir('.') if os.path.isdir(item) and item.startswith('scraping_results')
+        )
+        rebuild(aggregates, directories)
+        logging.info(f"{len(aggregates)} observations agrégées en {(datetime.now() - start).total_seconds():.1f} s")
+
+    if args.first:
+        for values, stats in sorted(aggregates.query(args.view, args.first), key=lambda item: list(item[0].values())):
+            print(' | '.join(str(value) for value in values.values()), stats)
+    aggregates.close()
@@ -7,17 +7,10 @@ from selenium.common.exceptions import TimeoutException, NoSuchElementException
 from datetime import datetime, timedelta
 import pandas as pd
 import time
-import json
+import os
+from checkpoint import CheckpointWriter, recover_checkpoints
+from log_setup import setup_logging
 
-# Configuration du logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('scraping.log'),
-        logging.StreamHandler()
-    ]
-)
 
 class IHGScraper:
     def __init__(self):
@@ -37,6 +30,7 @@ class IHGScraper:
             'UPS': '108146'
         }
         self.output_file = f"ihg_scraping_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+        self.checkpoint = CheckpointWriter()
 
     def setup_driver(self):
         """Configure le webdriver Chrome"""
@@ -191,7 +185,7 @@ class IHGScraper:
                 'Petit_Dejeuner': breakfast,
                 'Prix': {}
             }
-            logging.info(f"Nouvelle entrée créée pour {room_name} dans {hotel_name}")
+            logging.debug(f"Nouvelle entrée créée pour {room_name} dans {hotel_name}")
         
         # Ajout ou mise à jour du prix pour la devise et le code corporate
         price_key = f"{currency}"
@@ -205,7 +199,7 @@ class IHGScraper:
             'Code_Corporate': corporate_code
         }
         
-        logging.info(f"Prix mis à jour pour {room_name}: {price} {currency} {corporate_name if corporate_name else 'sans code corporate'}")
+        logging.debug(f"Prix mis à jour pour {room_name}: {price} {currency} {corporate_name if corporate_name else 'sans code corporate'}")
 
     def scrape_rooms(self, hotel_name, hotel_chain, currency, corporate_name, corporate_code):
         try:
@@ -308,8 +302,8 @@ class IHGScraper:
     def save_data(self):
         """Sauvegarde les données dans un fichier JSON unique"""
         try:
-            with open(self.output_file, 'w', encoding='utf-8') as f:
-                json.dump(self.data, f, ensure_ascii=False, indent=4)
+            # Écriture atomique avec fsync groupés
+            self.checkpoint.write_json(self.output_file, self.data, indent=4)
             logging.info(f"Données mises à jour dans {self.output_file}")
         except Exception as e:
             logging.error(f"Erreur lors de la sauvegarde des données: {str(e)}")
@@ -317,6 +311,8 @@ class IHGScraper:
     def run(self):
         """Exécute le scraping complet"""
         try:
+            # Réparer les écritures interrompues d'une exécution précédente
+            recover_checkpoints(os.path.dirname(os.path.abspath(self.output_file)))
             self.setup_driver()
             
             cities = ["paris", "london", "berlin"]  # etc...
@@ -357,10 +353,13 @@ class IHGScraper:
         except Exception as e:
             logging.error(f"Erreur lors de l'exécution: {str(e)}")
         finally:
+            self.checkpoint.sync()
             if self.driver:
                 self.driver.quit()
                 logging.info("Driver fermé")
 
 if __name__ == "__main__":
+    # Journal JSON asynchrone (le détail par prix est au niveau DEBUG : SCRAPING_LOG_LEVELS=app=DEBUG)
+    setup_logging('scraping.jsonl')
     scraper = IHGScraper()
     scraper.run()
@@ -7,24 +7,25 @@ from selenium.common.exceptions import TimeoutException, NoSuchElementException
 from datetime import datetime, timedelta
 import pandas as pd
 import time
-import json
 from concurrent.futures import ThreadPoolExecutor
 import queue
 import threading
 import os
 from tqdm import tqdm
-
-# Désactiver TOUS les loggers
-logging.getLogger().handlers = []
-logging.getLogger().addHandler(logging.NullHandler())
-logging.getLogger().propagate = False
-
-# Désactiver les logs Selenium et autres
-for log_name in ['selenium', 'urllib3', 'requests', 'error_logger']:
-    logger = logging.getLogger(log_name)
-    logger.propagate = False
-    logger.setLevel(logging.CRITICAL)
-    logger.handlers = []
+from rate_buffer import RateBuffer, price_to_cents
+from rate_class import RateClass
+from checkpoint import CheckpointWriter, load_json, recover_run_directories
+from price_history import PriceHistory
+from aggregates import RateAggregates
+from metrics import METRICS
+from driver_profiler import profiler_from_env
+from walltime_profiler import wall_section, wall_track, walltime_profiler_from_env
+from status_server import StatusBoard, StatusLogHandler, start_status_server
+from log_setup import logging_configured, setup_logging
+from chrome_sampler import ChromeSampler, RecyclePolicy
+from page_snapshots import recorder_from_env
+from task_journal import DONE, FAILED, TaskJournal, is_dead_code
+from normalized_results import iter_stored_entries, split_stay_rates, to_document
 
 class ScrapingTask:
     def __init__(self, city, check_in_date, duration, corporate_info=None):
@@ -39,14 +40,35 @@ class ScrapingTask:
         return f"{self.city} - {self.check_in_date.strftime('%Y-%m-%d')} ({self.duration}j){corporate_str}"
 
 class ScrapingWorker:
-    def __init__(self, worker_id, task_queue, output_dir):
+    # Racine du site scrapé (IHG_BASE_URL permet de viser le site factice mock_ihg_site.py)
+    base_url = os.environ.get('IHG_BASE_URL', 'https://www.ihg.com').rstrip('/')
+    # Réécriture complète d'un fichier de résultats au plus toutes les N chambres ou T secondes
+    results_write_every = 20
+    results_write_interval = 30.0
+    # Chambres en attente de sauvegarde au-delà desquelles le scraping attend le thread de sauvegarde
+    save_queue_size = 200
+
+    def __init__(self, worker_id, task_queue, output_dir, price_history=None, aggregates=None, driver_profiler=None,
+                 wall_profiler=None, status=None, snapshots=None, error_log='error.log', task_journal=None):
         self.worker_id = worker_id
         self.task_queue = task_queue
         self.output_dir = output_dir
+        self.price_history = price_history  # Historique partagé des changements de prix
+        self.aggregates = aggregates  # Agrégats matérialisés partagés (min, médiane, max)
+        self.driver_profiler = driver_profiler  # Profilage optionnel des commandes WebDriver
+        self.wall_profiler = wall_profiler  # Ventilation optionnelle du temps réel (pauses, attentes...)
+        self.status = status  # Tableau de suivi du run (StatusBoard), alimenté sans blocage
+        self.snapshots = snapshots  # Enregistreur optionnel d'instantanés DOM (rejeu hors ligne)
+        self.task_journal = task_journal  # Journal partagé des tâches tentées (élimination des codes inactifs)
+        self.task_counts = self._new_task_counts()  # Relevés de la tâche courante, pour le journal
+        self.current_hotel = None  # Hôtel en cours, pour attribuer les commandes WebDriver
         self.driver = None
-        self.data = {}
-        self.save_queue = queue.Queue()
+        self.browser_sampler = None  # Ressources du navigateur courant (RSS, CPU, tas JS)
+        self.recycle_policy = RecyclePolicy.from_env()  # Seuils de relance du navigateur entre deux tâches
+        self.save_queue = queue.Queue(maxsize=self.save_queue_size)
         self.save_worker = None
+        self.checkpoint = CheckpointWriter()
+        self.metric_labels = {'worker': str(worker_id)}  # Étiquettes des mesures de la tâche courante
         
         # Configurer les options Chrome pour plus de stabilité
         self.chrome_options = webdriver.ChromeOptions()
@@ -84,11 +106,13 @@ class ScrapingWorker:
         # Configuration du logging des erreurs
         error_logger = logging.getLogger('error_logger')
         error_logger.setLevel(logging.ERROR)
-        error_logger.propagate = False  # Empêcher la propagation vers le logger parent
+        # Avec la journalisation asynchrone (log_setup), les erreurs rejoignent le journal JSON ;
+        # sans fichier d'erreurs (error_log=None : rejeu, outils), elles remontent au logger racine
+        error_logger.propagate = logging_configured() or error_log is None
         
-        # Vérifier si le logger a déjà des handlers pour éviter les doublons
-        if not error_logger.handlers:
-            error_handler = logging.FileHandler('error.log')
+        # Vérifier si le logger a déjà son fichier pour éviter les doublons
+        if error_log and not logging_configured() and not any(isinstance(handler, logging.FileHandler) for handler in error_logger.handlers):
+            error_handler = logging.FileHandler(error_log)
             error_handler.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
             error_logger.addHandler(error_handler)
         
@@ -112,6 +136,10 @@ class ScrapingWorker:
 
     def start(self):
         """Démarre le worker avec gestion des redémarrages"""
+        with wall_track(self.wall_profiler):
+            self._run_tasks()
+
+    def _run_tasks(self):
         # Supprimer ce logging.info
         # logging.info(f"Démarrage du Worker {self.worker_id}")
         
@@ -132,20 +160,25 @@ class ScrapingWorker:
                     self.driver.quit()
                     time.sleep(2)
                 
-                self.driver = webdriver.Chrome(options=self.chrome_options)
-                self.driver.set_page_load_timeout(30)
-                self.driver.set_window_size(1366, 768)
-                time.sleep(2)
+                self._create_driver()
                 
                 while True:
                     try:
                         task = self.task_queue.get_nowait()
                         tasks_processed += 1
+                        self._post_status('task_started', task=str(task), city=task.city)
+                        logging.info(f"Worker {self.worker_id} - Tâche {tasks_processed}: {task}")
                         self._init_progress_bar(task)
+                        self.task_counts = self._new_task_counts()
                         
                         try:
-                            self._process_task(task)
+                            self.metric_labels = {'city': task.city, 'worker': str(self.worker_id)}
+                            with METRICS.timer('task', **self.metric_labels):
+                                self._process_task(task)
                         except Exception as e:
+                            METRICS.inc('task_errors', **self.metric_labels)
+                            self._post_status('task_failed')
+                            self._record_task(task, FAILED)
                             if "DevTools" in str(e):
                                 self._clear_browser_data()
                                 self.error_logger.error(f"Worker {self.worker_id} - Erreur DevTools: {str(e)}")
@@ -155,6 +188,9 @@ class ScrapingWorker:
                             continue
                         
                         self.task_queue.task_done()
+                        self._post_status('task_done')
+                        self._record_task(task, DONE)
+                        self._check_browser_resources()
                         
                     except queue.Empty:
                         break
@@ -175,8 +211,31 @@ class ScrapingWorker:
         
         if self.pbar:
             self.pbar.close()
-        self.save_queue.put(None)
-        self.save_worker.join()
+        with wall_section(self.wall_profiler, 'save_queue'):
+            self.save_queue.put(None)
+            self.save_worker.join()
+        self._post_status('worker_stopped')
+
+    def _post_status(self, event, **fields):
+        """Signale un événement au tableau de suivi (dépôt dans une queue, jamais bloquant)"""
+        if self.status is not None:
+            self.status.post(self.worker_id, event, **fields)
+
+    @staticmethod
+    def _new_task_counts():
+        return {'hotels': set(), 'rooms': 0, 'corporate_rates': 0}
+
+    def _record_task(self, task, status):
+        """Consigne l'issue d'une tentative au journal des tâches : seule une tentative relevée compte"""
+        if self.task_journal is not None:
+            counts = self.task_counts
+            self.task_journal.record(task, status, len(counts['hotels']), counts['rooms'], counts['corporate_rates'],
+                                     self.worker_id)
+
+    def _record_snapshot(self, kind, task, currency=None, hotel=None):
+        """Enregistre le DOM courant pour le rejeu hors ligne (si l'enregistrement est activé)"""
+        if self.snapshots is not None:
+            self.snapshots.record(self.driver, kind, task, currency, hotel, self.worker_id)
 
     def _process_task(self, task):
         """Traite une tâche de scraping"""
@@ -216,52 +275,112 @@ class ScrapingWorker:
             pass
         finally:
             time.sleep(2)
-            self.driver = webdriver.Chrome(options=self.chrome_options)
-            self.driver.set_page_load_timeout(30)
-            self.driver.set_window_size(1366, 768)
-            time.sleep(2)
+            self._create_driver()
+
+    def _create_driver(self):
+        """Lance un nouveau navigateur (profilé si un DriverProfiler est fourni)"""
+        self.driver = webdriver.Chrome(options=self.chrome_options)
+        if self.driver_profiler is not None:
+            self.driver_profiler.attach(self.driver)
+        if self.wall_profiler is not None:
+            self.wall_profiler.attach(self.driver)
+        self.driver.set_page_load_timeout(30)
+        self.driver.set_window_size(1366, 768)
+        self.browser_sampler = ChromeSampler(self.driver)
+        time.sleep(2)
+
+    def _check_browser_resources(self):
+        """Échantillonne le navigateur après une tâche et le relance s'il dépasse un seuil"""
+        if self.browser_sampler is None:
+            return
+        self.browser_sampler.task_done()
+        sample = self.browser_sampler.sample()
+        self._post_status('browser_sample', sample=sample)
+        
+        reasons = self.recycle_policy.reasons(sample)
+        if not reasons:
+            return
+        logging.info(f"Worker {self.worker_id} - Relance du navigateur ({', '.join(reasons)}): {sample}")
+        for reason in reasons:
+            METRICS.inc('browser_recycles', reason=reason.split('>')[0], worker=str(self.worker_id))
+        self._post_status('browser_recycled', reasons=reasons)
+        self._restart_browser()
 
     def _save_worker_task(self):
         """Worker dédié à la sauvegarde"""
-        current_data = {}  # Dictionnaire pour stocker les données courantes
+        buffers = {}  # Un buffer colonnaire par fichier de sortie
+        unsaved = {}  # Fichier de sortie -> (chambres non écrites, date de la dernière écriture)
         
         while True:
             try:
-                data = self.save_queue.get()
+                data = self.save_queue.get(timeout=self.results_write_interval)
+            except queue.Empty:
+                # Pas de nouvelle chambre : écrire ce qui attend depuis trop longtemps
+                self._write_results(buffers, unsaved, due_only=True)
+                continue
+            try:
                 if data is None:  # Signal de fin
                     break
                 
                 city = data['city']
+                labels = {'city': city, 'worker': str(self.worker_id)}
+                save_started = time.perf_counter()
+                METRICS.observe('save_queue_delay', save_started - data['enqueued_at'], **labels)
                 output_file = os.path.join(self.output_dir, f"{city}_worker_{self.worker_id}.json")
                 
-                # Charger les données existantes
-                if os.path.exists(output_file):
-                    try:
-                        with open(output_file, 'r', encoding='utf-8') as f:
-                            current_data = json.load(f)
-                    except:
-                        current_data = {}
-                
-                # Pour chaque nouvelle entrée
-                for entry_key, entry_data in data['data'].items():
-                    if entry_key not in current_data:
-                        current_data[entry_key] = entry_data
-                    else:
-                        # Si l'entrée existe, mettre à jour les tarifs sans écraser
-                        for tarif_key, tarif_price in entry_data['Tarifs'].items():
-                            current_data[entry_key]['Tarifs'][tarif_key] = tarif_price
-                
-                # Sauvegarder avec un verrou pour éviter les conflits
-                with threading.Lock():
-                    with open(output_file, 'w', encoding='utf-8') as f:
-                        json.dump(current_data, f, ensure_ascii=False, indent=4)
-                    logging.info(f"Sauvegarde effectuée pour {city} - Worker {self.worker_id} - {len(current_data[entry_key]['Tarifs'])} tarifs")
+                # Charger les données existantes une seule fois par fichier
+                buffer = buffers.get(output_file)
+                if buffer is None:
+                    # Un fichier illisible est mis de côté plutôt que silencieusement écrasé
+                    buffer = RateBuffer.from_entries(iter_stored_entries(load_json(output_file)))
+                    buffers[output_file] = buffer
+                
+                # Les tarifs publics d'une tâche corporate sont rattachés au séjour public
+                for stay, rates in split_stay_rates(data['stay'], data['rates']):
+                    # Ajouter les nouveaux tarifs (les métadonnées du séjour existant sont conservées)
+                    stay_id = buffer.add_stay(**stay)
+                    for rate_class, currency, price_cents in rates:
+                        buffer.add_rate(stay_id, rate_class, currency, price_cents)
+                    
+                    # N'ajouter à l'historique que les prix qui ont changé
+                    if self.price_history is not None:
+                        self.price_history.record_stay(stay, rates)
+                    if self.aggregates is not None:
+                        self.aggregates.record_stay(stay, rates)
+                
+                # Le fichier complet n'est réécrit que toutes les `results_write_every` chambres ou
+                # `results_write_interval` secondes : les changements de prix sont déjà dans l'historique
+                pending, last_write = unsaved.get(output_file, (0, time.monotonic()))
+                unsaved[output_file] = (pending + 1, last_write)
+                self._write_results(buffers, unsaved, due_only=True)
+                METRICS.observe('save', time.perf_counter() - save_started, **labels)
                 
             except Exception as e:
                 logging.error(f"Erreur sauvegarde worker {self.worker_id}: {str(e)}")
             finally:
                 if data is not None:  # Ne pas faire task_done sur le signal de fin
                     self.save_queue.task_done()
+        
+        # Écrire les chambres restantes et rendre durables les dernières écritures
+        self._write_results(buffers, unsaved, due_only=False)
+        self.checkpoint.sync()
+
+    def _write_results(self, buffers, unsaved, due_only):
+        """Réécrit les fichiers de résultats ayant des chambres non écrites (seulement ceux dus si `due_only`)"""
+        now = time.monotonic()
+        for output_file, (pending, last_write) in list(unsaved.items()):
+            if not pending:
+                continue
+            if due_only and pending < self.results_write_every and now - last_write < self.results_write_interval:
+                continue
+            try:
+                # Écriture atomique : un arrêt brutal ne laisse jamais de fichier tronqué
+                self.checkpoint.write_json(output_file, to_document(buffers[output_file].to_entries()), indent=4)
+                unsaved[output_file] = (0, now)
+                logging.debug(f"Sauvegarde effectuée pour {os.path.basename(output_file)} - Worker {self.worker_id} - "
+                             f"{len(buffers[output_file])} tarifs")
+            except Exception as e:
+                logging.error(f"Erreur sauvegarde worker {self.worker_id} ({output_file}): {str(e)}")
 
     def _scrape_with_currency(self, task):
         """Scrape les données pour les deux devises en un seul passage"""
@@ -270,8 +389,10 @@ class ScrapingWorker:
             url = self._generate_url(task)
             
             # Naviguer vers l'URL
-            self.driver.get(url)
-            self._accept_cookies()
+            with METRICS.timer('navigation', **self.metric_labels):
+                self.driver.get(url)
+            with METRICS.timer('accept_cookies', **self.metric_labels):
+                self._accept_cookies()
             
             # Scraper la liste d'hôtels
             self._scrape_hotel_list(task)
@@ -284,7 +405,7 @@ class ScrapingWorker:
         ci_month = str(task.check_in_date.month - 1).zfill(2)
         co_month = str(task.check_out_date.month - 1).zfill(2)
         
-        base_url = "https://www.ihg.com/hotels/fr/fr/find-hotels/hotel-search"
+        base_url = f"{self.base_url}/hotels/fr/fr/find-hotels/hotel-search"
         url = f"{base_url}?qDest={task.city}&qCiD={task.check_in_date.day}&qCoD={task.check_out_date.day}"
         url += f"&qCiMy={ci_month}{task.check_in_date.year}&qCoMy={co_month}{task.check_out_date.year}"
         url += "&qAdlt=1&qChld=0&qRms=1"
@@ -408,7 +529,9 @@ class ScrapingWorker:
             )
             time.sleep(2)
             
-            hotels_found = self._scroll_and_count_hotels()
+            with METRICS.timer('scroll_and_count_hotels', **self.metric_labels):
+                hotels_found = self._scroll_and_count_hotels()
+            self._record_snapshot('hotel_list', task)
             if hotels_found == 0:
                 self._update_progress(0, "Aucun hôtel trouvé")
                 return
@@ -416,17 +539,22 @@ class ScrapingWorker:
             progress_step = 100 / hotels_found
             
             for index in range(hotels_found):
+                self.current_hotel = None
                 try:
                     if index > 0:
-                        self.driver.back()
-                        time.sleep(2)
-                        self._scroll_to_hotel(index)
+                        with METRICS.timer('back_to_list', **self.metric_labels):
+                            self.driver.back()
+                            time.sleep(2)
+                            self._scroll_to_hotel(index)
                     
                     hotel_cards = self.driver.find_elements(By.CLASS_NAME, "hotel-card-list-view-container")
                     if index < len(hotel_cards):
                         current_card = hotel_cards[index]
                         try:
-                            self._scrape_hotel(current_card, task)
+                            with METRICS.timer('hotel', **self.metric_labels):
+                                self._scrape_hotel(current_card, task)
+                            METRICS.inc('hotels', **self.metric_labels)
+                            self._post_status('hotel_done')
                         except Exception as e:
                             self._update_progress((index + 1) * progress_step, f"Erreur hôtel {index + 1}: {str(e)}")
                             continue
@@ -483,6 +611,8 @@ class ScrapingWorker:
             try:
                 # Extraire les informations avant de cliquer
                 hotel_name = hotel_card.find_element(By.CSS_SELECTOR, "[data-slnm-ihg='brandHotelNameSID']").text
+                self.current_hotel = hotel_name
+                self._post_status('hotel_started', hotel=hotel_name)
                 hotel_chain = hotel_name.split()[0]
                 
                 # Faire défiler jusqu'à l'hôtel
@@ -503,9 +633,12 @@ class ScrapingWorker:
                 
                 try:
                     # 1. Sélectionner explicitement EUR et scraper
-                    self._change_currency('EUR')
+                    with METRICS.timer('change_currency', **self.metric_labels):
+                        self._change_currency('EUR')
                     time.sleep(1)
-                    self._scrape_rooms(hotel_name, hotel_chain, task, 'EUR', first_currency=True)
+                    with METRICS.timer('scrape_rooms', **self.metric_labels):
+                        self._scrape_rooms(hotel_name, hotel_chain, task, 'EUR', first_currency=True)
+                    self._record_snapshot('rooms', task, 'EUR', hotel_name)
                 except Exception as e:
                     self.error_logger.error(f"Worker {self.worker_id} - Erreur EUR: {str(e)}")
                 
@@ -520,9 +653,12 @@ class ScrapingWorker:
                     )
                     
                     # 4. Changer en USD et scraper
-                    self._change_currency('USD')
+                    with METRICS.timer('change_currency', **self.metric_labels):
+                        self._change_currency('USD')
                     time.sleep(1)
-                    self._scrape_rooms(hotel_name, hotel_chain, task, 'USD', first_currency=True)
+                    with METRICS.timer('scrape_rooms', **self.metric_labels):
+                        self._scrape_rooms(hotel_name, hotel_chain, task, 'USD', first_currency=True)
+                    self._record_snapshot('rooms', task, 'USD', hotel_name)
                 except Exception as e:
                     self.error_logger.error(f"Worker {self.worker_id} - Erreur USD: {str(e)}")
                 
@@ -583,6 +719,7 @@ class ScrapingWorker:
                         task=task,
                         currency=currency
                     )
+                    METRICS.inc('rooms', **self.metric_labels)
                     
                 except Exception as e:
                     self.error_logger.error(f"Worker {self.worker_id} - Erreur chambre {i+1}: {str(e)}")
@@ -666,48 +803,45 @@ class ScrapingWorker:
 
     def _save_rates_batch(self, hotel_name, hotel_chain, room_name, rates, task):
         """Sauvegarde un lot de tarifs"""
-        entry_key = (
-            f"{hotel_name}|{room_name}|"
-            f"{task.check_in_date.strftime('%Y-%m-%d')}|"
-            f"{task.check_out_date.strftime('%Y-%m-%d')}|"
-            f"{task.duration}"
-        )
+        stay = {
+            'scraped_at': datetime.now(),
+            'hotel': hotel_name,
+            'chain': hotel_chain,
+            'room': room_name,
+            'company': task.corporate_info[0] if task.corporate_info else None,
+            'code': task.corporate_info[1] if task.corporate_info else None,
+            'city': task.city,
+            'country': self._get_country_from_city(task.city),
+            'check_in': task.check_in_date,
+            'check_out': task.check_out_date,
+            'nights': task.duration
+        }
         
-        # Initialiser l'entrée si elle n'existe pas
-        if entry_key not in self.data:
-            self.data[entry_key] = {
-                'Date_Scraping': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-                'Hotel': hotel_name,
-                'Chaine': hotel_chain,
-                'Chambre': room_name,
-                'Entreprise_Cliente': task.corporate_info[0] if task.corporate_info else None,
-                'Code_Corporate': task.corporate_info[1] if task.corporate_info else None,
-                'Ville': task.city,
-                'Pays': self._get_country_from_city(task.city),
-                'Date_Arrivee': task.check_in_date.strftime('%Y-%m-%d'),
-                'Date_Depart': task.check_out_date.strftime('%Y-%m-%d'),
-                'Nombre_Nuits': task.duration,
-                'Tarifs': {}
-            }
-        
-        # Ajouter tous les tarifs
+        # Classer chaque tarif et convertir le prix en centimes une seule fois, au scraping
+        batch = []
         for rate in rates:
-            # Construire la clé du tarif
-            if rate['is_corporate']:
-                tarif_key = f"Tarif corporate (GOLD){' avec petit déjeuner' if rate['has_breakfast'] else ''} - {rate['currency']}"
-            else:
-                prefix = "REMISE MEMBRE" if rate['is_member'] else "SANS REMISE"
-                suffix = "Annulation gratuite" if "Annulation gratuite" in rate['rate_name'] else "Non remboursable"
-                tarif_key = f"{prefix} - {suffix}{' avec petit déjeuner' if rate['has_breakfast'] else ''} - {rate['currency']}"
-            
-            # Ajouter le tarif
-            self.data[entry_key]['Tarifs'][tarif_key] = rate['price'].replace('€', '').replace('$', '').strip()
+            rate_class = RateClass.from_scrape(
+                is_member=rate['is_member'],
+                is_corporate=rate['is_corporate'],
+                rate_name=rate['rate_name'],
+                has_breakfast=rate['has_breakfast']
+            )
+            batch.append((rate_class, rate['currency'], price_to_cents(rate['price'])))
         
-        # Envoyer les données au worker de sauvegarde
-        self.save_queue.put({
-            'city': task.city,
-            'data': self.data
-        })
+        METRICS.inc('rates', len(batch), **self.metric_labels)
+        self._post_status('rates', count=len(batch))
+        self.task_counts['hotels'].add(hotel_name)
+        self.task_counts['rooms'] += 1
+        self.task_counts['corporate_rates'] += sum(rate_class.corporate for rate_class, _, _ in batch)
+        
+        # Envoyer uniquement le lot courant au worker de sauvegarde (bloque si la file est pleine)
+        with wall_section(self.wall_profiler, 'save_queue'):
+            self.save_queue.put({
+                'city': task.city,
+                'stay': stay,
+                'rates': batch,
+                'enqueued_at': time.perf_counter()
+            })
 
     def _get_country_from_city(self, city):
         """Retourne le pays correspondant à la ville"""
@@ -733,22 +867,17 @@ class ScrapingWorker:
 
     def _clear_browser_data(self):
         """Nettoie le cache et la mémoire du navigateur"""
+        if not self.driver:
+            return
         try:
-            if self.driver:
-                # Exécuter le garbage collector
-                self.driver.execute_script("window.gc();")
-                
-                # Nettoyer le cache et le stockage
-                self.driver.execute_cdp_cmd('Network.clearBrowserCache', {})
-                self.driver.execute_cdp_cmd('Network.clearBrowserCookies', {})
-                
-                # Libérer la mémoire
-                self.driver.execute_script("""
-                    window.performance.memory && window.performance.memory.usedJSHeapSize = 0;
-                    window.performance.memory && window.performance.memory.totalJSHeapSize = 0;
-                """)
-        except:
-            pass
+            # Ramasse-miettes de V8 via CDP (window.gc() n'existe qu'avec --js-flags=--expose-gc)
+            self.driver.execute_cdp_cmd('HeapProfiler.collectGarbage', {})
+            
+            # Nettoyer le cache et le stockage
+            self.driver.execute_cdp_cmd('Network.clearBrowserCache', {})
+            self.driver.execute_cdp_cmd('Network.clearBrowserCookies', {})
+        except Exception as e:
+            self.error_logger.error(f"Worker {self.worker_id} - Erreur nettoyage navigateur: {str(e)}")
 
     def _init_progress_bar(self, task):
         """Initialise la barre de progression pour une tâche"""
@@ -846,6 +975,9 @@ class IHGScraper:
             'new york'
         ]
         
+        # Codes sans tarif corporate par ville (voir corporate_analytics.py)
+        self.dead_codes = load_json('dead_corporate_codes.json', default={})
+        
         # Création du dossier de résultats
         self.output_dir = f"scraping_results_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
         os.makedirs(self.output_dir, exist_ok=True)
@@ -862,12 +994,23 @@ class IHGScraper:
                     # Sélectionner seulement 5 entreprises importantes
                     important_companies = list(self.corporate_codes.items())[:5]
                     for company, code in important_companies:
+                        if is_dead_code(self.dead_codes, city, code):
+                            continue
                         tasks.append(ScrapingTask(city, date, duration, (company, code)))
         return tasks
 
     def run(self):
         """Exécute le scraping"""
         try:
+            # Réparer les écritures interrompues des exécutions précédentes (le dossier du run est neuf)
+            recover_run_directories('scraping_results_*', exclude=self.output_dir)
+            price_history = PriceHistory()
+            aggregates = RateAggregates()
+            driver_profiler = profiler_from_env()
+            wall_profiler = walltime_profiler_from_env()
+            snapshots = recorder_from_env()
+            task_journal = TaskJournal(self.output_dir)
+            
             # Créer la queue de tâches
             task_queue = queue.Queue()
             tasks = self.create_tasks()
@@ -895,12 +1038,19 @@ class IHGScraper:
             for task in tasks:
                 task_queue.put(task)
             
+            # Suivi en direct : GET http://127.0.0.1:8091/status (SCRAPING_STATUS_PORT=0 pour désactiver)
+            status = StatusBoard(task_queue, len(tasks))
+            status_handler = StatusLogHandler(status)
+            logging.getLogger('error_logger').addHandler(status_handler)
+            status_server = start_status_server(status)
+            
             logging.info(f"Démarrage de {self.num_workers} workers")
             
             # Créer et démarrer les workers
             workers = []
             for i in range(self.num_workers):
-                worker = ScrapingWorker(i, task_queue, self.output_dir)
+                worker = ScrapingWorker(i, task_queue, self.output_dir, price_history, aggregates,
+                                        driver_profiler, wall_profiler, status, snapshots, task_journal=task_journal)
                 thread = threading.Thread(
                     target=worker.start,
                     name=f"ScrapeWorker-{i}"
@@ -911,12 +1061,41 @@ class IHGScraper:
             # Attendre que tous les workers terminent
             for worker in workers:
                 worker.join()
-                
+            
+            logging.getLogger('error_logger').removeHandler(status_handler)
+            if status_server is not None:
+                status_server.shutdown()
+            status.close()
+            final_status = status.snapshot()
+            logging.info(f"Tâches terminées: {final_status['tasks']['done']}, échecs: {final_status['tasks']['failed']}, "
+                         f"hôtels: {final_status['hotels']['done']}, erreurs: {final_status['errors']['total']}")
+            
+            price_history.close()
+            aggregates.close()
+            
+            # Exporter les mesures de latence et les compteurs du run
+            metrics_name = os.path.join('metrics', os.path.basename(self.output_dir))
+            METRICS.write_prometheus(f"{metrics_name}.prom")
+            METRICS.write_json(f"{metrics_name}.json")
+            logging.info(f"Métriques écrites dans {metrics_name}.prom et {metrics_name}.json")
+            if driver_profiler is not None:
+                driver_profiler.write_report(f"{metrics_name}_driver")
+                logging.info(f"Profil des commandes WebDriver écrit dans {metrics_name}_driver.txt")
+            if wall_profiler is not None:
+                wall_profiler.uninstall()
+                wall_profiler.write_report(f"{metrics_name}_walltime")
+                logging.info(f"Ventilation du temps réel écrite dans {metrics_name}_walltime.txt")
+            if snapshots is not None:
+                logging.info(f"{snapshots.recorded} instantanés DOM enregistrés dans {snapshots.directory}")
+            logging.info(f"Historique des prix: {price_history.events_written} changements "
+                         f"sur {price_history.observations} observations")
             logging.info("Scraping terminé avec succès")
             
         except Exception as e:
             logging.error(f"Erreur lors de l'exécution: {str(e)}")
 
 if __name__ == "__main__":
+    # Journal JSON asynchrone, erreurs aussi dans errors.jsonl ; la console reste aux barres de progression
+    setup_logging('scraping_workers.jsonl', console_level=None, error_file='errors.jsonl')
     scraper = IHGScraper()
     scraper.run()
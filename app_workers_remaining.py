@@ -10,16 +10,7 @@ import json
 import queue
 import threading
 import os
-
-# Configuration du logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('scraping_remaining.log'),
-        logging.StreamHandler()
-    ]
-)
+from log_setup import setup_logging
 
 # Copier toutes les classes de app_workers.py ici
 class ScrapingTask:
@@ -160,7 +151,7 @@ class ScrapingWorker:
                 with threading.Lock():
                     with open(output_file, 'w', encoding='utf-8') as f:
                         json.dump(current_data, f, ensure_ascii=False, indent=4)
-                    logging.info(f"Sauvegarde effectuée pour {city} - Worker {self.worker_id} - {len(current_data[entry_key]['Tarifs'])} tarifs")
+                    logging.debug(f"Sauvegarde effectuée pour {city} - Worker {self.worker_id} - {len(current_data[entry_key]['Tarifs'])} tarifs")
                 
             except Exception as e:
                 logging.error(f"Erreur sauvegarde worker {self.worker_id}: {str(e)}")
@@ -479,7 +470,7 @@ class ScrapingWorker:
             
             # Trouver tous les tarifs
             rate_cards = room.find_elements(By.CSS_SELECTOR, "app-rate-card")
-            logging.info(f"Nombre de tarifs trouvés: {len(rate_cards)}")
+            logging.debug(f"Nombre de tarifs trouvés: {len(rate_cards)}")
             
             # Créer une liste pour stocker tous les tarifs avant de les sauvegarder
             all_rates = []
@@ -512,7 +503,7 @@ class ScrapingWorker:
                     }
                     
                     all_rates.append(rate_info)
-                    logging.info(f"Tarif trouvé: {rate_name} - {price} {currency}")
+                    logging.debug(f"Tarif trouvé: {rate_name} - {price} {currency}")
                     
                 except Exception as e:
                     logging.error(f"Erreur scraping tarif individuel: {str(e)}")
@@ -714,5 +705,6 @@ class IHGScraper:
             logging.error(f"Erreur lors de l'exécution des tâches restantes: {str(e)}")
 
 if __name__ == "__main__":
+    setup_logging('scraping_remaining.jsonl')
     scraper = IHGScraper()
     scraper.run()
\ No newline at end of file
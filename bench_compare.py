@@ -0,0 +1,143 @@
+import argparse
+import logging
+import statistics
+import sys
+
+from bench_results import BenchResult
+
+# Écart absolu en dessous duquel une variation n'est jamais une régression, par unité
+MIN_DELTA = {'s': 0.005, 'MB': 5.0}
+# Part de la référence au-delà de laquelle le bruit n'élargit plus la tolérance
+MAX_NOISE = 0.5
+# Répétitions minimales de chaque côté : en dessous, le bruit n'est pas mesurable
+MIN_REPEATS = 3
+
+
+def robust_stats(samples):
+    """(médiane, écart robuste) : MAD × 1,4826 (≈ écart type pour un bruit gaussien), 0 pour un échantillon"""
+    median = statistics.median(samples)
+    if len(samples) < 2:
+        return median, 0.0
+    return median, 1.4826 * statistics.median(abs(value - median) for value in samples)
+
+
+def compare(baseline, candidate, threshold=0.10, noise_factor=3.0, min_delta=None, max_noise=MAX_NOISE):
+    """Compare deux BenchResult mesure par mesure
+
+    Une mesure régresse si sa médiane augmente de plus que le plus grand de :
+    `threshold` (relatif à la référence), `noise_factor` fois le bruit de la
+    référence (plafonné à `max_noise` fois la référence) et l'écart absolu
+    minimal de son unité. Le bruit du candidat n'entre pas dans la tolérance :
+    un candidat lent et dispersé ne doit pas élargir sa propre marge.
+    Symétrique pour les améliorations. Une mesure de la référence sans échantillon dans le
+    candidat est 'absente' : elle échoue comme une régression (mesure cassée
+    ou retirée du benchmark). Retourne une ligne par mesure, échecs en tête.
+    """
+    min_delta = dict(MIN_DELTA, **(min_delta or {}))
+    rows = []
+    for name in sorted(set(baseline.measures) | set(candidate.measures)):
+        before = baseline.measures.get(name)
+        after = candidate.measures.get(name)
+        if before is None or after is None or not before['samples'] or not after['samples']:
+            rows.append({'measure': name, 'verdict': 'absente' if after is None or not after['samples'] else 'nouvelle',
+                         'unit': (after or before)['unit']})
+            continue
+        base, noise = robust_stats(before['samples'])
+        value, _ = robust_stats(after['samples'])
+        delta = value - base
+        tolerance = max(threshold * base, min(noise_factor * noise, max_noise * base),
+                        min_delta.get(after['unit'], 0.0))
+        if delta > tolerance:
+            verdict = 'régression'
+        elif -delta > tolerance:
+            verdict = 'amélioration'
+        else:
+            verdict = 'stable'
+        rows.append({
+            'measure': name,
+            'unit': after['unit'],
+            'baseline': base,
+            'candidate': value,
+            'change': delta / base if base else None,
+            'noise': noise / base if base else None,
+            'samples': (len(before['samples']), len(after['samples'])),
+            'verdict': verdict,
+        })
+    order = {'régression': 0, 'absente': 1, 'amélioration': 2, 'stable': 3, 'nouvelle': 4}
+    rows.sort(key=lambda row: (order[row['verdict']], -(row.get('change') or 0)))
+    return rows
+
+
+def format_table(rows):
+    lines = [f"{'Mesure':<34}{'Référence':>13}{'Candidat':>13}{'Écart':>10}{'Bruit':>9}{'Éch.':>8}  Verdict"]
+    for row in rows:
+        if 'baseline' not in row:
+            lines.append(f"{row['measure']:<34}{'':>13}{'':>13}{'':>10}{'':>9}{'':>8}  {row['verdict']}")
+            continue
+        unit = row['unit']
+        change = f"{100 * row['change']:+.1f} %" if row['change'] is not None else '-'
+        noise = f"±{100 * row['noise']:.1f} %" if row['noise'] is not None else '-'
+        samples = f"{row['samples'][0]}/{row['samples'][1]}"
+        lines.append(
+            f"{row['measure'][:33]:<34}{row['baseline']:>10.3f} {unit:<2}{row['candidate']:>10.3f} {unit:<2}"
+            f"{change:>10}{noise:>9}{samples:>8}  {row['verdict']}"
+        )
+    return '\n'.join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compare un résultat de benchmark à une référence ; code de sortie 1 en cas de régression, "
+                    "de mesure absente du candidat ou de répétitions insuffisantes"
+    )
+    parser.add_argument('baseline', help="Résultat de référence (JSON écrit par --output d'un bench_*.py)")
+    parser.add_argument('candidate', help="Résultat à valider")
+    parser.add_argument('--threshold', type=float, default=0.10, help="Hausse relative tolérée (0.10 = 10 %%)")
+    parser.add_argument('--noise-factor', type=float, default=3.0,
+                        help="Hausse tolérée en multiples du bruit de la référence entre répétitions")
+    parser.add_argument('--max-noise', type=float, default=MAX_NOISE,
+                        help="Plafond de la tolérance due au bruit, relatif à la référence (0.5 = 50 %%)")
+    parser.add_argument('--min-repeats', type=int, default=MIN_REPEATS,
+                        help="Répétitions exigées de chaque côté (--repeat des bench_*.py)")
+    parser.add_argument('--min-seconds', type=float, default=MIN_DELTA['s'],
+                        help="Hausse absolue en secondes toujours tolérée")
+    parser.add_argument('--min-mb', type=float, default=MIN_DELTA['MB'], help="Hausse absolue en Mo toujours tolérée")
+    args = parser.parse_args()
+
+    baseline = BenchResult.load(args.baseline)
+    candidate = BenchResult.load(args.candidate)
+    if baseline.benchmark != candidate.benchmark:
+        print(f"Benchmarks différents : {baseline.benchmark} / {candidate.benchmark}", file=sys.stderr)
+        sys.exit(2)
+    if baseline.params != candidate.params:
+        logging.warning(f"Paramètres différents : {baseline.params} / {candidate.params}")
+    for key in ('machine', 'cpu_count', 'python'):
+        if baseline.environment.get(key) != candidate.environment.get(key):
+            logging.warning(f"Environnements différents ({key}) : {baseline.environment.get(key)} / "
+                            f"{candidate.environment.get(key)}")
+
+    rows = compare(baseline, candidate, args.threshold, args.noise_factor, {'s': args.min_seconds, 'MB': args.min_mb},
+                   args.max_noise)
+    print(f"{baseline.benchmark} : {baseline.environment.get('git_commit') or '?'} "
+          f"({baseline.environment.get('created_at')}) -> {candidate.environment.get('git_commit') or '?'} "
+          f"({candidate.environment.get('created_at')})\n")
+    print(format_table(rows))
+
+    regressions = [row['measure'] for row in rows if row['verdict'] == 'régression']
+    missing = [row['measure'] for row in rows if row['verdict'] == 'absente']
+    unmeasured = [row['measure'] for row in rows if 'samples' in row and min(row['samples']) < args.min_repeats]
+    if regressions:
+        print(f"\n{len(regressions)} régression(s) : {', '.join(regressions)}")
+    if missing:
+        print(f"\n{len(missing)} mesure(s) absente(s) du candidat : {', '.join(missing)}")
+    if unmeasured:
+        print(f"\n{len(unmeasured)} mesure(s) avec moins de {args.min_repeats} répétitions d'un côté, bruit inconnu "
+              f"(relancer avec --repeat {args.min_repeats}) : {', '.join(unmeasured)}")
+    if regressions or missing or unmeasured:
+        sys.exit(1)
+    print("\nAucune régression")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(levelname)s - %(message)s')
+    main()
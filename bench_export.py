@@ -0,0 +1,175 @@
+import argparse
+import logging
+import os
+import re
+import tempfile
+import time
+
+from bench_merge import write_fixture
+from bench_rate_buffer import generate_entries, RATE_CLASSES
+from bench_results import BenchResult
+from export_pipeline import (FIXED_COLUMNS, iter_entry_rows, iter_export_rows, list_result_files,
+                             scan_result_files)
+from export_state import ExportState
+from export_writers import FORMAT_EXTENSIONS, open_output, write_outputs
+
+
+def extract_price(price_str):
+    """Analyse historique d'un prix, appelée cellule par cellule"""
+    if not isinstance(price_str, str):
+        return None
+    price_str = price_str.replace('€', '').replace('$', '').strip()
+    price_str = ''.join(price_str.split())
+    price_str = price_str.replace(',', '.')
+    match = re.search(r'\d+(?:\.\d+)?', price_str)
+    return float(match.group()) if match else None
+
+
+def legacy_rows(entries, rate_columns):
+    """Boucle historique : un dictionnaire par ligne, un split et une regex par cellule"""
+    rows = []
+    for entry_data in entries:
+        for currency in ['EUR', 'USD']:
+            row = {
+                'Date de scraping': entry_data['Date_Scraping'],
+                'Pays': entry_data['Pays'],
+                'Ville': entry_data['Ville'],
+                'Hôtel': entry_data['Hotel'],
+                'Chaîne': entry_data['Chaine'],
+                'Type de chambre': entry_data['Chambre'],
+                'Entreprise cliente': entry_data['Entreprise_Cliente'] or '',
+                'Code corporate': entry_data['Code_Corporate'] or '',
+                'Staying date (début)': entry_data['Date_Arrivee'],
+                'Staying date (fin)': entry_data['Date_Depart'],
+                'Durée du séjour (# de nuits)': entry_data['Nombre_Nuits'],
+                'Devise': currency,
+            }
+            for rate_type in rate_columns:
+                row[rate_type] = extract_price(entry_data['Tarifs'].get(f"{rate_type} - {currency}"))
+            rows.append([row[column] for column in FIXED_COLUMNS + rate_columns])
+    return rows
+
+
+def bench_pivot(args):
+    """Analyse des prix et pivot : boucle historique par cellule vs iter_entry_rows vectorisé"""
+    bench = BenchResult('export_pivot', {'observations': args.observations})
+    entries = [entry for _, entry in generate_entries(args.observations)]
+    rate_columns = sorted(RATE_CLASSES)
+    print(f"{len(entries)} entrées, {args.observations} tarifs")
+
+    for repetition in range(args.repeat):
+        start = time.perf_counter()
+        reference = legacy_rows(entries, rate_columns)
+        legacy_elapsed = time.perf_counter() - start
+
+        start = time.perf_counter()
+        rows = list(iter_entry_rows(entries, rate_columns))
+        elapsed = time.perf_counter() - start
+
+        assert len(rows) == len(reference)
+        assert all(list(row) == expected for row, expected in zip(rows, reference))
+        bench.add('legacy_rows', legacy_elapsed)
+        bench.add('rows', elapsed)
+        print(f"Répétition {repetition + 1}/{args.repeat} : boucle par cellule {legacy_elapsed:.2f} s, "
+              f"vectorisé {elapsed:.2f} s ({legacy_elapsed / elapsed:.1f}x)")
+    bench.metrics = {'entries': len(entries), 'rows': len(rows)}
+    return bench
+
+
+def run_export(files, directory, repetition, workers=None, formats=('xlsx', 'csv')):
+    """Une conversion comme json_to_excel (état persistant neuf, un seul passage d'écriture), étape par étape"""
+    timings = {}
+    start = time.perf_counter()
+    state = ExportState(os.path.join(directory, f"state_{repetition}.sqlite"))
+    try:
+        state.update(files, workers=workers)
+        timings['state_update'] = time.perf_counter() - start
+
+        outputs = {}
+        for output_format in formats:
+            path = os.path.join(directory, f"export_{repetition}{FORMAT_EXTENSIONS[output_format]}")
+            writer = open_output(output_format, path, state.columns)
+            if writer is not None:
+                outputs[output_format] = writer
+        pass_start = time.perf_counter()
+        elapsed, row_count = write_outputs(iter_entry_rows(state.iter_entries(), state.rate_columns), outputs)
+        pass_elapsed = time.perf_counter() - pass_start
+        entries = state.entry_count
+    finally:
+        state.close()
+    timings['export'] = time.perf_counter() - start
+    for output_format, seconds in elapsed.items():
+        timings[f"write_{output_format}"] = seconds
+    # Production des lignes (lecture de l'état et pivot) : le reste du passage d'écriture
+    timings['rows'] = max(0.0, pass_elapsed - sum(elapsed.values()))
+
+    # Chemin sans état (--no-state) : scan des fichiers puis relecture des gagnants
+    start = time.perf_counter()
+    plan = scan_result_files(files, workers)
+    timings['scan'] = time.perf_counter() - start
+    start = time.perf_counter()
+    plan_rows = sum(1 for _ in iter_export_rows(plan))
+    timings['scan_rows'] = time.perf_counter() - start
+    assert plan_rows == row_count, f"{plan_rows} lignes sans état, {row_count} avec état"
+    return timings, entries, row_count
+
+
+def bench_conversion(args):
+    """Conversion json_to_excel complète sur des fichiers synthétiques, étape par étape"""
+    bench = BenchResult('json_to_excel', {
+        'files': args.files,
+        'entries_per_file': args.entries_per_file,
+        'workers': args.workers,
+        'formats': sorted(args.formats),
+    })
+    with tempfile.TemporaryDirectory() as directory:
+        fixture = os.path.join(directory, 'scraping_results')
+        os.makedirs(fixture)
+        write_fixture(fixture, args.files, args.entries_per_file)
+        files = list_result_files([fixture])
+
+        for repetition in range(args.repeat):
+            timings, entries, rows = run_export(files, directory, repetition, args.workers, args.formats)
+            for stage, seconds in timings.items():
+                bench.add(stage, seconds)
+            print(f"Répétition {repetition + 1}/{args.repeat} : {timings['export']:.2f} s "
+                  f"({entries} entrées, {rows} lignes)")
+    bench.metrics = {'entries': entries, 'rows': rows}
+    return bench
+
+
+def print_summary(bench):
+    print(f"\n{'Étape':<16}{'Médiane (s)':>12}{'Min (s)':>10}")
+    for stage, measure in bench.measures.items():
+        samples = sorted(measure['samples'])
+        print(f"{stage:<16}{samples[len(samples) // 2]:>12.3f}{samples[0]:>10.3f}")
+
+
+def main():
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument('--repeat', type=int, default=3, help="Répétitions (échantillons pour bench_compare.py)")
+    common.add_argument('--output', default=None,
+                        help="Fichier JSON où écrire le résultat (format bench_results, comparable avec bench_compare.py)")
+
+    parser = argparse.ArgumentParser(description="Benchmarks de l'export : pivot des prix et conversion json_to_excel")
+    subparsers = parser.add_subparsers(dest='benchmark', required=True)
+    pivot = subparsers.add_parser('pivot', parents=[common],
+                                  help="Analyse des prix et pivot : boucle par cellule vs vectorisé")
+    pivot.add_argument('--observations', type=int, default=1_000_000)
+    conversion = subparsers.add_parser('conversion', parents=[common],
+                                       help="Conversion json_to_excel étape par étape (fichiers synthétiques)")
+    conversion.add_argument('--files', type=int, default=16)
+    conversion.add_argument('--entries-per-file', type=int, default=2000)
+    conversion.add_argument('--workers', type=int, default=None, help="Processus de lecture (défaut : un par cœur)")
+    conversion.add_argument('--formats', nargs='+', choices=sorted(FORMAT_EXTENSIONS), default=['xlsx', 'csv'])
+    args = parser.parse_args()
+
+    bench = bench_pivot(args) if args.benchmark == 'pivot' else bench_conversion(args)
+    print_summary(bench)
+    if args.output:
+        bench.write(args.output)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(levelname)s - %(message)s')
+    main()
@@ -0,0 +1,71 @@
+import argparse
+import json
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from bench_rate_buffer import generate_entries
+from export_pipeline import list_result_files, merge_result_files, scan_result_files
+
+
+def write_fixture(directory, files, entries_per_file):
+    """Écrit des fichiers de résultats qui se recouvrent partiellement d'un fichier à l'autre"""
+    observations = entries_per_file * 16
+    for index in range(files):
+        entries = dict(generate_entries(observations))
+        shift = timedelta(minutes=index)
+        for entry in entries.values():
+            scraped_at = datetime.strptime(entry['Date_Scraping'], '%Y-%m-%d %H:%M:%S') + shift
+            entry['Date_Scraping'] = scraped_at.strftime('%Y-%m-%d %H:%M:%S')
+        with open(os.path.join(directory, f"city_{index % 5}_worker_{index}.json"), 'w', encoding='utf-8') as f:
+            json.dump(entries, f, ensure_ascii=False)
+
+
+def sequential_merge(files):
+    """Fusion historique : un fichier à la fois, deux strptime par doublon"""
+    merged_data = {}
+    for file_path in files:
+        with open(file_path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        for entry_key, entry_data in data.items():
+            if entry_key not in merged_data:
+                merged_data[entry_key] = entry_data
+            else:
+                existing_date = datetime.strptime(merged_data[entry_key]['Date_Scraping'], '%Y-%m-%d %H:%M:%S')
+                new_date = datetime.strptime(entry_data['Date_Scraping'], '%Y-%m-%d %H:%M:%S')
+                if new_date > existing_date:
+                    merged_data[entry_key] = entry_data
+    return merged_data
+
+
+def timed(function, *args, **kwargs):
+    start = time.perf_counter()
+    result = function(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fusion des fichiers JSON : séquentielle vs pool de processus")
+    parser.add_argument('--files', type=int, default=64)
+    parser.add_argument('--entries-per-file', type=int, default=5000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        write_fixture(directory, args.files, args.entries_per_file)
+        files = list_result_files([directory])
+
+        reference, elapsed = timed(sequential_merge, files)
+        print(f"Séquentiel historique      : {elapsed:7.2f} s ({len(reference)} entrées)")
+
+        cpu_count = os.cpu_count() or 1
+        workers_list = sorted({1, 2, 4, 8, 16, 32, cpu_count} & set(range(1, cpu_count + 1)))
+        for workers in workers_list:
+            merged, elapsed = timed(merge_result_files, files, workers)
+            assert merged.keys() == reference.keys()
+            plan, scan_elapsed = timed(scan_result_files, files, workers)
+            print(f"Pool {workers:2d} processus         : {elapsed:7.2f} s fusion, {scan_elapsed:7.2f} s scan export")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+import argparse
+import gc
+import tracemalloc
+from datetime import datetime, timedelta
+
+from rate_buffer import RateBuffer
+
+RATE_CLASSES = [
+    "REMISE MEMBRE - Annulation gratuite",
+    "REMISE MEMBRE - Annulation gratuite avec petit déjeuner",
+    "REMISE MEMBRE - Non remboursable",
+    "SANS REMISE - Annulation gratuite",
+    "SANS REMISE - Annulation gratuite avec petit déjeuner",
+    "SANS REMISE - Non remboursable",
+    "Tarif corporate (GOLD)",
+    "Tarif corporate (GOLD) avec petit déjeuner",
+]
+CURRENCIES = ['EUR', 'USD']
+CITIES = ['frankfurt', 'tokyo', 'singapore', 'dubai', 'new york']
+
+
+def generate_entries(observations):
+    """Génère des entrées au format historique totalisant ~observations tarifs"""
+    per_entry = len(RATE_CLASSES) * len(CURRENCIES)
+    base_date = datetime(2025, 1, 15)
+    scraped_at = datetime(2024, 11, 13, 12, 0, 0)
+
+    for index in range(max(1, observations // per_entry)):
+        hotel = f"Holiday Inn Hotel {index // 40}"
+        check_in = base_date + timedelta(days=index % 7)
+        nights = 1 + index % 2
+        entry = {
+            'Date_Scraping': (scraped_at + timedelta(seconds=index)).strftime('%Y-%m-%d %H:%M:%S'),
+            'Hotel': hotel,
+            'Chaine': hotel.split()[0],
+            'Chambre': f"Chambre {index % 40}",
+            'Entreprise_Cliente': None,
+            'Code_Corporate': None,
+            'Ville': CITIES[index % len(CITIES)],
+            'Pays': 'Germany',
+            'Date_Arrivee': check_in.strftime('%Y-%m-%d'),
+            'Date_Depart': (check_in + timedelta(days=nights)).strftime('%Y-%m-%d'),
+            'Nombre_Nuits': nights,
+            'Tarifs': {}
+        }
+        for rate_class in RATE_CLASSES:
+            for currency in CURRENCIES:
+                entry['Tarifs'][f"{rate_class} - {currency}"] = f"{100 + index % 300},{index % 100:02d}"
+        yield f"{hotel}|{entry['Chambre']}|{entry['Date_Arrivee']}|{entry['Date_Depart']}|{nights}", entry
+
+
+def measure(build):
+    """Retourne (objet construit, octets alloués au pic)"""
+    gc.collect()
+    tracemalloc.start()
+    result = build()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mémoire des observations : dictionnaires vs buffer colonnaire")
+    parser.add_argument('--observations', type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    entries, dict_bytes = measure(lambda: dict(generate_entries(args.observations)))
+    observations = sum(len(entry['Tarifs']) for entry in entries.values())
+    del entries
+
+    buffer, buffer_bytes = measure(
+        lambda: RateBuffer.from_entries(entry for _, entry in generate_entries(args.observations))
+    )
+
+    scale = 1_000_000 / observations
+    print(f"Observations: {observations:,}")
+    print(f"Dictionnaires : {dict_bytes * scale / 2**20:8.1f} Mo par million d'observations")
+    print(f"RateBuffer    : {buffer_bytes * scale / 2**20:8.1f} Mo par million d'observations "
+          f"(données : {buffer.nbytes() * scale / 2**20:.1f} Mo)")
+    print(f"Gain          : x{dict_bytes / max(buffer_bytes, 1):.1f}")
+
+
+if __name__ == "__main__":
+    main()
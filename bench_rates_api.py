@@ -0,0 +1,101 @@
+import argparse
+import http.client
+import random
+import threading
+import time
+from urllib.parse import urlencode
+
+from bench_rate_buffer import generate_entries
+from rates_api import RateStore, RatesServer
+
+
+def build_queries(store, count, hot_fraction=0.2, seed=0):
+    """Mélange de requêtes réalistes : quelques clés chaudes très demandées, le reste réparti"""
+    rng = random.Random(seed)
+    records = store.records
+    queries = []
+    for _ in range(count):
+        record = records[rng.randrange(len(records))]
+        kind = rng.random()
+        if kind < 0.5:
+            # Tarif précis : hôtel + séjour + code
+            params = {'hotel': record['hotel'], 'check_in': record['check_in'],
+                      'nights': record['nights'], 'code': record['code']}
+        elif kind < 0.8:
+            params = {'city': record['city'], 'check_in': record['check_in'], 'limit': 20}
+        else:
+            params = {'hotel': record['hotel'], 'offset': rng.choice([0, 20, 40]), 'limit': 20}
+        queries.append('/rates?' + urlencode(params))
+
+    # Clés chaudes : une fraction des requêtes répète un petit ensemble de requêtes
+    hot = queries[:max(1, count // 100)]
+    return [rng.choice(hot) if rng.random() < hot_fraction else query for query in queries]
+
+
+def run_client(host, port, queries, latencies, errors):
+    connection = http.client.HTTPConnection(host, port, timeout=10)
+    for query in queries:
+        start = time.perf_counter()
+        try:
+            connection.request('GET', query)
+            response = connection.getresponse()
+            response.read()
+            if response.status != 200:
+                errors.append(response.status)
+        except (OSError, http.client.HTTPException) as e:
+            errors.append(str(e))
+            connection.close()
+            connection = http.client.HTTPConnection(host, port, timeout=10)
+            continue
+        latencies.append(time.perf_counter() - start)
+    connection.close()
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Test de charge de l'API des prix (p50, p99, requêtes/s)")
+    parser.add_argument('--observations', type=int, default=500_000, help="Taille du jeu de données synthétique")
+    parser.add_argument('--requests', type=int, default=20000)
+    parser.add_argument('--clients', type=int, default=8)
+    parser.add_argument('--cache-size', type=int, default=4096)
+    parser.add_argument('--hot-fraction', type=float, default=0.2)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    store = RateStore((entry for _, entry in generate_entries(args.observations)), args.cache_size)
+    print(f"{len(store)} séjours indexés en {time.perf_counter() - start:.1f} s")
+
+    server = RatesServer(('127.0.0.1', 0), store)
+    host, port = server.server_address
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    queries = build_queries(store, args.requests, args.hot_fraction)
+    chunks = [queries[index::args.clients] for index in range(args.clients)]
+    latencies, errors = [], []
+    clients = [
+        threading.Thread(target=run_client, args=(host, port, chunk, latencies, errors))
+        for chunk in chunks
+    ]
+
+    start = time.perf_counter()
+    for client in clients:
+        client.start()
+    for client in clients:
+        client.join()
+    elapsed = time.perf_counter() - start
+    server.shutdown()
+
+    info = store.query_json.cache_info()
+    print(f"{len(latencies)} requêtes, {args.clients} clients, {len(errors)} erreurs")
+    print(f"p50 : {percentile(latencies, 0.50) * 1000:7.2f} ms")
+    print(f"p99 : {percentile(latencies, 0.99) * 1000:7.2f} ms")
+    print(f"Débit : {len(latencies) / elapsed:7.0f} requêtes/s")
+    print(f"Cache : {info.hits} succès, {info.misses} échecs")
+
+
+if __name__ == "__main__":
+    main()
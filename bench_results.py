@@ -0,0 +1,89 @@
+import json
+import os
+import platform
+import subprocess
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+from metrics import write_text
+
+FORMAT_VERSION = 1
+
+
+class BenchResult:
+    """Résultat d'un benchmark, comparable d'un run à l'autre avec bench_compare.py
+
+    Chaque mesure (temps d'une étape en secondes, pic mémoire en Mo...) garde
+    un échantillon par répétition : la dispersion entre répétitions sert à
+    distinguer une régression du bruit. Pour toutes les mesures, plus petit
+    est meilleur ; les indicateurs informatifs (débits, compteurs) vont dans
+    `metrics` et ne sont pas comparés.
+    """
+
+    def __init__(self, benchmark, params=None):
+        self.benchmark = benchmark
+        self.params = dict(params or {})
+        self.measures = {}  # nom -> {'unit': ..., 'samples': [...]}
+        self.metrics = {}
+        self.environment = environment()
+
+    def add(self, name, value, unit='s'):
+        measure = self.measures.setdefault(name, {'unit': unit, 'samples': []})
+        measure['samples'].append(round(value, 6))
+
+    @contextmanager
+    def timed(self, name):
+        """Ajoute la durée du bloc comme échantillon de la mesure `name`"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - start)
+
+    def to_dict(self):
+        return {
+            'format': FORMAT_VERSION,
+            'benchmark': self.benchmark,
+            'params': self.params,
+            'environment': self.environment,
+            'measures': self.measures,
+            'metrics': self.metrics,
+        }
+
+    def write(self, path):
+        write_text(path, json.dumps(self.to_dict(), indent=4, ensure_ascii=False))
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        if data.get('format') != FORMAT_VERSION:
+            raise ValueError(f"{path} : format de résultat inconnu ({data.get('format')})")
+        result = cls(data['benchmark'], data.get('params'))
+        result.environment = data.get('environment', {})
+        result.measures = data.get('measures', {})
+        result.metrics = data.get('metrics', {})
+        return result
+
+
+def environment():
+    """Contexte d'exécution enregistré avec le résultat (comparaisons entre machines à éviter)"""
+    return {
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'git_commit': _git_commit(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'cpu_count': os.cpu_count(),
+    }
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, timeout=5,
+            cwd=os.path.dirname(os.path.abspath(__file__))
+        ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
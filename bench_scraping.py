@@ -0,0 +1,241 @@
+import argparse
+import logging
+import os
+import queue
+import resource
+import shutil
+import tempfile
+import threading
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+from app_workers import ScrapingTask, ScrapingWorker
+from bench_results import BenchResult
+from checkpoint import load_json
+from driver_profiler import DriverProfiler
+from walltime_profiler import WallTimeProfiler
+from metrics import METRICS
+from mock_ihg_site import BANNER_MODES, PUBLIC_RATES, MockCatalog, MockIHGServer
+from normalized_results import iter_stored_entries
+from rate_buffer import iter_entry_rates
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+
+class MemorySampler:
+    """Pic de mémoire résidente du processus et des navigateurs qu'il a lancés (psutil)"""
+
+    def __init__(self, interval=0.5):
+        self.interval = interval
+        self.peak_total = 0
+        self.peak_browsers = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="MemorySampler", daemon=True)
+
+    def start(self):
+        if psutil is not None:
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread.is_alive():
+            self._thread.join()
+
+    def _run(self):
+        process = psutil.Process()
+        while not self._stop.wait(self.interval):
+            browsers = 0
+            for child in process.children(recursive=True):
+                try:
+                    browsers += child.memory_info().rss
+                except psutil.Error:
+                    continue  # Processus terminé entre l'énumération et la mesure
+            self.peak_browsers = max(self.peak_browsers, browsers)
+            self.peak_total = max(self.peak_total, process.memory_info().rss + browsers)
+
+
+def build_tasks(cities, tasks_per_city, nights, corporate_code=None):
+    """Tâches de scraping réparties sur des dates proches, avec ou sans code corporate"""
+    start = datetime.now() + timedelta(days=30)
+    tasks = []
+    for city in cities:
+        for index in range(tasks_per_city):
+            check_in = start + timedelta(days=index)
+            tasks.append(ScrapingTask(city, check_in, nights))
+            if corporate_code:
+                tasks.append(ScrapingTask(city, check_in, nights, ('Benchmark', corporate_code)))
+    return tasks
+
+
+def count_saved_rates(output_dir):
+    total = 0
+    for filename in os.listdir(output_dir):
+        if filename.endswith('.json'):
+            for entry in iter_stored_entries(load_json(os.path.join(output_dir, filename))):
+                total += sum(1 for _, _, price_cents in iter_entry_rates(entry) if price_cents is not None)
+    return total
+
+
+def run_benchmark(server, tasks, workers, headless=True, driver_profiler=None, wall_profiler=None):
+    """Exécute les tâches avec `workers` ScrapingWorker contre le site factice"""
+    output_dir = tempfile.mkdtemp(prefix='bench_scraping_')
+    task_queue = queue.Queue()
+    for task in tasks:
+        task_queue.put(task)
+
+    ScrapingWorker.base_url = server.base_url
+    scraping_workers = []
+    for worker_id in range(workers):
+        worker = ScrapingWorker(worker_id, task_queue, output_dir,
+                                driver_profiler=driver_profiler, wall_profiler=wall_profiler)
+        if headless:
+            worker.chrome_options.add_argument('--headless=new')
+        scraping_workers.append(worker)
+
+    METRICS.reset()
+    sampler = MemorySampler()
+    tracemalloc.start()
+    sampler.start()
+    start = time.perf_counter()
+
+    threads = [
+        threading.Thread(target=worker.start, name=f"ScrapeWorker-{worker.worker_id}")
+        for worker in scraping_workers
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    elapsed = time.perf_counter() - start
+    sampler.stop()
+    _, python_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    summary = METRICS.summary()
+    counters = summary['counters']
+    hotels = counters.get('hotels', {}).get('total', 0)
+    rates = counters.get('rates', {}).get('total', 0)
+    saved_rates = count_saved_rates(output_dir)
+    shutil.rmtree(output_dir, ignore_errors=True)
+
+    return {
+        'tasks': len(tasks),
+        'workers': workers,
+        'duration_seconds': round(elapsed, 2),
+        'hotels': hotels,
+        'rates': rates,
+        'saved_rates': saved_rates,
+        'task_errors': counters.get('task_errors', {}).get('total', 0),
+        'hotels_per_minute': round(hotels * 60 / elapsed, 2),
+        'rates_per_second': round(rates / elapsed, 2),
+        'python_heap_peak_mb': round(python_peak / 1e6, 1),
+        # ru_maxrss est en kilo-octets sous Linux
+        'process_rss_peak_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1e3, 1),
+        'browsers_rss_peak_mb': round(sampler.peak_browsers / 1e6, 1) if psutil is not None else None,
+        'total_rss_peak_mb': round(sampler.peak_total / 1e6, 1) if psutil is not None else None,
+        'page_views': dict(server.page_views),
+        # Durée moyenne de chaque étape instrumentée (hotel = temps par hôtel)
+        'stage_seconds': {name: stage['mean_seconds'] for name, stage in summary['stages'].items() if stage['count']},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de bout en bout de ScrapingWorker sur le site IHG factice")
+    parser.add_argument('--workers', type=int, default=1)
+    parser.add_argument('--cities', nargs='+', default=['frankfurt', 'tokyo'])
+    parser.add_argument('--tasks-per-city', type=int, default=1)
+    parser.add_argument('--nights', type=int, default=1)
+    parser.add_argument('--corporate-code', default=None, help="Ajoute une tâche corporate par tâche publique")
+    parser.add_argument('--hotels', type=int, default=5, help="Hôtels par ville")
+    parser.add_argument('--rooms', type=int, default=3, help="Chambres par hôtel")
+    parser.add_argument('--rates', type=int, default=len(PUBLIC_RATES), help="Tarifs publics par chambre")
+    parser.add_argument('--latency', type=float, default=0.05, help="Délai de réponse des pages (secondes)")
+    parser.add_argument('--render-delay', type=int, default=300, help="Délai de rendu JavaScript (ms)")
+    parser.add_argument('--currency-delay', type=int, default=300, help="Délai de mise à jour des prix (ms)")
+    parser.add_argument('--page-size', type=int, default=10, help="Hôtels chargés par défilement (0 = tous)")
+    parser.add_argument('--banner', choices=BANNER_MODES, default='once')
+    parser.add_argument('--no-headless', action='store_true', help="Afficher les fenêtres Chrome")
+    parser.add_argument('--profile-driver', default=None, metavar='PREFIXE',
+                        help="Profiler les commandes WebDriver et écrire <PREFIXE>.txt et .folded")
+    parser.add_argument('--profile-walltime', default=None, metavar='PREFIXE',
+                        help="Ventiler le temps réel des workers et écrire <PREFIXE>.txt et .json")
+    parser.add_argument('--repeat', type=int, default=1, help="Répétitions (3 au moins pour bench_compare.py)")
+    parser.add_argument('--output', default=None,
+                        help="Fichier JSON où écrire le résultat (format bench_results, comparable avec bench_compare.py)")
+    args = parser.parse_args()
+
+    catalog = MockCatalog(args.hotels, args.rooms, args.rates)
+    server = MockIHGServer(
+        ('127.0.0.1', 0), catalog,
+        latency=args.latency,
+        render_delay_ms=args.render_delay,
+        currency_delay_ms=args.currency_delay,
+        page_size=args.page_size,
+        banner=args.banner
+    )
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    tasks = build_tasks(args.cities, args.tasks_per_city, args.nights, args.corporate_code)
+    expected = sum(
+        catalog.expected_rates(task.city, task.corporate_info[1] if task.corporate_info else None)
+        for task in tasks
+    )
+    driver_profiler = DriverProfiler() if args.profile_driver else None
+    wall_profiler = WallTimeProfiler().install() if args.profile_walltime else None
+    results = []
+    try:
+        for repetition in range(args.repeat):
+            results.append(run_benchmark(server, tasks, args.workers, not args.no_headless, driver_profiler, wall_profiler))
+            if args.repeat > 1:
+                print(f"Répétition {repetition + 1}/{args.repeat} : {results[-1]['duration_seconds']:.1f} s, "
+                      f"{results[-1]['hotels']} hôtels")
+    finally:
+        server.shutdown()
+        if wall_profiler is not None:
+            wall_profiler.uninstall()
+    result = results[-1]
+    result['expected_rates'] = expected
+
+    print(f"{result['tasks']} tâches, {result['workers']} workers, {result['duration_seconds']:.1f} s")
+    print(f"Hôtels    : {result['hotels']} ({result['hotels_per_minute']:.1f} hôtels/min)")
+    print(f"Tarifs    : {result['rates']} relevés ({result['rates_per_second']:.2f} tarifs/s), "
+          f"{result['saved_rates']} sauvegardés, {expected} attendus")
+    print(f"Erreurs   : {result['task_errors']} tâches en erreur")
+    print(f"Mémoire   : tas Python {result['python_heap_peak_mb']} Mo, "
+          f"RSS processus {result['process_rss_peak_mb']} Mo")
+    if psutil is not None:
+        print(f"            navigateurs {result['browsers_rss_peak_mb']} Mo, total {result['total_rss_peak_mb']} Mo")
+    else:
+        print("            (installer psutil pour mesurer la mémoire des navigateurs)")
+
+    if driver_profiler is not None:
+        driver_profiler.write_report(args.profile_driver)
+        print(driver_profiler.report(top=15))
+    if wall_profiler is not None:
+        wall_profiler.write_report(args.profile_walltime)
+        print(wall_profiler.report(top=15))
+
+    if args.output:
+        excluded = ('output', 'repeat', 'no_headless', 'profile_driver', 'profile_walltime')
+        bench = BenchResult('scraping', {name: value for name, value in vars(args).items() if name not in excluded})
+        for run in results:
+            bench.add('duration', run['duration_seconds'])
+            if run['hotels']:
+                bench.add('seconds_per_hotel', run['duration_seconds'] / run['hotels'])
+            for stage, seconds in run['stage_seconds'].items():
+                bench.add(f"stage.{stage}", seconds)
+            bench.add('python_heap_peak', run['python_heap_peak_mb'], 'MB')
+            if run['browsers_rss_peak_mb'] is not None:
+                bench.add('browsers_rss_peak', run['browsers_rss_peak_mb'], 'MB')
+        bench.metrics = result
+        bench.write(args.output)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(levelname)s - %(message)s')
+    main()
@@ -0,0 +1,156 @@
+import glob
+import json
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+
+TMP_SUFFIX = '.tmp'
+
+
+class CheckpointWriter:
+    """Écrit des fichiers JSON de façon atomique (fichier temporaire + renommage)
+
+    Le renommage garantit qu'un arrêt brutal du processus ne laisse jamais un
+    fichier tronqué. Les fsync, coûteux, sont regroupés : ils ne sont faits que
+    toutes les `fsync_every` écritures ou toutes les `fsync_interval` secondes,
+    ainsi qu'à l'appel de sync().
+    """
+
+    def __init__(self, fsync_every=20, fsync_interval=30.0):
+        self.fsync_every = fsync_every
+        self.fsync_interval = fsync_interval
+        self._writes_since_sync = 0
+        self._last_sync = time.monotonic()
+        self._pending = set()  # Fichiers écrits depuis le dernier fsync
+        self._lock = threading.Lock()
+
+    def write_json(self, path, data, **dump_kwargs):
+        """Écrit `data` dans `path` de façon atomique"""
+        dump_kwargs.setdefault('ensure_ascii', False)
+        tmp_path = path + TMP_SUFFIX
+
+        with self._lock:
+            self._writes_since_sync += 1
+            sync_now = (
+                self._writes_since_sync >= self.fsync_every
+                or time.monotonic() - self._last_sync >= self.fsync_interval
+            )
+
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, **dump_kwargs)
+                f.flush()
+                if sync_now:
+                    os.fsync(f.fileno())
+            os.replace(tmp_path, path)
+
+            self._pending.add(path)
+            if sync_now:
+                self._sync_pending()
+
+    def sync(self):
+        """Force le fsync de tous les fichiers écrits depuis le dernier lot"""
+        with self._lock:
+            self._sync_pending()
+
+    def _sync_pending(self):
+        directories = set()
+        for path in self._pending:
+            try:
+                fd = os.open(path, os.O_RDONLY)
+                try:
+                    os.fsync(fd)
+                finally:
+                    os.close(fd)
+                directories.add(os.path.dirname(os.path.abspath(path)))
+            except OSError as e:
+                logging.error(f"Erreur fsync {path}: {str(e)}")
+        for directory in directories:
+            _fsync_directory(directory)
+
+        self._pending.clear()
+        self._writes_since_sync = 0
+        self._last_sync = time.monotonic()
+
+
+def load_json(path, default=None):
+    """Charge un fichier JSON ; un fichier corrompu est mis de côté au lieu d'être écrasé"""
+    if not os.path.exists(path):
+        return {} if default is None else default
+
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (ValueError, OSError) as e:
+        corrupt_path = f"{path}.corrupt-{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+        logging.error(f"Fichier illisible {path} ({str(e)}), déplacé vers {corrupt_path}")
+        try:
+            os.replace(path, corrupt_path)
+        except OSError:
+            pass
+        return {} if default is None else default
+
+
+def recover_checkpoints(directory):
+    """Répare les écritures interrompues d'un dossier au démarrage
+
+    Un fichier temporaire valide est promu si la cible est absente ou illisible,
+    sinon il est supprimé. Retourne la liste des actions effectuées.
+    """
+    actions = []
+    if not os.path.isdir(directory):
+        return actions
+
+    for filename in os.listdir(directory):
+        if not filename.endswith(TMP_SUFFIX):
+            continue
+
+        tmp_path = os.path.join(directory, filename)
+        target_path = tmp_path[:-len(TMP_SUFFIX)]
+
+        if _is_valid_json(tmp_path) and not _is_valid_json(target_path):
+            os.replace(tmp_path, target_path)
+            actions.append(('promu', target_path))
+        else:
+            os.remove(tmp_path)
+            actions.append(('supprimé', tmp_path))
+
+    for action, path in actions:
+        logging.info(f"Reprise après interruption: {path} {action}")
+    return actions
+
+
+def recover_run_directories(pattern, exclude=None):
+    """Répare les dossiers de runs précédents correspondant à `pattern`, sauf `exclude` (le run en cours)
+
+    Retourne les actions effectuées, tous dossiers confondus.
+    """
+    actions = []
+    for directory in sorted(glob.glob(pattern)):
+        if directory != exclude and os.path.isdir(directory):
+            actions.extend(recover_checkpoints(directory))
+    return actions
+
+
+def _is_valid_json(path):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            json.load(f)
+        return True
+    except (ValueError, OSError):
+        return False
+
+
+def _fsync_directory(directory):
+    """Rend le renommage durable (sans effet sur les systèmes sans fsync de dossier)"""
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
@@ -0,0 +1,146 @@
+import logging
+import os
+import time
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+# Métriques CDP retenues (Performance.getMetrics)
+_CDP_METRICS = {
+    'JSHeapUsedSize': 'js_heap_mb',
+    'JSHeapTotalSize': 'js_heap_total_mb',
+    'Nodes': 'dom_nodes',
+    'Documents': 'documents',
+    'JSEventListeners': 'js_listeners',
+}
+_BYTE_METRICS = ('js_heap_mb', 'js_heap_total_mb')
+
+_psutil_warning_logged = False
+
+
+class ChromeSampler:
+    """Ressources d'un navigateur piloté : RSS et CPU de l'arbre de processus, tas JS via CDP
+
+    L'arbre part du processus chromedriver (parent de Chrome et de ses
+    processus de rendu). Sans psutil, seules les métriques CDP sont disponibles.
+    """
+
+    def __init__(self, driver):
+        self.driver = driver
+        self.started_at = time.monotonic()
+        self.tasks = 0
+        self._root = None
+        self._cpu_times = {}  # pid -> temps CPU cumulé au précédent échantillon
+        self._sampled_at = None
+        self._cdp_enabled = False
+
+        global _psutil_warning_logged
+        if psutil is None:
+            if not _psutil_warning_logged:
+                logging.warning("psutil absent (voir requirements.txt) : mémoire et CPU de Chrome non mesurés, "
+                                "seuil CHROME_MAX_RSS_MB inactif (tas JS uniquement)")
+                _psutil_warning_logged = True
+            return
+        try:
+            self._root = psutil.Process(driver.service.process.pid)
+        except (AttributeError, psutil.Error) as e:
+            logging.warning(f"Processus chromedriver introuvable, RSS et CPU non mesurés: {str(e)}")
+
+    def task_done(self):
+        self.tasks += 1
+
+    def _processes(self):
+        try:
+            return [self._root] + self._root.children(recursive=True)
+        except psutil.Error:
+            return []
+
+    def _sample_processes(self, sample):
+        now = time.monotonic()
+        rss = 0
+        cpu_seconds = 0.0
+        cpu_times = {}
+        for process in self._processes():
+            try:
+                rss += process.memory_info().rss
+                times = process.cpu_times()
+            except psutil.Error:
+                continue  # Processus terminé entre l'énumération et la mesure
+            total = times.user + times.system
+            cpu_times[process.pid] = total
+            cpu_seconds += max(0.0, total - self._cpu_times.get(process.pid, 0.0))
+
+        sample['processes'] = len(cpu_times)
+        sample['rss_mb'] = round(rss / 1e6, 1)
+        if self._sampled_at is not None and now > self._sampled_at:
+            sample['cpu_percent'] = round(100 * cpu_seconds / (now - self._sampled_at), 1)
+        self._cpu_times = cpu_times
+        self._sampled_at = now
+
+    def _sample_cdp(self, sample):
+        if not self._cdp_enabled:
+            self.driver.execute_cdp_cmd('Performance.enable', {})
+            self._cdp_enabled = True
+        metrics = self.driver.execute_cdp_cmd('Performance.getMetrics', {}).get('metrics', [])
+        for metric in metrics:
+            name = _CDP_METRICS.get(metric['name'])
+            if name in _BYTE_METRICS:
+                sample[name] = round(metric['value'] / 1e6, 1)
+            elif name is not None:
+                sample[name] = int(metric['value'])
+
+    def sample(self):
+        """Échantillon courant ; les mesures indisponibles sont absentes"""
+        sample = {'tasks': self.tasks, 'age_minutes': round((time.monotonic() - self.started_at) / 60, 1)}
+        if self._root is not None:
+            self._sample_processes(sample)
+        try:
+            self._sample_cdp(sample)
+        except Exception as e:
+            logging.warning(f"Métriques CDP indisponibles: {str(e)}")
+        return sample
+
+
+class RecyclePolicy:
+    """Seuils au-delà desquels un navigateur est relancé entre deux tâches (0 = désactivé)
+
+    Valeurs par défaut surchargées par les variables d'environnement
+    CHROME_MAX_RSS_MB, CHROME_MAX_JS_HEAP_MB, CHROME_MAX_DOM_NODES,
+    CHROME_MAX_TASKS et CHROME_MAX_AGE_MINUTES.
+    """
+
+    THRESHOLDS = (
+        # (attribut, mesure de l'échantillon, variable d'environnement, défaut)
+        ('max_rss_mb', 'rss_mb', 'CHROME_MAX_RSS_MB', 1500),
+        ('max_js_heap_mb', 'js_heap_mb', 'CHROME_MAX_JS_HEAP_MB', 512),
+        ('max_dom_nodes', 'dom_nodes', 'CHROME_MAX_DOM_NODES', 0),
+        ('max_tasks', 'tasks', 'CHROME_MAX_TASKS', 20),
+        ('max_age_minutes', 'age_minutes', 'CHROME_MAX_AGE_MINUTES', 45),
+    )
+
+    def __init__(self, **limits):
+        for attribute, _, _, default in self.THRESHOLDS:
+            setattr(self, attribute, limits.pop(attribute, default))
+        if limits:
+            raise TypeError(f"Seuils inconnus: {', '.join(limits)}")
+
+    @classmethod
+    def from_env(cls):
+        limits = {}
+        for attribute, _, variable, _ in cls.THRESHOLDS:
+            value = os.environ.get(variable)
+            if value:
+                limits[attribute] = float(value)
+        return cls(**limits)
+
+    def reasons(self, sample):
+        """Seuils dépassés par l'échantillon, ex. ['rss_mb>1500']"""
+        reasons = []
+        for attribute, measure, _, _ in self.THRESHOLDS:
+            limit = getattr(self, attribute)
+            value = sample.get(measure)
+            if limit and value is not None and value >= limit:
+                reasons.append(f"{measure}>{limit:g}")
+        return reasons
@@ -0,0 +1,245 @@
+import argparse
+import json
+import logging
+import os
+from datetime import date, datetime, timedelta
+
+import pandas as pd
+
+from export_pipeline import list_result_files, load_result_file, map_files
+from normalized_results import iter_stored_entries
+from rate_buffer import iter_entry_rates
+from rate_class import RateClass
+from task_journal import DONE, load_task_journal
+
+DEAD_CODES_FILE = 'dead_corporate_codes.json'
+# Runs improductifs consécutifs avant d'ignorer un code dans une ville, et délai avant de le réessayer
+DEAD_AFTER_RUNS = 2
+RECHECK_DAYS = 30
+
+# Tranches de délai de réservation (jours entre le scraping et l'arrivée)
+LEAD_TIME_BINS = [-1, 1, 7, 30, 90, 100000]
+LEAD_TIME_LABELS = ['0-1 j', '2-7 j', '8-30 j', '31-90 j', '91+ j']
+
+DIMENSIONS = {
+    'Hôtel': 'hotel',
+    'Ville': 'city',
+    'Durée du séjour': 'nights',
+    'Délai de réservation': 'lead_time',
+}
+
+# Code de classe du tarif public (et membre) comparable à chaque code de tarif corporate
+_PUBLIC_REFERENCES = {code: RateClass.from_code(code).public_reference().code for code in range(8, 16)}
+_MEMBER_REFERENCES = {code: RateClass.from_code(code).public_reference(member=True).code for code in range(8, 16)}
+
+_COLUMNS = (
+    'run', 'scraped_at', 'city', 'hotel', 'room', 'check_in', 'check_out', 'nights',
+    'company', 'code', 'rate_code', 'currency', 'price_cents'
+)
+
+
+def _load_observations(path):
+    """Observations d'un fichier de résultats, en colonnes (exécutée dans le pool)"""
+    columns = {name: [] for name in _COLUMNS}
+    document = load_result_file(path)
+    if document is None:
+        return columns
+
+    run = os.path.basename(os.path.dirname(path))
+    try:
+        for entry in iter_stored_entries(document):
+            stay = (
+                run, entry['Date_Scraping'], entry['Ville'], entry['Hotel'], entry['Chambre'],
+                entry['Date_Arrivee'], entry['Date_Depart'], entry['Nombre_Nuits'],
+                entry.get('Entreprise_Cliente') or '', entry.get('Code_Corporate') or ''
+            )
+            for rate_class, currency, price_cents in iter_entry_rates(entry):
+                if price_cents is None:
+                    continue
+                for name, value in zip(_COLUMNS, stay + (rate_class.code, currency, price_cents)):
+                    columns[name].append(value)
+    except Exception as e:
+        logging.error(f"Fichier de résultats invalide {os.path.basename(path)}: {str(e)}")
+        return {name: [] for name in _COLUMNS}
+    return columns
+
+
+def load_observations(directories, workers=None):
+    """Charge toutes les observations de tarifs des dossiers en un DataFrame long
+
+    Une ligne par (séjour, classe de tarif, devise) ; les fichiers sont lus en parallèle.
+    """
+    files = list_result_files(directories)
+    parts = [pd.DataFrame(columns) for columns in map_files(_load_observations, files, workers)]
+    parts = [part for part in parts if not part.empty]
+    if not parts:
+        return pd.DataFrame({name: [] for name in _COLUMNS})
+    frame = pd.concat(parts, ignore_index=True)
+
+    for name in ('run', 'city', 'hotel', 'room', 'company', 'code', 'currency'):
+        frame[name] = frame[name].astype('category')
+    frame['rate_code'] = frame['rate_code'].astype('int8')
+    frame['corporate'] = (frame['rate_code'] & 8).astype(bool)
+    frame['member'] = (frame['rate_code'] & 4).astype(bool)
+    frame['refundable'] = (frame['rate_code'] & 2).astype(bool)
+    frame['breakfast'] = (frame['rate_code'] & 1).astype(bool)
+
+    scraped_at = pd.to_datetime(frame['scraped_at'], format='%Y-%m-%d %H:%M:%S')
+    check_in = pd.to_datetime(frame['check_in'], format='%Y-%m-%d')
+    frame['lead_days'] = (check_in - scraped_at.dt.normalize()).dt.days
+    frame['lead_time'] = pd.cut(frame['lead_days'], LEAD_TIME_BINS, labels=LEAD_TIME_LABELS)
+    # Un tarif corporate n'a de sens que rattaché au code qui l'a produit
+    return frame[~frame['corporate'] | (frame['code'] != '')]
+
+
+def corporate_comparisons(frame):
+    """Associe chaque tarif corporate aux tarifs public et membre comparables
+
+    La référence est celle de l'export Excel (RateClass.public_reference) :
+    même annulation et même petit déjeuner, pour le même séjour (même relevé,
+    chambre, dates et devise). Retourne un DataFrame avec les remises en
+    pourcentage par rapport au tarif public et au tarif membre ; un tarif
+    corporate sans tarif public comparable est ignoré.
+    """
+    stay_keys = ['run', 'hotel', 'room', 'check_in', 'check_out', 'currency']
+
+    public = (
+        frame[~frame['corporate']]
+        .groupby(stay_keys + ['rate_code'], observed=True)['price_cents'].min()
+        .reset_index()
+    )
+    corporate = frame.loc[frame['corporate'], stay_keys + [
+        'rate_code', 'city', 'nights', 'lead_time', 'company', 'code', 'price_cents'
+    ]]
+    corporate = corporate.assign(
+        public_code=corporate['rate_code'].map(_PUBLIC_REFERENCES).astype('int8'),
+        member_code=corporate['rate_code'].map(_MEMBER_REFERENCES).astype('int8'),
+    )
+    corporate = corporate.merge(
+        public.rename(columns={'rate_code': 'public_code', 'price_cents': 'public_cents'}),
+        on=stay_keys + ['public_code'], how='inner'
+    ).merge(
+        public.rename(columns={'rate_code': 'member_code', 'price_cents': 'member_cents'}),
+        on=stay_keys + ['member_code'], how='left'
+    )
+
+    corporate['discount_public'] = 100 * (1 - corporate['price_cents'] / corporate['public_cents'])
+    corporate['discount_member'] = 100 * (1 - corporate['price_cents'] / corporate['member_cents'])
+    corporate['above_public'] = corporate['discount_public'] < 0
+    return corporate
+
+
+def discount_table(comparisons, dimension):
+    """Remises moyennes de chaque code selon une dimension (hôtel, ville, durée, délai)"""
+    table = comparisons.groupby(['company', 'code', dimension], observed=True).agg(
+        comparaisons=('price_cents', 'size'),
+        remise_public_moyenne=('discount_public', 'mean'),
+        remise_public_mediane=('discount_public', 'median'),
+        remise_membre_moyenne=('discount_member', 'mean'),
+        part_plus_cher_que_public=('above_public', 'mean'),
+    )
+    return table.round(2).reset_index()
+
+
+def load_attempts(directories):
+    """Tentatives de tâches corporate enregistrées au journal de chaque run (tasks.jsonl)"""
+    attempts = []
+    for directory in directories:
+        run = os.path.basename(os.path.normpath(directory))
+        attempts.extend(dict(attempt, run=run) for attempt in load_task_journal(directory) if attempt.get('code'))
+    return attempts
+
+
+def dead_codes(attempts, min_runs=DEAD_AFTER_RUNS, recheck_days=RECHECK_DAYS):
+    """Codes corporate sans tarif corporate dans une ville lors de leurs `min_runs` derniers runs essayés
+
+    Seules les tentatives du journal des tâches comptent. Un run est
+    improductif pour (ville, code) si une tâche y est terminée avec des
+    chambres relevées et qu'aucune tentative n'a vu de tarif corporate ; un run
+    sans tentative valide (plantage, délai dépassé, tâche non planifiée) ne
+    compte pas, un run productif remet le décompte à zéro. Retourne
+    {ville: {code: {'runs', 'last_attempt', 'recheck_after'}}} : le code est
+    de nouveau essayé à partir de recheck_after.
+    """
+    pairs = {}  # (ville, code) -> {run: [productif, tentative valide, dernier jour]}
+    for attempt in attempts:
+        runs = pairs.setdefault((attempt['city'], attempt['code']), {})
+        state = runs.setdefault(attempt['run'], [False, False, ''])
+        state[0] = state[0] or attempt['corporate_rates'] > 0
+        state[1] = state[1] or (attempt['status'] == DONE and attempt['rooms'] > 0)
+        state[2] = max(state[2], attempt['recorded_at'][:10])
+
+    result = {}
+    for (city, code), runs in sorted(pairs.items()):
+        unproductive = 0
+        last_attempt = None
+        # Du run le plus récent au plus ancien, jusqu'au dernier run productif
+        for run in sorted(runs, key=lambda run: (runs[run][2], run), reverse=True):
+            productive, valid, day = runs[run]
+            if productive:
+                break
+            if valid:
+                unproductive += 1
+                last_attempt = last_attempt or day
+        if unproductive >= min_runs:
+            recheck_after = date.fromisoformat(last_attempt) + timedelta(days=recheck_days)
+            result.setdefault(city, {})[code] = {
+                'runs': unproductive,
+                'last_attempt': last_attempt,
+                'recheck_after': recheck_after.isoformat(),
+            }
+    return result
+
+
+def write_report(comparisons, dead, output_dir):
+    """Écrit les tables de remises (un onglet par dimension) et la liste des codes inactifs"""
+    os.makedirs(output_dir, exist_ok=True)
+    current_time = datetime.now().strftime("%Y%m%d_%H%M%S")
+    report_file = os.path.join(output_dir, f"remises_corporate_{current_time}.xlsx")
+    with pd.ExcelWriter(report_file, engine='xlsxwriter') as writer:
+        for sheet_name, dimension in DIMENSIONS.items():
+            discount_table(comparisons, dimension).to_excel(writer, sheet_name=sheet_name, index=False)
+        pd.DataFrame(
+            [(city, code, info['runs'], info['last_attempt'], info['recheck_after'])
+             for city, codes in dead.items() for code, info in codes.items()],
+            columns=['Ville', 'Code corporate', 'Runs sans tarif', 'Dernier essai', 'Revérification']
+        ).to_excel(writer, sheet_name='Codes inactifs', index=False)
+    return report_file
+
+
+def find_scraping_directories():
+    return sorted(item for item in os.listdir('.') if os.path.isdir(item) and item.startswith('scraping_results'))
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    parser = argparse.ArgumentParser(description="Analyse des remises des codes corporate")
+    parser.add_argument('directories', nargs='*', help="Dossiers scraping_results_* (tous par défaut)")
+    parser.add_argument('--workers', type=int, default=None, help="Nombre de processus de lecture")
+    parser.add_argument('--output-dir', default='excel_results')
+    parser.add_argument('--dead-codes-file', default=DEAD_CODES_FILE,
+                        help="Fichier des codes à ignorer lors des prochains runs")
+    parser.add_argument('--dead-after-runs', type=int, default=DEAD_AFTER_RUNS,
+                        help="Runs consécutifs sans tarif corporate avant d'ignorer un code dans une ville")
+    parser.add_argument('--recheck-days', type=int, default=RECHECK_DAYS,
+                        help="Jours avant de réessayer un code ignoré")
+    args = parser.parse_args()
+
+    start = datetime.now()
+    directories = args.directories or find_scraping_directories()
+    frame = load_observations(directories, args.workers)
+    logging.info(f"{len(frame)} observations chargées en {(datetime.now() - start).total_seconds():.1f} s")
+
+    comparisons = corporate_comparisons(frame)
+    dead = dead_codes(load_attempts(directories), args.dead_after_runs, args.recheck_days)
+    report_file = write_report(comparisons, dead, args.output_dir)
+    with open(args.dead_codes_file, 'w', encoding='utf-8') as f:
+        json.dump(dead, f, indent=4, ensure_ascii=False)
+
+    logging.info(f"{len(comparisons)} tarifs corporate comparés, rapport: {report_file}")
+    for city, codes in dead.items():
+        for code, info in codes.items():
+            logging.info(f"Code {code} sans tarif corporate à {city} ({info['runs']} runs), "
+                         f"réessayé à partir du {info['recheck_after']}")
+    logging.info(f"Durée totale: {(datetime.now() - start).total_seconds():.1f} s")
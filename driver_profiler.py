@@ -0,0 +1,141 @@
+import os
+import sys
+import threading
+import time
+
+from metrics import write_text
+
+# Modules dont les méthodes apparaissent dans les piles attribuées aux commandes
+PROFILED_MODULES = ('app_workers', '__main__')
+
+
+class DriverProfiler:
+    """Compte et chronomètre chaque commande WebDriver (aller-retour HTTP vers chromedriver)
+
+    `attach(driver)` remplace `driver.command_executor.execute`, par lequel
+    passent toutes les commandes du driver et de ses éléments (findElement,
+    executeScript, clickElement, get, goBack, refresh...). Chaque commande est
+    attribuée à la pile des méthodes du scraper qui l'ont déclenchée et à
+    l'hôtel en cours (attribut `current_hotel` du worker appelant).
+    """
+
+    def __init__(self, modules=PROFILED_MODULES):
+        self.modules = frozenset(modules)
+        self._lock = threading.Lock()
+        self._stacks = {}  # (méthodes..., commande) -> [appels, secondes]
+        self._hotels = {}  # hôtel -> [appels, secondes]
+
+    def attach(self, driver):
+        executor = driver.command_executor
+        if getattr(executor, '_profiled_by', None) is self:
+            return driver
+        execute = executor.execute
+
+        def profiled_execute(command, params):
+            start = time.perf_counter()
+            try:
+                return execute(command, params)
+            finally:
+                self.record(command, time.perf_counter() - start, sys._getframe(1))
+
+        executor.execute = profiled_execute
+        executor._profiled_by = self
+        return driver
+
+    def record(self, command, seconds, frame):
+        """Attribue une commande à la pile des méthodes profilées (de la plus externe à la plus interne)"""
+        methods = []
+        hotel = None
+        while frame is not None:
+            if frame.f_globals.get('__name__') in self.modules:
+                methods.append(frame.f_code.co_name)
+                if hotel is None:
+                    hotel = getattr(frame.f_locals.get('self'), 'current_hotel', None)
+            frame = frame.f_back
+        key = tuple(reversed(methods)) + (command,)
+
+        with self._lock:
+            stats = self._stacks.get(key)
+            if stats is None:
+                stats = self._stacks[key] = [0, 0.0]
+            stats[0] += 1
+            stats[1] += seconds
+            if hotel is not None:
+                stats = self._hotels.setdefault(hotel, [0, 0.0])
+                stats[0] += 1
+                stats[1] += seconds
+
+    def reset(self):
+        with self._lock:
+            self._stacks.clear()
+            self._hotels.clear()
+
+    def _snapshot(self):
+        with self._lock:
+            return ({key: tuple(value) for key, value in self._stacks.items()},
+                    {key: tuple(value) for key, value in self._hotels.items()})
+
+    def write_folded(self, path, weight='time'):
+        """Piles repliées (« méthode;méthode;commande valeur ») pour flamegraph.pl ou speedscope
+
+        `weight` vaut 'time' (millisecondes) ou 'count' (nombre d'appels).
+        """
+        stacks, _ = self._snapshot()
+        lines = []
+        for key, (count, seconds) in sorted(stacks.items()):
+            value = count if weight == 'count' else int(round(seconds * 1000))
+            if value:
+                lines.append(f"{';'.join(key)} {value}")
+        write_text(path, '\n'.join(lines) + '\n')
+
+    def report(self, top=30):
+        """Rapport texte : commandes, méthodes appelantes et coût par hôtel"""
+        stacks, hotels = self._snapshot()
+        total_calls = sum(count for count, _ in stacks.values())
+        total_seconds = sum(seconds for _, seconds in stacks.values())
+        hotel_count = len(hotels)
+
+        by_command = {}
+        by_method = {}  # (méthode appelante directe, commande) -> [appels, secondes]
+        for key, (count, seconds) in stacks.items():
+            command = key[-1]
+            method = key[-2] if len(key) > 1 else '(hors scraper)'
+            for table, table_key in ((by_command, command), (by_method, (method, command))):
+                stats = table.setdefault(table_key, [0, 0.0])
+                stats[0] += count
+                stats[1] += seconds
+
+        lines = [
+            f"{total_calls} commandes WebDriver, {total_seconds:.1f} s cumulées"
+            + (f", {hotel_count} hôtels ({total_calls / hotel_count:.0f} commandes par hôtel)" if hotel_count else ""),
+            "",
+            f"{'Commande':<28}{'Appels':>10}{'Total (s)':>12}{'Moyenne (ms)':>14}{'Par hôtel':>11}",
+        ]
+        for command, (count, seconds) in sorted(by_command.items(), key=lambda item: -item[1][1]):
+            per_hotel = f"{count / hotel_count:.1f}" if hotel_count else '-'
+            lines.append(f"{command:<28}{count:>10}{seconds:>12.2f}{seconds / count * 1000:>14.1f}{per_hotel:>11}")
+
+        lines += ["", f"{'Méthode':<28}{'Commande':<24}{'Appels':>10}{'Total (s)':>12}{'Par hôtel':>11}"]
+        ranked = sorted(by_method.items(), key=lambda item: -item[1][1])[:top]
+        for (method, command), (count, seconds) in ranked:
+            per_hotel = f"{count / hotel_count:.1f}" if hotel_count else '-'
+            lines.append(f"{method:<28}{command:<24}{count:>10}{seconds:>12.2f}{per_hotel:>11}")
+
+        if hotels:
+            lines += ["", f"{'Hôtel':<48}{'Appels':>10}{'Total (s)':>12}"]
+            for hotel, (count, seconds) in sorted(hotels.items(), key=lambda item: -item[1][1])[:top]:
+                lines.append(f"{hotel[:47]:<48}{count:>10}{seconds:>12.2f}")
+        return '\n'.join(lines) + '\n'
+
+    def write_report(self, path_prefix):
+        """Écrit <préfixe>.folded (temps), <préfixe>_calls.folded (appels) et <préfixe>.txt"""
+        self.write_folded(f"{path_prefix}.folded", weight='time')
+        self.write_folded(f"{path_prefix}_calls.folded", weight='count')
+        write_text(f"{path_prefix}.txt", self.report())
+
+
+def profiler_from_env():
+    """Profileur activé par la variable d'environnement SCRAPING_PROFILE_DRIVER=1, sinon None"""
+    if os.environ.get('SCRAPING_PROFILE_DRIVER', '').lower() in ('1', 'true', 'yes'):
+        return DriverProfiler()
+    return None
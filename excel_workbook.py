@@ -0,0 +1,255 @@
+import re
+
+from export_pipeline import FIXED_COLUMNS
+from rate_class import RateClass
+
+# Limite de lignes d'une feuille Excel (en-tête compris)
+EXCEL_MAX_ROWS = 1048576
+
+MAIN_SHEET = 'Prix Hôtels'
+CITY_SHEET = 'Synthèse villes'
+DISCOUNT_SHEET = 'Remises corporate'
+
+CITY_COLUMNS = [
+    'Ville', 'Pays', 'Devise', 'Type de tarif', 'Hôtels', 'Observations',
+    'Prix min', 'Prix moyen', 'Prix max'
+]
+DISCOUNT_COLUMNS = [
+    'Entreprise cliente', 'Code corporate', 'Ville', 'Devise', 'Tarif corporate',
+    'Tarif public de référence', 'Comparaisons', 'Remise moyenne (%)',
+    'Remise min (%)', 'Remise max (%)', 'Économie moyenne'
+]
+
+# Tarif public comparable à chaque tarif corporate (même annulation, même petit déjeuner)
+CORPORATE_REFERENCES = {
+    rate_class.label: rate_class.public_reference().label
+    for rate_class in map(RateClass.from_code, range(16)) if rate_class.corporate and not rate_class.member
+}
+
+_INVALID_SHEET_CHARS = re.compile(r'[\[\]:*?/\\]')
+
+_CITY = FIXED_COLUMNS.index('Ville')
+_COUNTRY = FIXED_COLUMNS.index('Pays')
+_HOTEL = FIXED_COLUMNS.index('Hôtel')
+_COMPANY = FIXED_COLUMNS.index('Entreprise cliente')
+_CODE = FIXED_COLUMNS.index('Code corporate')
+_CURRENCY = FIXED_COLUMNS.index('Devise')
+
+
+class PriceStats:
+    """Agrégat incrémental (nombre, somme, min, max) d'une série de valeurs"""
+
+    __slots__ = ('count', 'total', 'minimum', 'maximum')
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.minimum = None
+        self.maximum = None
+
+    def add(self, value):
+        self.count += 1
+        self.total += value
+        if self.minimum is None or value < self.minimum:
+            self.minimum = value
+        if self.maximum is None or value > self.maximum:
+            self.maximum = value
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else None
+
+
+class SheetNames:
+    """Noms de feuilles valides pour Excel : 31 caractères, sans []:*?/\\, uniques"""
+
+    def __init__(self):
+        self._used = set()
+
+    def reserve(self, name, suffix=''):
+        base = _INVALID_SHEET_CHARS.sub('_', str(name)).strip("' ") or 'Feuille'
+        candidate = base[:31 - len(suffix)] + suffix
+        number = 2
+        while candidate.lower() in self._used:
+            extra = f" ~{number}"
+            candidate = base[:31 - len(suffix) - len(extra)] + suffix + extra
+            number += 1
+        self._used.add(candidate.lower())
+        return candidate
+
+
+class SheetWriter:
+    """Écrit des lignes dans une feuille, découpée automatiquement à la limite d'Excel
+
+    Au-delà de `max_rows` lignes (en-tête compris), les lignes suivantes sont
+    écrites dans une feuille de continuation « <nom> (2) », « <nom> (3) »...
+    """
+
+    def __init__(self, workbook, name, columns, formats, names, max_rows=EXCEL_MAX_ROWS):
+        self.workbook = workbook
+        self.name = name
+        self.columns = columns
+        self.formats = formats
+        self.names = names
+        self.max_rows = max_rows
+        self.row_count = 0
+        self.sheet_count = 0
+        self._worksheet = None
+        self._sheet_row = 0
+
+    def write(self, row):
+        if self._worksheet is None or self._sheet_row >= self.max_rows - 1:
+            self._next_sheet()
+        self._sheet_row += 1
+        self.row_count += 1
+        self._worksheet.write_row(self._sheet_row, 0, row)
+
+    def close(self):
+        """Termine la feuille courante (une feuille vide est créée s'il n'y a aucune ligne)"""
+        if self._worksheet is None:
+            self._next_sheet()
+        self._finish_sheet()
+
+    def _next_sheet(self):
+        if self._worksheet is not None:
+            self._finish_sheet()
+        self.sheet_count += 1
+        suffix = f" ({self.sheet_count})" if self.sheet_count > 1 else ''
+        self._worksheet = self.workbook.add_worksheet(self.names.reserve(self.name, suffix))
+        self._sheet_row = 0
+        self._write_header()
+
+    def _write_header(self):
+        worksheet = self._worksheet
+        for col_num, value in enumerate(self.columns):
+            worksheet.write(0, col_num, value, self.formats['header'])
+
+            if 'Date' in value:
+                worksheet.set_column(col_num, col_num, 15, self.formats['date'])
+            elif '(%)' in value:
+                worksheet.set_column(col_num, col_num, 15, self.formats['percent'])
+            elif any(x in value for x in ['Tarif', 'REMISE', 'SANS REMISE', 'Prix', 'Économie']):
+                worksheet.set_column(col_num, col_num, 15, self.formats['price'])
+            else:
+                worksheet.set_column(col_num, col_num, 20)
+
+    def _finish_sheet(self):
+        # Ajouter un filtre automatique
+        self._worksheet.autofilter(0, 0, self._sheet_row, len(self.columns) - 1)
+
+
+class AnalyticsWorkbook:
+    """Classeur d'analyse écrit en un seul passage sur les lignes d'export
+
+    Chaque ligne est écrite dans la feuille principale et dans la feuille de son
+    entreprise cliente ; la synthèse par ville et la table des remises corporate
+    sont agrégées au fil de l'eau (mémoire proportionnelle au nombre de groupes)
+    puis écrites à la fermeture. Le classeur doit être ouvert en mode
+    constant_memory : chaque feuille ne garde que sa ligne courante.
+    """
+
+    def __init__(self, workbook, columns, max_rows=EXCEL_MAX_ROWS):
+        self.workbook = workbook
+        self.columns = columns
+        self.max_rows = max_rows
+        self.names = SheetNames()
+        self.formats = {
+            'header': workbook.add_format({
+                'bold': True,
+                'text_wrap': True,
+                'valign': 'top',
+                'bg_color': '#D9E1F2',
+                'border': 1
+            }),
+            'price': workbook.add_format({'num_format': '#,##0.00'}),
+            'date': workbook.add_format({'num_format': 'yyyy-mm-dd'}),
+            'percent': workbook.add_format({'num_format': '0.0'}),
+        }
+
+        # Feuilles créées dès maintenant pour fixer leur ordre dans le classeur
+        self.main = self._sheet(MAIN_SHEET, columns)
+        self.main._next_sheet()
+        self.city_sheet = self._sheet(CITY_SHEET, CITY_COLUMNS)
+        self.city_sheet._next_sheet()
+        self.discount_sheet = self._sheet(DISCOUNT_SHEET, DISCOUNT_COLUMNS)
+        self.discount_sheet._next_sheet()
+        self.company_sheets = {}
+
+        rate_columns = columns[len(FIXED_COLUMNS):]
+        self._rate_columns = list(enumerate(rate_columns, len(FIXED_COLUMNS)))
+        self._corporate_pairs = [
+            (columns.index(corporate), columns.index(public), corporate, public)
+            for corporate, public in CORPORATE_REFERENCES.items()
+            if corporate in rate_columns and public in rate_columns
+        ]
+        self._city_stats = {}  # (ville, pays, devise) -> {type de tarif: PriceStats}
+        self._city_hotels = {}  # (ville, pays, devise) -> ensemble des hôtels
+        self._discounts = {}  # (entreprise, code, ville, devise, tarif corporate, tarif public) -> (remises, économies)
+
+    def _sheet(self, name, columns):
+        return SheetWriter(self.workbook, name, columns, self.formats, self.names, self.max_rows)
+
+    def write_rows(self, rows):
+        """Écrit et agrège toutes les lignes ; retourne le nombre de lignes de la feuille principale"""
+        for row in rows:
+            self.write_row(row)
+        return self.main.row_count
+
+    def write_row(self, row):
+        self.main.write(row)
+
+        company = row[_COMPANY]
+        if company:
+            sheet = self.company_sheets.get(company)
+            if sheet is None:
+                sheet = self.company_sheets[company] = self._sheet(company, self.columns)
+            sheet.write(row)
+            self._add_discounts(row)
+        self._add_city(row)
+
+    def _add_city(self, row):
+        group = (row[_CITY], row[_COUNTRY], row[_CURRENCY])
+        stats = self._city_stats.get(group)
+        if stats is None:
+            stats = self._city_stats[group] = {}
+            self._city_hotels[group] = set()
+        self._city_hotels[group].add(row[_HOTEL])
+        for index, rate_type in self._rate_columns:
+            price = row[index]
+            if price is not None:
+                if rate_type not in stats:
+                    stats[rate_type] = PriceStats()
+                stats[rate_type].add(price)
+
+    def _add_discounts(self, row):
+        for corporate_index, public_index, corporate, public in self._corporate_pairs:
+            corporate_price, public_price = row[corporate_index], row[public_index]
+            if corporate_price is None or not public_price:
+                continue
+            group = (row[_COMPANY], row[_CODE], row[_CITY], row[_CURRENCY], corporate, public)
+            stats = self._discounts.get(group)
+            if stats is None:
+                stats = self._discounts[group] = (PriceStats(), PriceStats())
+            stats[0].add(100 * (public_price - corporate_price) / public_price)
+            stats[1].add(public_price - corporate_price)
+
+    def close(self):
+        """Écrit les feuilles de synthèse et termine toutes les feuilles"""
+        for group in sorted(self._city_stats):
+            city, country, currency = group
+            hotels = len(self._city_hotels[group])
+            for rate_type, stats in sorted(self._city_stats[group].items()):
+                self.city_sheet.write([
+                    city, country, currency, rate_type, hotels, stats.count,
+                    stats.minimum, stats.mean, stats.maximum
+                ])
+
+        for group in sorted(self._discounts):
+            discounts, savings = self._discounts[group]
+            self.discount_sheet.write([
+                *group, discounts.count, discounts.mean, discounts.minimum,
+                discounts.maximum, savings.mean
+            ])
+
+        for sheet in [self.main, self.city_sheet, self.discount_sheet, *self.company_sheets.values()]:
+            sheet.close()
@@ -0,0 +1,346 @@
+import hashlib
+import json
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from normalized_results import iter_flat_entries
+from rate_buffer import iter_entry_rate_slots
+from rate_class import RateClass
+
+FIXED_COLUMNS = [
+    'Date de scraping',
+    'Pays',
+    'Ville',
+    'Hôtel',
+    'Chaîne',
+    'Type de chambre',
+    'Entreprise cliente',
+    'Code corporate',
+    'Staying date (début)',
+    'Staying date (fin)',
+    'Durée du séjour (# de nuits)',
+    'Devise'
+]
+
+CURRENCIES = ['EUR', 'USD']
+
+# Bits réservés à l'index du fichier dans la valeur compacte des gagnants
+_FILE_BITS = 20
+
+# Libellé de colonne de chaque code de classe de tarif
+_RATE_LABELS = {code: RateClass.from_code(code).label for code in range(16)}
+
+
+def list_result_files(directories):
+    """Liste les fichiers JSON de résultats des dossiers donnés"""
+    files = []
+    for directory in directories:
+        for filename in sorted(os.listdir(directory)):
+            if filename.endswith('.json'):
+                files.append(os.path.join(directory, filename))
+    return files
+
+
+def load_result_file(path):
+    """Charge un fichier de résultats (None s'il est illisible)"""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except Exception as e:
+        logging.error(f"Erreur lors de la lecture de {os.path.basename(path)}: {str(e)}")
+        return None
+
+
+def key_digest(entry_key):
+    """Empreinte entière (64 bits) d'une clé d'entrée, stable d'un processus à l'autre"""
+    return int.from_bytes(hashlib.blake2b(entry_key.encode('utf-8'), digest_size=8).digest(), 'big')
+
+
+def scraping_timestamp(date_scraping):
+    """Convertit 'YYYY-MM-DD HH:MM:SS' en entier YYYYMMDDHHMMSS (ordre chronologique, sans strptime)"""
+    return int(date_scraping[0:4] + date_scraping[5:7] + date_scraping[8:10]
+               + date_scraping[11:13] + date_scraping[14:16] + date_scraping[17:19])
+
+
+class ExportPlan:
+    """Résultat du premier passage : fichier gagnant de chaque entrée et schéma des colonnes
+
+    Seules des empreintes entières sont conservées par entrée : la mémoire dépend
+    du nombre d'entrées distinctes, pas du volume des fichiers.
+    """
+
+    def __init__(self, files):
+        self.files = files
+        self.winners = {}  # empreinte de clé -> horodatage << _FILE_BITS | index du fichier
+        self.rate_slots = set()  # (RateClass, devise) observés
+        self.entry_count = 0
+
+    def is_winner(self, entry_key, file_index):
+        packed = self.winners.get(key_digest(entry_key))
+        return packed is not None and packed & ((1 << _FILE_BITS) - 1) == file_index
+
+    @property
+    def rate_columns(self):
+        """Colonnes de tarifs triées par libellé"""
+        return sorted({rate_class.label for rate_class, _ in self.rate_slots})
+
+    @property
+    def columns(self):
+        return FIXED_COLUMNS + self.rate_columns
+
+
+def _scan_file(path):
+    """Analyse d'un fichier (exécutée dans un processus du pool)
+
+    Retourne ({empreinte: horodatage}, ensemble des (RateClass, devise)) ou None.
+    """
+    document = load_result_file(path)
+    if document is None:
+        return None
+    winners = {}
+    rate_slots = set()
+    try:
+        for entry_key, entry in iter_flat_entries(document):
+            winners[key_digest(entry_key)] = scraping_timestamp(entry['Date_Scraping'])
+            rate_slots.update(iter_entry_rate_slots(entry))
+    except Exception as e:
+        logging.error(f"Fichier de résultats invalide {os.path.basename(path)}: {str(e)}")
+        return None
+    return winners, rate_slots
+
+
+def map_files(function, files, workers):
+    """Applique `function` à chaque fichier, en parallèle si possible, en conservant l'ordre"""
+    if workers is None:
+        workers = os.cpu_count() or 1
+    workers = min(workers, len(files))
+    if workers <= 1:
+        return map(function, files)
+    executor = ProcessPoolExecutor(max_workers=workers)
+    try:
+        return list(executor.map(function, files, chunksize=1))
+    finally:
+        executor.shutdown()
+
+
+def scan_result_files(files, workers=None):
+    """Premier passage peu coûteux : déduplication par date de scraping et découverte du schéma
+
+    Les fichiers sont analysés en parallèle ; seuls des entiers remontent au processus principal.
+    """
+    plan = ExportPlan(files)
+    for file_index, result in enumerate(map_files(_scan_file, files, workers)):
+        if result is None:
+            continue
+        winners, rate_slots = result
+        plan.rate_slots.update(rate_slots)
+        for digest, timestamp in winners.items():
+            packed = timestamp << _FILE_BITS | file_index
+            current = plan.winners.get(digest)
+            if current is None:
+                plan.entry_count += 1
+                plan.winners[digest] = packed
+            elif timestamp > current >> _FILE_BITS:
+                plan.winners[digest] = packed
+    return plan
+
+
+def load_partial_map(path):
+    """Charge un fichier en carte partielle {clé: (horodatage, entrée)} (exécutée dans le pool)
+
+    Retourne None si le fichier est illisible ou invalide.
+    """
+    document = load_result_file(path)
+    if document is None:
+        return None
+    try:
+        return {
+            entry_key: (scraping_timestamp(entry['Date_Scraping']), entry)
+            for entry_key, entry in iter_flat_entries(document)
+        }
+    except Exception as e:
+        logging.error(f"Fichier de résultats invalide {os.path.basename(path)}: {str(e)}")
+        return None
+
+
+def merge_partial_maps(older, newer):
+    """Fusionne deux cartes partielles ; à date égale, l'entrée de `older` est conservée"""
+    if len(newer) > len(older):
+        # Parcourir la plus petite carte, en inversant la règle d'égalité
+        merged = newer
+        for entry_key, candidate in older.items():
+            current = merged.get(entry_key)
+            if current is None or candidate[0] >= current[0]:
+                merged[entry_key] = candidate
+        return merged
+
+    for entry_key, candidate in newer.items():
+        current = older.get(entry_key)
+        if current is None or candidate[0] > current[0]:
+            older[entry_key] = candidate
+    return older
+
+
+def merge_result_files(files, workers=None):
+    """Charge les fichiers en parallèle puis fusionne les cartes partielles en arbre
+
+    Retourne {clé: entrée} en conservant l'entrée la plus récente de chaque clé
+    (la première rencontrée à date égale, comme la fusion séquentielle).
+    """
+    partials = [partial or {} for partial in map_files(load_partial_map, files, workers)]
+    if not partials:
+        return {}
+
+    # Réduction par paires de cartes adjacentes : l'ordre des fichiers est préservé
+    while len(partials) > 1:
+        merged = [
+            merge_partial_maps(partials[i], partials[i + 1])
+            for i in range(0, len(partials) - 1, 2)
+        ]
+        if len(partials) % 2:
+            merged.append(partials[-1])
+        partials = merged
+
+    return {entry_key: entry for entry_key, (_, entry) in partials[0].items()}
+
+
+def parse_prices(prices):
+    """Analyse vectorisée d'une série de prix texte ("1 234,56 €") en float
+
+    Mêmes règles qu'extract_price : symboles et espaces retirés, virgule décimale.
+    Seules les valeurs distinctes sont analysées (les prix se répètent beaucoup
+    d'un séjour et d'une classe de tarif à l'autre).
+    """
+    codes, uniques = pd.factorize(prices)
+    cleaned = (
+        pd.Series(uniques, dtype='object')
+        .str.replace(r'[€$\s]', '', regex=True)
+        .str.replace(',', '.', regex=False)
+        .str.extract(r'(\d+(?:\.\d+)?)', expand=False)
+    )
+    parsed = np.append(pd.to_numeric(cleaned, errors='coerce').to_numpy(dtype='float64'), np.nan)
+    # Code -1 (valeur manquante) -> dernière case, NaN
+    return parsed[codes]
+
+
+def split_tarif_keys(keys):
+    """Découpe vectorisée des clés composites '<classe> - <devise>'
+
+    Retourne (codes de classe de tarif, devises) sous forme de tableaux numpy.
+    """
+    codes, uniques = pd.factorize(keys)
+    parts = pd.Series(uniques, dtype='object').str.rpartition(' - ')
+    # Une analyse de libellé par clé distincte
+    rate_codes = np.array([RateClass.from_label(label).code for label in parts[0]], dtype='int64')
+    return rate_codes[codes], parts[2].to_numpy(dtype='object')[codes]
+
+
+def pivot_rates(entries, rate_columns):
+    """Pivote un paquet d'entrées en une matrice de prix (séjour x devise, colonne de tarif)
+
+    Les tarifs sont d'abord collectés en format long (séjour, classe, devise,
+    prix) ; les clés composites et les prix texte des anciens fichiers sont
+    traités par opérations vectorisées, puis tous les prix sont placés dans la
+    matrice en une seule affectation indexée. Retourne (séjours, matrice) ; la
+    ligne 2*i + j correspond au séjour i dans la devise CURRENCIES[j].
+    """
+    stays = []
+    legacy_stays, legacy_keys, legacy_prices = [], [], []
+    stay_ids, rate_codes, currencies, prices = [], [], [], []
+
+    for stay_id, entry in enumerate(entries):
+        stays.append((
+            entry['Date_Scraping'],
+            entry.get('Pays'),
+            entry['Ville'],
+            entry['Hotel'],
+            entry['Chaine'],
+            entry['Chambre'],
+            entry.get('Entreprise_Cliente') or '',
+            entry.get('Code_Corporate') or '',
+            entry['Date_Arrivee'],
+            entry['Date_Depart'],
+            entry['Nombre_Nuits']
+        ))
+        tarifs = entry.get('Tarifs', ())
+        if isinstance(tarifs, dict):
+            legacy_stays.append(len(tarifs))
+            legacy_keys.extend(tarifs)
+            legacy_prices.extend(tarifs.values())
+        else:
+            legacy_stays.append(0)
+            for fields in tarifs:
+                stay_ids.append(stay_id)
+                rate_codes.append(RateClass.from_fields(fields).code)
+                currencies.append(fields['Devise'])
+                prices.append(fields['Prix_Centimes'])
+
+    stay_ids = np.array(stay_ids, dtype='int64')
+    rate_codes = np.array(rate_codes, dtype='int64')
+    currencies = np.array(currencies, dtype='object')
+    prices = np.array(prices, dtype='float64') / 100
+    if legacy_keys:
+        legacy_codes, legacy_currencies = split_tarif_keys(np.array(legacy_keys, dtype='object'))
+        stay_ids = np.concatenate([stay_ids, np.repeat(np.arange(len(stays)), legacy_stays)])
+        rate_codes = np.concatenate([rate_codes, legacy_codes])
+        currencies = np.concatenate([currencies, legacy_currencies])
+        prices = np.concatenate([prices, parse_prices(np.array(legacy_prices, dtype='object'))])
+
+    # Colonne de chaque code de classe (-1 si la classe n'est pas exportée)
+    column_index = {label: index for index, label in enumerate(rate_columns)}
+    code_columns = np.array([column_index.get(_RATE_LABELS[code], -1) for code in range(16)], dtype='int64')
+    columns = code_columns[rate_codes]
+    currency_rows = pd.Index(CURRENCIES).get_indexer(currencies)
+
+    kept = (columns >= 0) & (currency_rows >= 0)
+    matrix = np.full((len(stays) * len(CURRENCIES), len(rate_columns)), np.nan)
+    # À cellule égale, la dernière observation l'emporte (comme les clés d'un dictionnaire)
+    matrix[stay_ids[kept] * len(CURRENCIES) + currency_rows[kept], columns[kept]] = prices[kept]
+    return stays, matrix
+
+
+def iter_entry_rows(entries, rate_columns, chunk_size=50000):
+    """Génère paresseusement les lignes d'export (une par devise) d'un flux d'entrées
+
+    Les entrées sont traitées par paquets de `chunk_size` (un pivot vectorisé par
+    paquet) : la mémoire reste bornée quel que soit le volume du flux.
+    """
+    chunk = []
+    for entry in entries:
+        chunk.append(entry)
+        if len(chunk) >= chunk_size:
+            yield from _iter_chunk_rows(chunk, rate_columns)
+            chunk = []
+    if chunk:
+        yield from _iter_chunk_rows(chunk, rate_columns)
+
+
+def _iter_chunk_rows(entries, rate_columns):
+    stays, matrix = pivot_rates(entries, rate_columns)
+    # Les cellules vides sont écrites comme None (xlsxwriter refuse NaN)
+    cells = np.where(np.isnan(matrix), None, matrix).tolist()
+    for index, stay in enumerate(stays):
+        for offset, currency in enumerate(CURRENCIES):
+            yield [*stay, currency, *cells[index * len(CURRENCIES) + offset]]
+
+
+def iter_export_rows(plan):
+    """Second passage : génère paresseusement les lignes (listes ordonnées comme plan.columns)
+
+    Les fichiers sont relus un par un ; seules les entrées gagnantes du fichier
+    courant sont transformées en lignes.
+    """
+    rate_columns = plan.rate_columns
+    for file_index, path in enumerate(plan.files):
+        document = load_result_file(path)
+        if document is None:
+            continue
+
+        yield from iter_entry_rows(
+            (entry for entry_key, entry in iter_flat_entries(document) if plan.is_winner(entry_key, file_index)),
+            rate_columns
+        )
@@ -0,0 +1,267 @@
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+
+from export_pipeline import FIXED_COLUMNS, load_partial_map, map_files
+from rate_buffer import iter_entry_rate_slots
+from rate_class import RateClass
+
+STATE_FILE = 'export_state.sqlite'
+# Version du schéma (PRAGMA user_version) ; un état plus ancien est reconstruit une fois
+STATE_VERSION = 3
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime REAL NOT NULL,
+    sha256 TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS entries (
+    entry_key TEXT PRIMARY KEY,
+    scraped_at INTEGER NOT NULL,
+    path TEXT NOT NULL,
+    entry TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS entries_path ON entries (path);
+CREATE TABLE IF NOT EXISTS candidates (
+    entry_key TEXT NOT NULL,
+    path TEXT NOT NULL,
+    scraped_at INTEGER NOT NULL,
+    PRIMARY KEY (path, entry_key)
+);
+CREATE INDEX IF NOT EXISTS candidates_key ON candidates (entry_key, scraped_at);
+CREATE TABLE IF NOT EXISTS file_rate_slots (
+    path TEXT NOT NULL,
+    rate_class INTEGER NOT NULL,
+    currency TEXT NOT NULL,
+    PRIMARY KEY (path, rate_class, currency)
+);
+"""
+
+
+def file_sha256(path, chunk_size=1 << 20):
+    """Empreinte SHA-256 du contenu d'un fichier, lu par blocs"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def load_signed_file(path):
+    """Charge un fichier dans le pool : (signature (taille, date, SHA-256), carte partielle)
+
+    La signature est prise avant la lecture ; si le fichier a changé pendant la
+    lecture (écriture en cours), la carte est None et le fichier sera relu au
+    prochain export. Carte None aussi pour un fichier illisible.
+    """
+    try:
+        stat = os.stat(path)
+        signature = (stat.st_size, stat.st_mtime, file_sha256(path))
+    except OSError as e:
+        logging.error(f"Fichier de résultats inaccessible {os.path.basename(path)}: {str(e)}")
+        return None, None
+    partial = load_partial_map(path)
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return signature, None
+    if (stat.st_size, stat.st_mtime) != signature[:2]:
+        logging.warning(f"{os.path.basename(path)} modifié pendant la lecture, relu au prochain export")
+        return signature, None
+    return signature, partial
+
+
+class ExportState:
+    """État fusionné persistant des exports, avec manifeste des fichiers sources
+
+    Le manifeste enregistre taille, date de modification et SHA-256 de chaque
+    fichier, et `candidates` la date de chaque entrée de chaque fichier. Un
+    export suivant ne relit que les fichiers nouveaux ou modifiés : les entrées
+    d'un fichier modifié ou disparu sont retirées, le fichier est relu, et les
+    clés qu'il remportait reviennent au meilleur candidat restant (seul son
+    fichier est relu). Les colonnes de tarifs sont enregistrées par fichier et
+    disparaissent avec le dernier fichier qui les contenait. Un fichier
+    illisible n'entre pas au manifeste et sera retenté au prochain export.
+    """
+
+    def __init__(self, path=STATE_FILE):
+        self.path = path
+        self.connection = sqlite3.connect(path)
+        self.connection.executescript(_SCHEMA)
+        version = self.connection.execute("PRAGMA user_version").fetchone()[0]
+        self._outdated = version < STATE_VERSION
+        if self._outdated and self.connection.execute("SELECT 1 FROM files LIMIT 1").fetchone() is None:
+            self.connection.execute(f"PRAGMA user_version = {STATE_VERSION}")
+            self._outdated = False
+
+    def close(self):
+        self.connection.close()
+
+    def _manifest(self):
+        return {
+            path: (size, mtime, sha256)
+            for path, size, mtime, sha256 in self.connection.execute("SELECT path, size, mtime, sha256 FROM files")
+        }
+
+    def classify_files(self, files):
+        """Retourne (fichiers nouveaux, fichiers modifiés ou disparus, fichiers dont seule la date a changé)
+
+        Le SHA-256 n'est recalculé que si la taille ou la date de modification a changé.
+        """
+        manifest = self._manifest()
+        new_files, changed, touched = [], [], []
+        for path in files:
+            stat = os.stat(path)
+            known = manifest.pop(path, None)
+            if known is None:
+                new_files.append(path)
+            elif (stat.st_size, stat.st_mtime) != known[:2]:
+                if stat.st_size == known[0] and file_sha256(path) == known[2]:
+                    touched.append(path)
+                else:
+                    changed.append(path)
+        changed.extend(manifest)  # Fichiers disparus
+        return new_files, changed, touched
+
+    def update(self, files, workers=None, full=False):
+        """Intègre les fichiers nouveaux ou modifiés à l'état ; retourne le nombre de fichiers lus"""
+        if full or self._outdated:
+            if self._outdated:
+                logging.info("État d'export d'une version précédente : reconstruction complète")
+            with self.connection:
+                for table in ('files', 'entries', 'candidates', 'file_rate_slots'):
+                    self.connection.execute(f"DELETE FROM {table}")
+                self.connection.execute("DROP TABLE IF EXISTS rate_slots")  # Version 2 : colonnes jamais retirées
+                self.connection.execute(f"PRAGMA user_version = {STATE_VERSION}")
+            self._outdated = False
+
+        new_files, changed, touched = self.classify_files(files)
+        with self.connection:
+            for path in touched:
+                stat = os.stat(path)
+                self.connection.execute("UPDATE files SET mtime = ? WHERE path = ?", (stat.st_mtime, path))
+
+        orphans = set()
+        if changed:
+            logging.info(f"{len(changed)} fichier(s) modifié(s) ou supprimé(s) : mise à jour de leurs entrées")
+            orphans = self._remove_files(changed)
+            present = set(files)
+            new_files.extend(path for path in changed if path in present)
+
+        if not new_files and not orphans:
+            logging.info("État d'export à jour, aucun nouveau fichier")
+            return 0
+
+        logging.info(f"Intégration de {len(new_files)} fichier(s) à l'état d'export")
+        # Par lots, pour ne garder en mémoire que quelques fichiers chargés à la fois
+        batch_size = 2 * (workers or os.cpu_count() or 1)
+        for start in range(0, len(new_files), batch_size):
+            batch = new_files[start:start + batch_size]
+            for path, (signature, partial) in zip(batch, map_files(load_signed_file, batch, workers)):
+                if partial is not None:
+                    self._merge_file(path, signature, partial)
+        if orphans:
+            self._restore_winners(orphans, workers)
+        return len(new_files)
+
+    def _remove_files(self, paths):
+        """Retire les entrées, candidats et colonnes de tarifs de fichiers ; retourne les clés qui ont perdu leur entrée"""
+        orphans = set()
+        with self.connection:
+            for path in paths:
+                orphans.update(key for (key,) in self.connection.execute(
+                    "SELECT entry_key FROM entries WHERE path = ?", (path,)
+                ))
+                for table in ('entries', 'candidates', 'file_rate_slots', 'files'):
+                    self.connection.execute(f"DELETE FROM {table} WHERE path = ?", (path,))
+        return orphans
+
+    def _restore_winners(self, keys, workers):
+        """Rend à chaque clé orpheline l'entrée de son meilleur candidat restant"""
+        reload = {}  # fichier -> clés à reprendre de ce fichier
+        for entry_key in keys:
+            best = self.connection.execute(
+                "SELECT path, scraped_at FROM candidates WHERE entry_key = ? ORDER BY scraped_at DESC LIMIT 1",
+                (entry_key,)
+            ).fetchone()
+            if best is None:
+                continue  # Clé disparue de tous les fichiers
+            current = self.connection.execute(
+                "SELECT scraped_at FROM entries WHERE entry_key = ?", (entry_key,)
+            ).fetchone()
+            if current is None or current[0] < best[1]:
+                reload.setdefault(best[0], set()).add(entry_key)
+
+        paths = list(reload)
+        for path, (_, partial) in zip(paths, map_files(load_signed_file, paths, workers)):
+            if partial is None:
+                continue
+            rows = [
+                (entry_key, partial[entry_key][0], path, json.dumps(partial[entry_key][1], ensure_ascii=False))
+                for entry_key in reload[path] if entry_key in partial
+            ]
+            with self.connection:
+                self._upsert_entries(rows)
+
+    def _upsert_entries(self, rows):
+        self.connection.executemany(
+            "INSERT INTO entries (entry_key, scraped_at, path, entry) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT(entry_key) DO UPDATE SET scraped_at = excluded.scraped_at, "
+            "path = excluded.path, entry = excluded.entry "
+            "WHERE excluded.scraped_at > entries.scraped_at",
+            rows
+        )
+
+    def _merge_file(self, path, signature, partial):
+        """Fusionne la carte partielle d'un fichier : l'entrée la plus récente l'emporte"""
+        rate_slots = set()
+        rows = []
+        for entry_key, (scraped_at, entry) in partial.items():
+            rows.append((entry_key, scraped_at, path, json.dumps(entry, ensure_ascii=False)))
+            rate_slots.update(iter_entry_rate_slots(entry))
+
+        with self.connection:
+            self._upsert_entries(rows)
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO candidates (entry_key, path, scraped_at) VALUES (?, ?, ?)",
+                ((entry_key, path, scraped_at) for entry_key, scraped_at, _, _ in rows)
+            )
+            self.connection.executemany(
+                "INSERT OR IGNORE INTO file_rate_slots (path, rate_class, currency) VALUES (?, ?, ?)",
+                ((path, rate_class.code, currency) for rate_class, currency in rate_slots)
+            )
+            # Signature prise avant la lecture : une écriture concurrente rendra le fichier « modifié »
+            self.connection.execute(
+                "INSERT OR REPLACE INTO files (path, size, mtime, sha256) VALUES (?, ?, ?, ?)",
+                (path,) + tuple(signature)
+            )
+
+    @property
+    def entry_count(self):
+        return self.connection.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+
+    @property
+    def rate_slots(self):
+        """Ensemble des (RateClass, devise) observés dans les fichiers du manifeste"""
+        return {
+            (RateClass.from_code(code), currency)
+            for code, currency in self.connection.execute("SELECT DISTINCT rate_class, currency FROM file_rate_slots")
+        }
+
+    @property
+    def rate_columns(self):
+        return sorted({rate_class.label for rate_class, _ in self.rate_slots})
+
+    @property
+    def columns(self):
+        return FIXED_COLUMNS + self.rate_columns
+
+    def iter_entries(self):
+        """Itère sur les entrées fusionnées en streaming depuis la base"""
+        cursor = self.connection.execute("SELECT entry FROM entries ORDER BY rowid")
+        for (entry,) in cursor:
+            yield json.loads(entry)
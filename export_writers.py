@@ -0,0 +1,153 @@
+import csv
+import gzip
+import logging
+import time
+
+import xlsxwriter
+
+from excel_workbook import AnalyticsWorkbook, EXCEL_MAX_ROWS
+from export_pipeline import FIXED_COLUMNS
+
+# Extension de fichier de chaque format de sortie
+FORMAT_EXTENSIONS = {
+    'xlsx': '.xlsx',
+    'csv': '.csv.gz',
+    'parquet': '.parquet',
+}
+
+
+class ExcelOutput:
+    """Classeur d'analyse multi-feuilles (mode mémoire constante)"""
+
+    def __init__(self, path, columns, max_rows=EXCEL_MAX_ROWS):
+        self.path = path
+        self.workbook = xlsxwriter.Workbook(path, {'constant_memory': True})
+        self.analytics = AnalyticsWorkbook(self.workbook, columns, max_rows=max_rows)
+
+    def write(self, row):
+        self.analytics.write_row(row)
+
+    def close(self):
+        try:
+            self.analytics.close()
+        finally:
+            self.workbook.close()
+
+    def describe(self):
+        return (
+            f"{len(self.analytics.company_sheets)} entreprises clientes, "
+            f"{len(self.workbook.worksheets())} feuilles"
+        )
+
+
+class CsvGzOutput:
+    """CSV compressé en gzip, écrit ligne par ligne"""
+
+    def __init__(self, path, columns, compresslevel=6):
+        self.path = path
+        self._file = gzip.open(path, 'wt', encoding='utf-8', newline='', compresslevel=compresslevel)
+        self._writer = csv.writer(self._file)
+        self._writer.writerow(columns)
+
+    def write(self, row):
+        self._writer.writerow(row)
+
+    def close(self):
+        self._file.close()
+
+    def describe(self):
+        return 'gzip'
+
+
+class ParquetOutput:
+    """Fichier Parquet écrit par groupes de lignes (pyarrow requis)
+
+    Les lignes sont accumulées par colonne puis écrites par lots de
+    `batch_size` : la mémoire reste bornée par la taille d'un lot.
+    """
+
+    def __init__(self, path, columns, batch_size=65536):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        self.path = path
+        self.columns = columns
+        self.batch_size = batch_size
+        self._pa = pa
+        fields = []
+        for index, column in enumerate(columns):
+            if column == 'Durée du séjour (# de nuits)':
+                fields.append(pa.field(column, pa.int64()))
+            elif index >= len(FIXED_COLUMNS):
+                fields.append(pa.field(column, pa.float64()))
+            else:
+                fields.append(pa.field(column, pa.string()))
+        self.schema = pa.schema(fields)
+        self._writer = pq.ParquetWriter(path, self.schema, compression='snappy')
+        self._batch = [[] for _ in columns]
+        self._pending = 0
+
+    def write(self, row):
+        for values, value in zip(self._batch, row):
+            values.append(value)
+        self._pending += 1
+        if self._pending >= self.batch_size:
+            self._flush()
+
+    def _flush(self):
+        if self._pending:
+            table = self._pa.Table.from_arrays(
+                [self._pa.array(values, type=field.type) for values, field in zip(self._batch, self.schema)],
+                schema=self.schema
+            )
+            self._writer.write_table(table)
+            self._batch = [[] for _ in self.columns]
+            self._pending = 0
+
+    def close(self):
+        self._flush()
+        self._writer.close()
+
+    def describe(self):
+        return 'snappy'
+
+
+def open_output(output_format, path, columns, max_rows=EXCEL_MAX_ROWS):
+    """Ouvre le writer d'un format ; retourne None si sa dépendance est absente"""
+    if output_format == 'xlsx':
+        return ExcelOutput(path, columns, max_rows=max_rows)
+    if output_format == 'csv':
+        return CsvGzOutput(path, columns)
+    if output_format == 'parquet':
+        try:
+            return ParquetOutput(path, columns)
+        except ImportError:
+            logging.error("Export Parquet ignoré : le module pyarrow n'est pas installé")
+            return None
+    raise ValueError(f"Format de sortie inconnu: {output_format}")
+
+
+def write_outputs(rows, outputs):
+    """Diffuse chaque ligne vers tous les writers en un seul passage
+
+    `outputs` associe un nom de format à son writer. Retourne
+    ({format: secondes d'écriture}, nombre de lignes) ; le temps de production
+    des lignes (fusion, pivot) n'est compté dans aucun format.
+    """
+    elapsed = dict.fromkeys(outputs, 0.0)
+    writers = list(outputs.items())
+    row_count = 0
+    clock = time.perf_counter
+    try:
+        for row in rows:
+            row_count += 1
+            for name, writer in writers:
+                start = clock()
+                writer.write(row)
+                elapsed[name] += clock() - start
+    finally:
+        for name, writer in writers:
+            start = clock()
+            writer.close()
+            elapsed[name] += clock() - start
+    return elapsed, row_count
@@ -1,10 +1,13 @@
-import pandas as pd
-import json
+import argparse
 from datetime import datetime
-import re
 import logging
 import os
-from collections import defaultdict
+import sys
+from rate_buffer import price_to_cents
+from export_pipeline import iter_entry_rows, iter_export_rows, list_result_files, merge_result_files, scan_result_files
+from export_state import ExportState
+from excel_workbook import EXCEL_MAX_ROWS
+from export_writers import FORMAT_EXTENSIONS, open_output, write_outputs
 
 logging.basicConfig(
     level=logging.INFO,
@@ -17,24 +20,10 @@ logging.basicConfig(
 
 def extract_price(price_str):
     """Extrait le prix d'une chaîne de caractères"""
-    if not isinstance(price_str, str):
-        return None
-    
     try:
-        # Nettoyer la chaîne
-        price_str = price_str.replace('€', '').replace('$', '').strip()
-        # Gérer les milliers avec espace (ex: "1 000" -> "1000")
-        price_str = ''.join(price_str.split())
-        # Remplacer la virgule par un point pour les décimales
-        price_str = price_str.replace(',', '.')
-        
-        # Extraire le nombre complet
-        match = re.search(r'\d+(?:\.\d+)?', price_str)
-        if match:
-            # Convertir en float et retourner
-            price = float(match.group())
-            return price
-            
+        cents = price_to_cents(price_str)
+        if cents is not None:
+            return cents / 100
     except Exception as e:
         logging.error(f"Erreur lors de l'extraction du prix '{price_str}': {str(e)}")
     
@@ -52,38 +41,16 @@ def find_scraping_directories():
     logging.info(f"Dossiers de scraping trouvés: {scraping_dirs}")
     return scraping_dirs
 
-def merge_json_files(directories):
-    """Fusionne tous les fichiers JSON de plusieurs répertoires"""
-    merged_data = {}
+def merge_json_files(directories, workers=None):
+    """Fusionne tous les fichiers JSON de plusieurs répertoires
     
-    for directory in directories:
-        logging.info(f"Traitement du dossier {directory}")
-        # Parcourir tous les fichiers JSON du répertoire
-        for filename in os.listdir(directory):
-            if filename.endswith('.json'):
-                file_path = os.path.join(directory, filename)
-                logging.info(f"Traitement du fichier {filename}")
-                
-                try:
-                    with open(file_path, 'r', encoding='utf-8') as f:
-                        data = json.load(f)
-                        
-                    # Fusionner les données
-                    for entry_key, entry_data in data.items():
-                        if entry_key not in merged_data:
-                            merged_data[entry_key] = entry_data
-                        else:
-                            # Si l'entrée existe déjà, on la met à jour uniquement si la date de scraping est plus récente
-                            existing_date = datetime.strptime(merged_data[entry_key]['Date_Scraping'], '%Y-%m-%d %H:%M:%S')
-                            new_date = datetime.strptime(entry_data['Date_Scraping'], '%Y-%m-%d %H:%M:%S')
-                            
-                            if new_date > existing_date:
-                                merged_data[entry_key] = entry_data
-                            
-                except Exception as e:
-                    logging.error(f"Erreur lors de la lecture de {filename}: {str(e)}")
-                    
-    return merged_data
+    Les fichiers sont lus en parallèle (un processus par cœur par défaut) puis
+    fusionnés en arbre : l'entrée dont la date de scraping est la plus récente
+    est conservée.
+    """
+    files = list_result_files(directories)
+    logging.info(f"Fusion de {len(files)} fichiers JSON de {len(directories)} dossiers")
+    return merge_result_files(files, workers)
 
 def create_excel_directory():
     """Crée le dossier excel_results s'il n'existe pas"""
@@ -93,31 +60,39 @@ def create_excel_directory():
         logging.info(f"Dossier {excel_dir} créé")
     return excel_dir
 
-def convert_json_to_excel():
-    """Convertit les données JSON fusionnées en Excel"""
+def convert_json_to_excel(use_state=True, full=False, workers=None, max_rows=EXCEL_MAX_ROWS, formats=('xlsx',)):
+    """Convertit les données JSON fusionnées en Excel, CSV.gz et/ou Parquet, en streaming
+    
+    Par défaut, l'état fusionné persistant (export_state.sqlite) est mis à jour
+    avec les seuls fichiers nouveaux ; sans état, les fichiers sont relus en deux
+    passages. Le classeur contient la feuille des prix, une feuille par
+    entreprise cliente, une synthèse par ville et la table des remises corporate,
+    tous produits en un seul passage. Les formats demandés sont écrits à partir
+    du même flux de lignes ; retourne la liste des fichiers créés.
+    """
     # Trouver tous les dossiers de scraping
     scraping_dirs = find_scraping_directories()
     if not scraping_dirs:
         logging.error("Aucun dossier de scraping trouvé")
         return
-        
-    # Fusionner tous les fichiers JSON de tous les dossiers
-    data = merge_json_files(scraping_dirs)
-    logging.info(f"Nombre total d'entrées fusionnées: {len(data)}")
     
-    # Liste pour stocker toutes les lignes
-    rows = []
-    # Dictionnaire pour stocker tous les types de tarifs rencontrés
-    all_rate_types = defaultdict(set)
+    files = list_result_files(scraping_dirs)
+    state = None
+    if use_state:
+        # Intégrer les fichiers nouveaux à l'état fusionné persistant
+        state = ExportState()
+        state.update(files, workers=workers, full=full)
+        source = state
+        rows = iter_entry_rows(state.iter_entries(), state.rate_columns)
+    else:
+        # Premier passage : entrée la plus récente par clé et découverte des types de tarifs
+        source = scan_result_files(files, workers)
+        rows = iter_export_rows(source)
+    logging.info(f"Nombre total d'entrées fusionnées: {source.entry_count}")
     
-    # Premier passage pour collecter tous les types de tarifs
-    for entry_data in data.values():
-        for tarif_key in entry_data['Tarifs'].keys():
-            # Extraire la devise
-            currency = tarif_key.split(' - ')[-1]
-            # Extraire le type de tarif sans la devise
-            rate_type = ' - '.join(tarif_key.split(' - ')[:-1])
-            all_rate_types[currency].add(rate_type)
+    all_rate_types = {}
+    for rate_class, currency in source.rate_slots:
+        all_rate_types.setdefault(currency, set()).add(rate_class.label)
     
     logging.info("Types de tarifs trouvés:")
     for currency, rate_types in all_rate_types.items():
@@ -125,100 +100,58 @@ def convert_json_to_excel():
         for rate_type in sorted(rate_types):
             logging.info(f"  - {rate_type}")
     
-    # Deuxième passage pour créer les lignes
-    for entry_key, entry_data in data.items():
-        # Pour chaque devise (EUR et USD)
-        for currency in ['EUR', 'USD']:
-            row = {
-                'Date de scraping': entry_data['Date_Scraping'],
-                'Pays': entry_data['Pays'],
-                'Ville': entry_data['Ville'],
-                'Hôtel': entry_data['Hotel'],
-                'Chaîne': entry_data['Chaine'],
-                'Type de chambre': entry_data['Chambre'],
-                'Entreprise cliente': entry_data['Entreprise_Cliente'] or '',
-                'Code corporate': entry_data['Code_Corporate'] or '',
-                'Staying date (début)': entry_data['Date_Arrivee'],
-                'Staying date (fin)': entry_data['Date_Depart'],
-                'Durée du séjour (# de nuits)': entry_data['Nombre_Nuits'],
-                'Devise': currency,
-            }
-            
-            # Ajouter une colonne pour chaque type de tarif trouvé
-            for rate_type in sorted(all_rate_types[currency]):
-                tarif_key = f"{rate_type} - {currency}"
-                price_str = entry_data['Tarifs'].get(tarif_key)
-                row[rate_type] = extract_price(price_str)
-            
-            rows.append(row)
-    
-    # Créer le DataFrame
-    df = pd.DataFrame(rows)
-    
-    # Réorganiser les colonnes
-    fixed_columns = [
-        'Date de scraping',
-        'Pays',
-        'Ville',
-        'Hôtel',
-        'Chaîne',
-        'Type de chambre',
-        'Entreprise cliente',
-        'Code corporate',
-        'Staying date (début)',
-        'Staying date (fin)',
-        'Durée du séjour (# de nuits)',
-        'Devise'
-    ]
-    
-    # Ajouter les colonnes de tarifs dans l'ordre
-    rate_columns = [col for col in df.columns if col not in fixed_columns]
-    columns_order = fixed_columns + sorted(rate_columns)
-    df = df[columns_order]
-    
-    # Créer le dossier excel_results et générer le nom du fichier
+    # Créer le dossier excel_results et générer le nom des fichiers
     excel_dir = create_excel_directory()
     current_time = datetime.now().strftime("%Y%m%d_%H%M%S")
-    excel_file = os.path.join(excel_dir, f"resultats_scraping_{current_time}.xlsx")
-    
-    with pd.ExcelWriter(excel_file, engine='xlsxwriter') as writer:
-        df.to_excel(writer, sheet_name='Prix Hôtels', index=False)
-        
-        # Formater le fichier Excel
-        workbook = writer.book
-        worksheet = writer.sheets['Prix Hôtels']
-        
-        # Format pour l'en-tête
-        header_format = workbook.add_format({
-            'bold': True,
-            'text_wrap': True,
-            'valign': 'top',
-            'bg_color': '#D9E1F2',
-            'border': 1
-        })
-        
-        # Format pour les prix
-        price_format = workbook.add_format({'num_format': '#,##0.00'})
-        
-        # Format pour les dates
-        date_format = workbook.add_format({'num_format': 'yyyy-mm-dd'})
-        
-        # Appliquer les formats
-        for col_num, value in enumerate(df.columns.values):
-            worksheet.write(0, col_num, value, header_format)
-            
-            if 'Date' in value:
-                worksheet.set_column(col_num, col_num, 15, date_format)
-            elif any(x in value for x in ['Tarif', 'REMISE', 'SANS REMISE']):
-                worksheet.set_column(col_num, col_num, 15, price_format)
-            else:
-                worksheet.set_column(col_num, col_num, 20)
+    outputs = {}
+    try:
+        try:
+            for output_format in formats:
+                path = os.path.join(excel_dir, f"resultats_scraping_{current_time}{FORMAT_EXTENSIONS[output_format]}")
+                writer = open_output(output_format, path, source.columns, max_rows=max_rows)
+                if writer is not None:
+                    outputs[output_format] = writer
+        except Exception:
+            # Ne pas laisser ouverts (et verrouillés) les fichiers des formats déjà ouverts
+            for writer in outputs.values():
+                try:
+                    writer.close()
+                except Exception as e:
+                    logging.error(f"Erreur lors de la fermeture de {writer.path}: {str(e)}")
+            raise
         
-        # Ajouter un filtre automatique
-        worksheet.autofilter(0, 0, len(df), len(df.columns) - 1)
+        if not outputs:
+            logging.error("Aucun format de sortie disponible")
+            return []
+        # Lignes générées paresseusement et diffusées en un seul passage à tous les formats
+        elapsed, row_count = write_outputs(rows, outputs)
+    finally:
+        if state is not None:
+            state.close()
     
-    logging.info(f"Fichier Excel créé: {excel_file}")
-    return excel_file
+    for output_format, writer in outputs.items():
+        logging.info(
+            f"Fichier {output_format} créé: {writer.path} ({row_count} lignes, {writer.describe()}) "
+            f"en {elapsed[output_format]:.2f} s d'écriture"
+        )
+    return [writer.path for writer in outputs.values()]
 
 if __name__ == "__main__":
-    convert_json_to_excel() 
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Convertit les résultats de scraping JSON en Excel, CSV.gz ou Parquet")
+    parser.add_argument('--full', action='store_true', help="Reconstruire entièrement l'état fusionné")
+    parser.add_argument('--no-state', action='store_true', help="Relire tous les fichiers sans état persistant")
+    parser.add_argument('--workers', type=int, default=None, help="Nombre de processus de lecture")
+    parser.add_argument('--max-rows', type=int, default=EXCEL_MAX_ROWS, help="Nombre maximal de lignes par feuille")
+    parser.add_argument(
+        '--format', dest='formats', nargs='+', choices=sorted(FORMAT_EXTENSIONS), default=['xlsx'],
+        help="Formats de sortie (xlsx par défaut ; csv = CSV gzip ; parquet = Parquet via pyarrow)"
+    )
+    args = parser.parse_args()
+    
+    created = convert_json_to_excel(
+        use_state=not args.no_state, full=args.full, workers=args.workers,
+        max_rows=args.max_rows, formats=args.formats
+    )
+    # Code de sortie non nul si un format demandé n'a pas pu être produit
+    if created is None or len(created) < len(set(args.formats)):
+        sys.exit(1)
@@ -0,0 +1,338 @@
+import argparse
+import gzip
+import json
+import logging
+import re
+from datetime import datetime
+
+# Début d'un message au format texte historique : « 2024-11-13 11:48:29,981 - ERROR - message »
+_TEXT_RECORD = re.compile(r'(\d{4}-\d\d-\d\d \d\d:\d\d:\d\d)[,.](\d{3}) - ([A-Z]+) - ')
+_JSON_TIME = re.compile(r'(\d{4}-\d\d-\d\dT\d\d:\d\d:\d\d)\.(\d{3})')
+
+LEVELS = ('DEBUG', 'INFO', 'WARNING', 'ERROR', 'CRITICAL')
+
+# Normalisation des signatures : identifiants, adresses et nombres variables
+_NORMALIZERS = (
+    (re.compile(r'0x[0-9a-fA-F]+'), '<adr>'),
+    (re.compile(r'\b[0-9a-f]{16,}\b'), '<id>'),
+    (re.compile(r'_ngcontent-[\w-]+'), '_ngcontent-…'),
+    (re.compile(r'\d+'), 'N'),
+    (re.compile(r'\s+'), ' '),
+)
+SIGNATURE_LENGTH = 160
+MAX_SIGNATURES = 5000
+CONTINUATION_LINES = 3  # Lignes de suite (trace) conservées par message, le reste est compté
+
+# Contexte des workers, lu dans les messages d'avancement
+_WORKER = re.compile(r'Worker (\d+)')
+_THREAD_WORKER = re.compile(r'(?:Scrape|Save)Worker-(\d+)')
+_CITY_PATTERNS = (
+    # (mot-clé testé avant l'expression régulière, expression)
+    ('Tâche', re.compile(r'Worker \d+ - Tâche \d+: (?P<city>[^-:]+?) - ')),
+    ('pour la ville', re.compile(r'Début du scraping pour la ville: (?P<city>[^=]+?) ===')),
+    ('Erreur scraping', re.compile(r'Worker \d+ - Erreur scraping (?P<city>[^:]+?):')),
+)
+
+# Étape du scraping déduite du message (première règle qui correspond)
+STAGES = (
+    ('navigateur', re.compile(r'session|chrome|DevTools|Redémarrage|Retrying|connection|Connection|driver', re.I)),
+    ('cookies', re.compile(r'cookie|bannière', re.I)),
+    ('devise', re.compile(r'devise|currency', re.I)),
+    ('tarifs', re.compile(r'tarif|prix|rate', re.I)),
+    ('chambres', re.compile(r'chambre|room', re.I)),
+    ('liste des hôtels', re.compile(r'scroll|liste|hôtels trouvés|navigation hôtel', re.I)),
+    ('hôtel', re.compile(r'hôtel|hotel', re.I)),
+    ('sauvegarde', re.compile(r'sauvegarde|fichier', re.I)),
+    ('tâche', re.compile(r'tâche|tentative|scraping', re.I)),
+)
+
+
+def signature(message):
+    text = message
+    for pattern, replacement in _NORMALIZERS:
+        text = pattern.sub(replacement, text)
+    return text.strip()[:SIGNATURE_LENGTH]
+
+
+def stage_of(message):
+    for stage, pattern in STAGES:
+        if pattern.search(message):
+            return stage
+    return 'autre'
+
+
+_seconds_cache = {}
+
+
+def _timestamp(seconds, millis):
+    """Horodatage epoch de « AAAA-MM-JJ HH:MM:SS » + millisecondes (conversion mise en cache par seconde)"""
+    epoch = _seconds_cache.get(seconds)
+    if epoch is None:
+        if len(_seconds_cache) > 10000:
+            _seconds_cache.clear()
+        epoch = _seconds_cache[seconds] = datetime.fromisoformat(seconds).timestamp()
+    return epoch + int(millis) / 1000
+
+
+def _open(path):
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rt', encoding='utf-8', errors='replace')
+    return open(path, 'r', encoding='utf-8', errors='replace')
+
+
+def iter_records(lines):
+    """Messages d'un journal (texte historique ou JSON par ligne), lignes de suite regroupées
+
+    Produit des dictionnaires {time, level, message, thread, city, detail,
+    extra_lines}. Seules les premières lignes de suite (traces) sont gardées :
+    la mémoire ne dépend pas de la taille du fichier.
+    """
+    record = None
+    for line in lines:
+        line = line.rstrip('\n')
+        if line.startswith('{'):
+            try:
+                data = json.loads(line)
+            except ValueError:
+                data = None
+            if isinstance(data, dict) and 'message' in data:
+                if record is not None:
+                    yield _finish(record)
+                match = _JSON_TIME.match(data.get('time', ''))
+                exception = (data.get('exception') or '').splitlines()
+                record = {
+                    'time': _timestamp(*match.groups()) if match else None,
+                    'level': data.get('level', 'INFO'),
+                    'message': data['message'],
+                    'thread': data.get('thread'),
+                    'city': data.get('city'),
+                    'detail': exception[-1:] or [],
+                    'extra_lines': max(0, len(exception) - 1),
+                }
+                continue
+
+        # Filtre rapide avant l'expression régulière : les traces ne commencent pas par une date
+        match = _TEXT_RECORD.match(line) if line[4:5] == '-' else None
+        if match:
+            if record is not None:
+                yield _finish(record)
+            seconds, millis, level = match.groups()
+            record = {
+                'time': _timestamp(seconds, millis),
+                'level': level,
+                'message': line[match.end():],
+                'thread': None,
+                'city': None,
+                'detail': [],
+                'extra_lines': 0,
+            }
+        elif record is not None:
+            if len(record['detail']) < CONTINUATION_LINES and line.strip() and not line.startswith('Stacktrace'):
+                record['detail'].append(line.strip())
+            else:
+                record['extra_lines'] += 1
+    if record is not None:
+        yield _finish(record)
+
+
+def _finish(record):
+    if not record['message'].strip() and record['detail']:
+        # Message commençant par un saut de ligne : le texte est sur la ligne suivante
+        record['message'] = record['detail'].pop(0)
+    return record
+
+
+class _Group:
+    __slots__ = ('signature', 'count', 'levels', 'first_seen', 'last_seen', 'lost', 'sample',
+                 'workers', 'cities', 'stages')
+
+    def __init__(self, key, record):
+        self.signature = key
+        self.count = 0
+        self.levels = {}
+        self.first_seen = record['time']
+        self.last_seen = record['time']
+        self.lost = 0.0
+        self.sample = ' | '.join([record['message']] + record['detail'])[:500]
+        self.workers = {}
+        self.cities = {}
+        self.stages = {}
+
+
+class LogAnalyzer:
+    """Taxonomie des échecs : regroupe avertissements et erreurs par signature normalisée
+
+    Le temps perdu par une erreur est estimé par l'écart jusqu'au message
+    suivant du même worker (plafonné à `max_gap` secondes pour ne pas compter
+    les pauses entre deux runs). Tout est calculé en une passe.
+    """
+
+    def __init__(self, min_level='WARNING', max_gap=300.0):
+        self.min_level = LEVELS.index(min_level)
+        self.max_gap = max_gap
+        self.groups = {}
+        self.records = 0
+        self.analyzed = 0
+        self.overflow = 0
+        self.by_worker = {}
+        self.by_city = {}
+        self.by_stage = {}
+        self._context = {}  # worker -> ville courante
+        self._pending = {}  # worker -> (groupe, horodatage, worker, ville, étape) de la dernière erreur
+
+    def feed(self, records):
+        for record in records:
+            self.records += 1
+            message = record['message']
+            worker = self._worker(record)
+            city = record['city'] or self._city(message)
+            if city:
+                self._context[worker] = city
+            else:
+                city = self._context.get(worker)
+
+            self._close_pending(worker, record['time'])
+
+            level = LEVELS.index(record['level']) if record['level'] in LEVELS else 0
+            if level < self.min_level:
+                continue
+            self.analyzed += 1
+            key = signature(' | '.join([message] + record['detail'][:1]))
+            group = self.groups.get(key)
+            if group is None:
+                if len(self.groups) >= MAX_SIGNATURES:
+                    self.overflow += 1
+                    key = '(autres signatures)'
+                    group = self.groups.get(key)
+                if group is None:
+                    group = self.groups[key] = _Group(key, record)
+            stage = stage_of(message)
+            group.count += 1
+            group.levels[record['level']] = group.levels.get(record['level'], 0) + 1
+            group.last_seen = record['time'] or group.last_seen
+            worker_label = worker if worker is not None else '?'
+            city_label = city or '?'
+            for table, value in ((group.workers, worker_label), (group.cities, city_label), (group.stages, stage)):
+                table[value] = table.get(value, 0) + 1
+            for table, value in ((self.by_worker, worker_label), (self.by_city, city_label), (self.by_stage, stage)):
+                stats = table.setdefault(value, [0, 0.0])
+                stats[0] += 1
+            self._pending[worker] = (group, record['time'], worker_label, city_label, stage)
+
+    def end_stream(self):
+        """Fin d'un fichier : les erreurs sans message suivant ne comptent pas de temps perdu"""
+        self._pending.clear()
+        self._context.clear()
+
+    def _worker(self, record):
+        match = _WORKER.search(record['message']) if 'Worker ' in record['message'] else None
+        if match:
+            return match.group(1)
+        if record['thread']:
+            match = _THREAD_WORKER.search(record['thread'])
+            if match:
+                return match.group(1)
+        return None
+
+    def _city(self, message):
+        for keyword, pattern in _CITY_PATTERNS:
+            match = pattern.search(message) if keyword in message else None
+            if match:
+                return match.group('city').strip()
+        return None
+
+    def _close_pending(self, worker, timestamp):
+        pending = self._pending.pop(worker, None)
+        if pending is None or timestamp is None or pending[1] is None:
+            return
+        group, started, worker_label, city_label, stage = pending
+        lost = min(max(0.0, timestamp - started), self.max_gap)
+        group.lost += lost
+        for table, value in ((self.by_worker, worker_label), (self.by_city, city_label), (self.by_stage, stage)):
+            table[value][1] += lost
+
+    def summary(self, top=30):
+        groups = sorted(self.groups.values(), key=lambda group: (-group.lost, -group.count))
+
+        def table(values):
+            return {
+                name: {'count': count, 'lost_seconds': round(lost, 1)}
+                for name, (count, lost) in sorted(values.items(), key=lambda item: -item[1][1])
+            }
+
+        return {
+            'records': self.records,
+            'analyzed': self.analyzed,
+            'signatures': len(self.groups),
+            'overflow': self.overflow,
+            'lost_seconds': round(sum(group.lost for group in self.groups.values()), 1),
+            'groups': [
+                {
+                    'signature': group.signature,
+                    'count': group.count,
+                    'lost_seconds': round(group.lost, 1),
+                    'levels': group.levels,
+                    'first_seen': _format_time(group.first_seen),
+                    'last_seen': _format_time(group.last_seen),
+                    'stages': group.stages,
+                    'workers': group.workers,
+                    'cities': group.cities,
+                    'sample': group.sample,
+                }
+                for group in groups[:top]
+            ],
+            'by_stage': table(self.by_stage),
+            'by_worker': table(self.by_worker),
+            'by_city': table(self.by_city),
+        }
+
+    def report(self, top=30):
+        summary = self.summary(top)
+        lines = [
+            f"{summary['records']} messages lus, {summary['analyzed']} avertissements/erreurs, "
+            f"{summary['signatures']} signatures, ~{summary['lost_seconds'] / 60:.1f} min perdues",
+            "",
+            f"{'Perdu (min)':>11}{'Nombre':>8}  {'Étape':<18}Signature",
+        ]
+        for group in summary['groups']:
+            stage = max(group['stages'], key=group['stages'].get)
+            lines.append(f"{group['lost_seconds'] / 60:>11.1f}{group['count']:>8}  {stage:<18}{group['signature']}")
+        for title, key in (("Étape", 'by_stage'), ("Worker", 'by_worker'), ("Ville", 'by_city')):
+            lines += ["", f"{title:<20}{'Nombre':>8}{'Perdu (min)':>13}"]
+            for name, stats in summary[key].items():
+                lines.append(f"{str(name)[:19]:<20}{stats['count']:>8}{stats['lost_seconds'] / 60:>13.1f}")
+        return '\n'.join(lines) + '\n'
+
+
+def _format_time(timestamp):
+    return datetime.fromtimestamp(timestamp).strftime('%Y-%m-%d %H:%M:%S') if timestamp else None
+
+
+def analyze_files(paths, min_level='WARNING', max_gap=300.0):
+    analyzer = LogAnalyzer(min_level, max_gap)
+    for path in paths:
+        with _open(path) as f:
+            analyzer.feed(iter_records(f))
+        analyzer.end_stream()
+    return analyzer
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    parser = argparse.ArgumentParser(description="Taxonomie des erreurs et du temps perdu à partir des journaux")
+    parser.add_argument('files', nargs='+', help="Journaux texte ou JSON (éventuellement .gz)")
+    parser.add_argument('--level', choices=LEVELS, default='WARNING', help="Niveau minimal analysé")
+    parser.add_argument('--max-gap', type=float, default=300.0,
+                        help="Plafond du temps perdu attribué à une erreur (secondes)")
+    parser.add_argument('--top', type=int, default=30, help="Nombre de signatures affichées")
+    parser.add_argument('--json', default=None, help="Fichier JSON où écrire le résumé complet")
+    args = parser.parse_args()
+
+    start = datetime.now()
+    analyzer = analyze_files(args.files, args.level, args.max_gap)
+    print(analyzer.report(args.top))
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(analyzer.summary(args.top), f, indent=4, ensure_ascii=False)
+    logging.info(f"{analyzer.records} messages analysés en {(datetime.now() - start).total_seconds():.1f} s")
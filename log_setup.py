@@ -0,0 +1,262 @@
+import atexit
+import copy
+import gzip
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import re
+import shutil
+import threading
+import time
+
+CONSOLE_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+
+# Bibliothèques bavardes : seuls leurs avertissements nous intéressent
+DEFAULT_LEVELS = {
+    'selenium': 'WARNING',
+    'urllib3': 'WARNING',
+    'requests': 'WARNING',
+    'WDM': 'WARNING',
+}
+
+# Attributs standard d'un LogRecord : tout le reste est un champ `extra` à sérialiser
+_RECORD_ATTRIBUTES = frozenset(logging.LogRecord('', 0, '', 0, '', (), None).__dict__) | {'message', 'asctime'}
+
+_NUMBERS = re.compile(r'\d+')
+
+# Listener actif (un seul par processus)
+_listener = None
+_listener_lock = threading.Lock()
+
+
+class JsonFormatter(logging.Formatter):
+    """Une ligne JSON par message : horodatage, niveau, origine, message et champs `extra`"""
+
+    def format(self, record):
+        data = {
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(record.created)) + f".{int(record.msecs):03d}",
+            'level': record.levelname,
+            'logger': record.name,
+            'module': record.module,
+            'function': record.funcName,
+            'line': record.lineno,
+            'thread': record.threadName,
+            'message': record.getMessage(),
+        }
+        for name, value in record.__dict__.items():
+            if name not in _RECORD_ATTRIBUTES and not name.startswith('_'):
+                data[name] = value if isinstance(value, (str, int, float, bool, type(None))) else str(value)
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            data['exception'] = record.exc_text
+        if record.stack_info:
+            data['stack'] = record.stack_info
+        return json.dumps(data, ensure_ascii=False)
+
+
+class ModuleLevelFilter(logging.Filter):
+    """Niveau minimal par logger (hiérarchie pointée) ou, à défaut, par module source
+
+    Les scripts du projet journalisent via le logger racine : le nom du module
+    (`record.module`, ex. 'app_workers') permet quand même de régler leur niveau.
+    """
+
+    def __init__(self, levels, default=logging.INFO):
+        super().__init__()
+        self.levels = {name: level_number(level) for name, level in levels.items()}
+        self.default = level_number(default)
+        self._cache = {}
+
+    def level_for(self, record):
+        key = (record.name, record.module)
+        level = self._cache.get(key)
+        if level is None:
+            level = self.levels.get(record.module, self.default)
+            name = record.name
+            while name:
+                if name in self.levels:
+                    level = self.levels[name]
+                    break
+                name = name.rpartition('.')[0]
+            self._cache[key] = level
+        return level
+
+    def filter(self, record):
+        return record.levelno >= self.level_for(record)
+
+
+class RateLimitFilter(logging.Filter):
+    """Limite les avertissements et erreurs répétitifs à `burst` messages par `period` secondes
+
+    Les messages sont regroupés par signature (logger, niveau, texte aux
+    nombres normalisés). Le premier message accepté après une suppression
+    porte le champ `suppressed` (nombre de messages ignorés).
+    """
+
+    def __init__(self, burst=5, period=60.0, min_level=logging.WARNING):
+        super().__init__()
+        self.burst = burst
+        self.period = period
+        self.min_level = min_level
+        self._lock = threading.Lock()
+        self._windows = {}  # signature -> [début de fenêtre, acceptés, supprimés]
+
+    def filter(self, record):
+        if record.levelno < self.min_level:
+            return True
+        signature = (record.name, record.levelno, _NUMBERS.sub('N', record.getMessage()[:200]))
+        now = time.monotonic()
+        with self._lock:
+            window = self._windows.get(signature)
+            if window is None or now - window[0] >= self.period:
+                suppressed = window[2] if window is not None else 0
+                self._windows[signature] = [now, 1, 0]
+                if suppressed:
+                    record.suppressed = suppressed
+                if len(self._windows) > 10000:
+                    self._prune(now)
+                return True
+            if window[1] < self.burst:
+                window[1] += 1
+                return True
+            window[2] += 1
+            return False
+
+    def _prune(self, now):
+        for signature in [key for key, window in self._windows.items() if now - window[0] >= self.period]:
+            del self._windows[signature]
+
+
+class StructuredQueueHandler(logging.handlers.QueueHandler):
+    """Dépose les messages dans la queue sans formatage complet côté appelant
+
+    Seuls le texte du message et une éventuelle trace d'exception sont figés
+    (les arguments et la pile ne sont pas sérialisables de façon sûre entre
+    threads) ; le JSON est produit par le thread du listener.
+    """
+
+    def prepare(self, record):
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+def _gzip_rotator(source, dest):
+    with open(source, 'rb') as f_in, gzip.open(dest, 'wb') as f_out:
+        shutil.copyfileobj(f_in, f_out)
+    os.remove(source)
+
+
+def rotating_file_handler(path, max_bytes=10 * 1024 * 1024, backup_count=10, formatter=None):
+    """Fichier tournant dont les archives sont compressées (path.1.gz, path.2.gz...)"""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    handler = logging.handlers.RotatingFileHandler(
+        path, maxBytes=max_bytes, backupCount=backup_count, encoding='utf-8', delay=True
+    )
+    handler.namer = lambda name: name + '.gz'
+    handler.rotator = _gzip_rotator
+    handler.setFormatter(formatter or JsonFormatter())
+    return handler
+
+
+def level_number(level):
+    """Niveau numérique d'un nom ('DEBUG', 'warning') ou d'un entier"""
+    if isinstance(level, int):
+        return level
+    number = logging.getLevelName(str(level).strip().upper())
+    if not isinstance(number, int):
+        raise ValueError(f"Niveau de journalisation inconnu: {level}")
+    return number
+
+
+def parse_levels(text):
+    """'app_workers=DEBUG,selenium=ERROR' -> {'app_workers': 'DEBUG', 'selenium': 'ERROR'}"""
+    levels = {}
+    for item in (text or '').split(','):
+        name, _, level = item.partition('=')
+        if name.strip() and level.strip():
+            levels[name.strip()] = level.strip().upper()
+    return levels
+
+
+def setup_logging(log_file='scraping.jsonl', level='INFO', levels=None, console_level='INFO',
+                  error_file=None, max_bytes=10 * 1024 * 1024, backup_count=10, rate_limit=(5, 60.0)):
+    """Installe la journalisation asynchrone : les appels ne font que déposer dans une queue
+
+    - `log_file` : JSON par ligne, rotation compressée ;
+    - `error_file` : erreurs seules, même format (optionnel) ;
+    - console : format texte historique à partir de `console_level` (None pour aucune) ;
+    - `levels` : niveaux par logger ou module, complétés par SCRAPING_LOG_LEVELS
+      (ex. « app_workers=DEBUG,selenium=ERROR ») ;
+    - `rate_limit` : (messages, secondes) par signature d'avertissement ou d'erreur, None pour aucun.
+
+    Retourne le QueueListener (arrêté automatiquement à la sortie du processus).
+    """
+    global _listener
+    with _listener_lock:
+        if _listener is not None:
+            stop_logging()
+
+        all_levels = dict(DEFAULT_LEVELS)
+        all_levels.update(levels or {})
+        all_levels.update(parse_levels(os.environ.get('SCRAPING_LOG_LEVELS')))
+        level_filter = ModuleLevelFilter(all_levels, level)
+
+        handlers = [rotating_file_handler(log_file, max_bytes, backup_count)]
+        if error_file:
+            error_handler = rotating_file_handler(error_file, max_bytes, backup_count)
+            error_handler.setLevel(logging.ERROR)
+            handlers.append(error_handler)
+        if console_level:
+            console = logging.StreamHandler()
+            console.setLevel(console_level)
+            console.setFormatter(logging.Formatter(CONSOLE_FORMAT))
+            handlers.append(console)
+
+        log_queue = queue.SimpleQueue()
+        queue_handler = StructuredQueueHandler(log_queue)
+        queue_handler.addFilter(level_filter)
+        if rate_limit:
+            queue_handler.addFilter(RateLimitFilter(*rate_limit))
+
+        root = logging.getLogger()
+        for handler in list(root.handlers):
+            root.removeHandler(handler)
+        root.addHandler(queue_handler)
+        root.propagate = True
+        # Le logger racine laisse passer le niveau le plus bas demandé ; le filtre affine
+        root.setLevel(min([level_filter.default] + list(level_filter.levels.values())))
+        for name, name_level in level_filter.levels.items():
+            logging.getLogger(name).setLevel(name_level)
+
+        _listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+        _listener.start()
+        return _listener
+
+
+def stop_logging():
+    """Vide la queue et ferme les fichiers (appelé aussi à la sortie du processus)"""
+    global _listener
+    if _listener is None:
+        return
+    listener, _listener = _listener, None
+    listener.stop()
+    for handler in listener.handlers:
+        handler.close()
+
+
+def logging_configured():
+    return _listener is not None
+
+
+atexit.register(stop_logging)
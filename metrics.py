@@ -0,0 +1,217 @@
+import bisect
+import json
+import os
+import threading
+import time
+
+# Bornes (secondes) des histogrammes de latence, façon Prometheus
+DEFAULT_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120, 300)
+
+
+class Histogram:
+    """Histogramme cumulatif à bornes fixes (compte, somme, compte par borne)"""
+
+    __slots__ = ('buckets', 'counts', 'count', 'total')
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # Dernière case : au-delà de la plus grande borne
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.total += value
+
+    def merge(self, other):
+        for index, count in enumerate(other.counts):
+            self.counts[index] += count
+        self.count += other.count
+        self.total += other.total
+
+    def quantile(self, q):
+        """Quantile estimé par interpolation linéaire dans la borne concernée"""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            if seen + count >= rank and count:
+                lower = self.buckets[index - 1] if index > 0 else 0.0
+                if index == len(self.buckets):
+                    return lower  # Au-delà de la dernière borne : borne inférieure
+                upper = self.buckets[index]
+                return lower + (upper - lower) * (rank - seen) / count
+            seen += count
+        return self.buckets[-1]
+
+
+class _Timer:
+    __slots__ = ('registry', 'name', 'labels', 'start')
+
+    def __init__(self, registry, name, labels):
+        self.registry = registry
+        self.name = name
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.registry._observe(self.name, time.perf_counter() - self.start, self.labels)
+        return False
+
+
+class MetricsRegistry:
+    """Compteurs et histogrammes étiquetés, partagés entre threads
+
+    Une observation coûte une recherche dans un dictionnaire et une
+    bisection sous verrou : négligeable devant une action du navigateur.
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self._counters = {}  # (nom, étiquettes triées) -> valeur
+        self._histograms = {}  # (nom, étiquettes triées) -> Histogram
+        self.started_at = time.time()
+
+    def timer(self, name, **labels):
+        """Gestionnaire de contexte qui mesure la durée du bloc dans l'histogramme `name`"""
+        return _Timer(self, name, tuple(sorted(labels.items())))
+
+    def observe(self, name, value, **labels):
+        """Ajoute une durée (secondes) mesurée ailleurs à l'histogramme `name`"""
+        self._observe(name, value, tuple(sorted(labels.items())))
+
+    def _observe(self, name, value, labels):
+        key = (name, labels)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram(self.buckets)
+            histogram.observe(value)
+
+    def inc(self, name, value=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+            self.started_at = time.time()
+
+    def _snapshot(self):
+        with self._lock:
+            counters = dict(self._counters)
+            histograms = {}
+            for key, histogram in self._histograms.items():
+                copy = Histogram(histogram.buckets)
+                copy.merge(histogram)
+                histograms[key] = copy
+        return counters, histograms
+
+    def write_prometheus(self, path, prefix='scraping'):
+        """Écrit toutes les métriques au format texte d'exposition Prometheus"""
+        counters, histograms = self._snapshot()
+        lines = []
+
+        for name in sorted({name for name, _ in counters}):
+            metric = f"{prefix}_{name}_total"
+            lines.append(f"# TYPE {metric} counter")
+            for (counter_name, labels), value in sorted(counters.items()):
+                if counter_name == name:
+                    lines.append(f"{metric}{_format_labels(labels)} {value}")
+
+        for name in sorted({name for name, _ in histograms}):
+            metric = f"{prefix}_{name}_seconds"
+            lines.append(f"# TYPE {metric} histogram")
+            for (histogram_name, labels), histogram in sorted(histograms.items()):
+                if histogram_name != name:
+                    continue
+                cumulative = 0
+                for bound, count in zip(list(histogram.buckets) + ['+Inf'], histogram.counts):
+                    cumulative += count
+                    lines.append(f"{metric}_bucket{_format_labels(labels + (('le', str(bound)),))} {cumulative}")
+                lines.append(f"{metric}_sum{_format_labels(labels)} {histogram.total:.6f}")
+                lines.append(f"{metric}_count{_format_labels(labels)} {histogram.count}")
+
+        write_text(path, '\n'.join(lines) + '\n')
+
+    def summary(self):
+        """Résumé par étape : total puis ventilation par chaque étiquette (ville, worker...)"""
+        counters, histograms = self._snapshot()
+        stages = {}
+        for (name, labels), histogram in histograms.items():
+            stage = stages.setdefault(name, {'all': Histogram(self.buckets), 'by': {}})
+            stage['all'].merge(histogram)
+            for label, value in labels:
+                by_value = stage['by'].setdefault(label, {})
+                by_value.setdefault(value, Histogram(self.buckets)).merge(histogram)
+
+        counter_summary = {}
+        for (name, labels), value in counters.items():
+            entry = counter_summary.setdefault(name, {'total': 0, 'by': {}})
+            entry['total'] += value
+            for label, label_value in labels:
+                by_value = entry['by'].setdefault(label, {})
+                by_value[label_value] = by_value.get(label_value, 0) + value
+
+        return {
+            'duration_seconds': round(time.time() - self.started_at, 3),
+            'stages': {
+                name: dict(
+                    _describe(stage['all']),
+                    by={
+                        label: {value: _describe(histogram) for value, histogram in sorted(values.items())}
+                        for label, values in stage['by'].items()
+                    }
+                )
+                for name, stage in sorted(stages.items())
+            },
+            'counters': counter_summary,
+        }
+
+    def write_json(self, path):
+        write_text(path, json.dumps(self.summary(), indent=4, ensure_ascii=False))
+
+
+def _describe(histogram):
+    def rounded(value):
+        return round(value, 4) if value is not None else None
+
+    return {
+        'count': histogram.count,
+        'total_seconds': round(histogram.total, 3),
+        'mean_seconds': rounded(histogram.total / histogram.count if histogram.count else None),
+        'p50_seconds': rounded(histogram.quantile(0.5)),
+        'p95_seconds': rounded(histogram.quantile(0.95)),
+        'p99_seconds': rounded(histogram.quantile(0.99)),
+    }
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    escaped = (
+        name + '="' + str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') + '"'
+        for name, value in labels
+    )
+    return '{' + ','.join(escaped) + '}'
+
+
+def write_text(path, text):
+    """Écrit un fichier texte UTF-8, en créant son dossier au besoin (rapports et résultats)"""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(text)
+
+
+# Registre partagé par tous les workers d'un processus
+METRICS = MetricsRegistry()
@@ -0,0 +1,492 @@
+import argparse
+import hashlib
+import html
+import json
+import logging
+import math
+import random
+import threading
+import time
+from datetime import date
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlencode, urlparse
+
+# Chemins identiques à ceux du site réel : seule la racine change (ScrapingWorker.base_url)
+SEARCH_PATH = '/hotels/fr/fr/find-hotels/hotel-search'
+ROOMS_PATH = '/hotels/fr/fr/find-hotels/select-roomrate'
+
+BRANDS = ('InterContinental', 'Crowne Plaza', 'Holiday Inn', 'Hotel Indigo', 'Kimpton', 'voco')
+ROOM_TYPES = (
+    '1 lit King standard', '2 lits doubles standard', '1 lit King supérieur',
+    'Chambre exécutive', 'Suite junior', 'Suite 1 chambre'
+)
+
+# Tarifs publics proposés pour chaque chambre : (nom, membre, petit déjeuner, coefficient)
+PUBLIC_RATES = (
+    ('Meilleur tarif flexible - Annulation gratuite', False, False, 1.0),
+    ('Tarif prépayé - Non remboursable', False, False, 0.9),
+    ('Prix membre IHG One Rewards - Annulation gratuite', True, False, 0.95),
+    ('Petit déjeuner inclus - Annulation gratuite', False, True, 1.12),
+)
+CORPORATE_RATE = ('Tarif entreprise - Annulation gratuite', False, False, 0.88)
+
+# Taux de conversion depuis l'euro et symbole affiché
+CURRENCIES = {
+    'EUR': (1.0, '€'), 'USD': (1.08, '$US'), 'GBP': (0.85, '£'), 'JPY': (160.0, '¥'),
+    'SGD': (1.45, 'S$'), 'AED': (3.97, 'AED'), 'INR': (90.0, '₹'), 'AUD': (1.65, 'A$'),
+    'CAD': (1.47, 'CA$'), 'BRL': (5.4, 'R$'), 'CNY': (7.8, 'CN¥'), 'KRW': (1450.0, '₩'),
+}
+
+# Devise affichée par défaut (celle du pays) : le scraper doit la changer explicitement
+CITY_CURRENCIES = {
+    'london': 'GBP', 'tokyo': 'JPY', 'shanghai': 'CNY', 'singapore': 'SGD', 'seoul': 'KRW',
+    'mumbai': 'INR', 'dubai': 'AED', 'sydney': 'AUD', 'new york': 'USD', 'chicago': 'USD',
+    'los angeles': 'USD', 'montreal': 'CAD', 'sao paulo': 'BRL',
+}
+
+CURRENCY_COOKIE = 'mock_currency'
+CONSENT_COOKIE = 'notice_gdpr_prefs'
+BANNER_MODES = ('once', 'always', 'never')
+
+_PAGE_STYLE = """
+body { font-family: sans-serif; margin: 0; }
+app-room-rate-item, app-rate-card, app-expandable-button { display: block; }
+.hotel-card-list-view-container { box-sizing: border-box; height: 300px; border-bottom: 1px solid #ccc; padding: 16px; }
+app-room-rate-item { border-bottom: 1px solid #ccc; padding: 16px; min-height: 120px; }
+app-rate-card { padding: 8px; margin: 4px 0; background: #f4f4f4; }
+#trustarc-banner-overlay { position: fixed; inset: 0; background: rgba(0, 0, 0, 0.4); z-index: 100; }
+#truste-consent-button { position: absolute; bottom: 40px; left: 40%; padding: 12px 24px; }
+.ui-dropdown { position: relative; display: inline-block; margin: 16px; }
+.ui-dropdown-label-container { cursor: pointer; padding: 4px 12px; border: 1px solid #999; }
+.ui-dropdown-items { position: absolute; background: white; list-style: none; margin: 0; padding: 0; border: 1px solid #999; }
+"""
+
+# Rendu côté client, comme le site réel : cartes d'hôtels chargées au défilement,
+# tarifs insérés au clic sur « Voir les prix », prix reformatés au changement de devise
+_PAGE_SCRIPT = """
+function getCookie(name) {
+    const match = document.cookie.match(new RegExp('(?:^|; )' + name + '=([^;]*)'));
+    return match ? decodeURIComponent(match[1]) : null;
+}
+function setCookie(name, value) { document.cookie = name + '=' + encodeURIComponent(value) + '; path=/'; }
+function later(callback, delay) { setTimeout(callback, delay === undefined ? PAGE.render_delay : delay); }
+function element(tag, attributes, text) {
+    const node = document.createElement(tag);
+    for (const [name, value] of Object.entries(attributes || {})) { node.setAttribute(name, value); }
+    if (text !== undefined) { node.textContent = text; }
+    return node;
+}
+
+function currentCurrency() { return getCookie(PAGE.currency_cookie) || PAGE.default_currency; }
+function formatPrice(eur, currency) {
+    const [rate, symbol] = PAGE.currencies[currency];
+    const cents = Math.round(eur * rate * 100);
+    const units = Math.floor(cents / 100).toString().replace(/\\B(?=(\\d{3})+(?!\\d))/g, '\\u202f');
+    return units + ',' + String(cents % 100).padStart(2, '0') + '\\u00a0' + symbol;
+}
+function refreshPrices() {
+    const currency = currentCurrency();
+    document.querySelector('.ui-dropdown-label').textContent = currency;
+    document.querySelectorAll('span.cash').forEach(span => { span.textContent = formatPrice(Number(span.dataset.eur), currency); });
+}
+
+function renderBanner() {
+    if (PAGE.banner === 'never' || (PAGE.banner === 'once' && getCookie(PAGE.consent_cookie))) { return; }
+    const overlay = element('div', {id: 'trustarc-banner-overlay'});
+    const button = element('button', {id: 'truste-consent-button', type: 'button'}, 'Accepter tout');
+    button.addEventListener('click', () => { setCookie(PAGE.consent_cookie, '1'); later(() => overlay.remove(), 200); });
+    overlay.appendChild(button);
+    later(() => document.body.appendChild(overlay));
+}
+
+function renderCurrencyDropdown() {
+    const dropdown = element('div', {'class': 'ui-dropdown'});
+    const label = element('div', {'class': 'ui-dropdown-label-container'});
+    label.appendChild(element('span', {'class': 'ui-dropdown-label'}, currentCurrency()));
+    dropdown.appendChild(label);
+    label.addEventListener('click', () => {
+        const open = dropdown.querySelector('.ui-dropdown-items');
+        if (open) { open.remove(); return; }
+        const items = element('ul', {'class': 'ui-dropdown-items', role: 'listbox'});
+        for (const currency of Object.keys(PAGE.currencies)) {
+            const option = element('li', {role: 'option'});
+            option.appendChild(element('span', {}, currency));
+            option.addEventListener('click', () => {
+                items.remove();
+                setCookie(PAGE.currency_cookie, currency);
+                later(refreshPrices, PAGE.currency_delay);
+            });
+            items.appendChild(option);
+        }
+        dropdown.appendChild(items);
+    });
+    document.getElementById('header').appendChild(dropdown);
+}
+
+function renderHotelList() {
+    const list = document.getElementById('content');
+    let shown = 0;
+    let loading = false;
+    function loadMore() {
+        const page = PAGE.page_size > 0 ? PAGE.page_size : PAGE.hotels.length;
+        for (const hotel of PAGE.hotels.slice(shown, shown + page)) {
+            const card = element('div', {'class': 'hotel-card-list-view-container'});
+            card.appendChild(element('h3', {'data-slnm-ihg': 'brandHotelNameSID'}, hotel.name));
+            const button = element('button', {'data-slnm-ihg': 'selectHotelSID_' + hotel.id, type: 'button'}, 'Sélectionner un hôtel');
+            button.addEventListener('click', () => { window.location.href = hotel.url; });
+            card.appendChild(button);
+            list.appendChild(card);
+        }
+        shown = Math.min(PAGE.hotels.length, shown + page);
+        loading = false;
+    }
+    window.addEventListener('scroll', () => {
+        const nearBottom = window.innerHeight + window.scrollY >= document.body.scrollHeight - 600;
+        if (nearBottom && !loading && shown < PAGE.hotels.length) { loading = true; later(loadMore); }
+    });
+    later(loadMore);
+}
+
+function renderRooms() {
+    const list = document.getElementById('content');
+    for (const room of PAGE.rooms) {
+        const item = element('app-room-rate-item');
+        item.appendChild(element('h2', {'class': 'roomName'}, room.name));
+        const expand = element('app-expandable-button');
+        const button = element('button', {type: 'button'}, 'Voir les prix');
+        const rates = element('div', {'class': 'rates'});
+        button.addEventListener('click', () => later(() => {
+            if (rates.childElementCount) { rates.replaceChildren(); return; }
+            const currency = currentCurrency();
+            for (const rate of room.rates) {
+                const card = element('app-rate-card');
+                if (rate.member) { card.appendChild(element('div', {'class': 'discount themeText'}, 'Prix membre')); }
+                if (rate.corporate) { card.appendChild(element('div', {'class': 'preferred themeButtonBackground'}, 'Tarif préférentiel')); }
+                card.appendChild(element('div', {id: 'rateNameOrPolicy'}, rate.name));
+                if (rate.breakfast) { card.appendChild(element('div', {id: 'meals'}, 'Petit déjeuner inclus')); }
+                const total = element('div', {'class': 'total-price'});
+                total.appendChild(element('span', {'class': 'cash', 'data-eur': rate.eur}, formatPrice(rate.eur, currency)));
+                card.appendChild(total);
+                rates.appendChild(card);
+            }
+        }, PAGE.expand_delay));
+        expand.appendChild(button);
+        item.appendChild(expand);
+        item.appendChild(rates);
+        list.appendChild(item);
+    }
+}
+
+renderBanner();
+if (PAGE.page === 'rooms') {
+    later(() => { renderCurrencyDropdown(); renderRooms(); });
+} else {
+    renderHotelList();
+}
+"""
+
+
+def format_price(eur, currency):
+    """Prix tel qu'affiché par formatPrice (_PAGE_SCRIPT) : « 1\u202f234,56\u00a0€ »"""
+    rate, symbol = CURRENCIES[currency]
+    cents = math.floor(eur * rate * 100 + 0.5)  # Math.round arrondit les demis vers le haut
+    units = f"{cents // 100:,}".replace(',', '\u202f')
+    return f"{units},{cents % 100:02d}\u00a0{symbol}"
+
+
+def _js_number(value):
+    """Nombre tel que converti en chaîne par JavaScript (123.0 -> '123')"""
+    text = repr(value)
+    return text[:-2] if text.endswith('.0') else text
+
+
+def _element(tag, attributes=None, content=''):
+    """Balise sérialisée comme par le navigateur ; `content` est du HTML déjà échappé"""
+    attrs = ''.join(f' {name}="{html.escape(str(value))}"' for name, value in (attributes or {}).items())
+    return f"<{tag}{attrs}>{content}</{tag}>"
+
+
+def _text(value):
+    return html.escape(value, quote=False).replace('\u00a0', '&nbsp;')
+
+
+def page_html(settings, title, header='', content=''):
+    """Page complète : squelette, données PAGE et script de rendu, en-tête et contenu éventuellement pré-rendus"""
+    data = json.dumps(settings, ensure_ascii=False).replace('</', '<\\/')
+    return (
+        f"<!DOCTYPE html><html lang=\"fr\"><head><meta charset=\"utf-8\"><title>{title}</title>"
+        f"<style>{_PAGE_STYLE}</style></head><body>"
+        f"<div id=\"header\">{header}</div><div id=\"content\">{content}</div>"
+        f"<script>const PAGE = {data};</script><script>{_PAGE_SCRIPT}</script>"
+        f"</body></html>"
+    )
+
+
+def rendered_page_html(settings, title, currency=None):
+    """Page après le rendu client de _PAGE_SCRIPT, telle que la sérialise le navigateur (page_source)
+
+    Bannière de cookies acceptée, toutes les cartes d'hôtels chargées ; pour
+    une page de chambres, tarifs dépliés et prix affichés dans `currency`
+    (devise du pays par défaut). Sert à produire des instantanés de rejeu
+    sans navigateur (mock_snapshots.py).
+    """
+    if settings['page'] != 'rooms':
+        cards = ''.join(
+            _element('div', {'class': 'hotel-card-list-view-container'},
+                     _element('h3', {'data-slnm-ihg': 'brandHotelNameSID'}, _text(hotel['name']))
+                     + _element('button', {'data-slnm-ihg': f"selectHotelSID_{hotel['id']}", 'type': 'button'},
+                                'Sélectionner un hôtel'))
+            for hotel in settings['hotels']
+        )
+        return page_html(settings, title, content=cards)
+
+    currency = currency or settings['default_currency']
+    dropdown = _element('div', {'class': 'ui-dropdown'}, _element(
+        'div', {'class': 'ui-dropdown-label-container'}, _element('span', {'class': 'ui-dropdown-label'}, currency)
+    ))
+    items = []
+    for room in settings['rooms']:
+        cards = []
+        for rate in room['rates']:
+            card = ''
+            if rate['member']:
+                card += _element('div', {'class': 'discount themeText'}, 'Prix membre')
+            if rate['corporate']:
+                card += _element('div', {'class': 'preferred themeButtonBackground'}, 'Tarif préférentiel')
+            card += _element('div', {'id': 'rateNameOrPolicy'}, _text(rate['name']))
+            if rate['breakfast']:
+                card += _element('div', {'id': 'meals'}, 'Petit déjeuner inclus')
+            card += _element('div', {'class': 'total-price'}, _element(
+                'span', {'class': 'cash', 'data-eur': _js_number(rate['eur'])}, _text(format_price(rate['eur'], currency))
+            ))
+            cards.append(_element('app-rate-card', content=card))
+        items.append(_element('app-room-rate-item', content=(
+            _element('h2', {'class': 'roomName'}, _text(room['name']))
+            + _element('app-expandable-button', content=_element('button', {'type': 'button'}, 'Voir les prix'))
+            + _element('div', {'class': 'rates'}, ''.join(cards))
+        )))
+    return page_html(settings, title, header=dropdown, content=''.join(items))
+
+
+def _seed(*parts):
+    """Graine stable (indépendante de PYTHONHASHSEED) pour des catalogues reproductibles"""
+    return int.from_bytes(hashlib.blake2b('|'.join(str(part) for part in parts).encode('utf-8'), digest_size=8).digest(), 'big')
+
+
+def parse_stay(params):
+    """(ville, date d'arrivée, nuits, code corporate) depuis les paramètres qXxx d'une URL IHG"""
+    def first(name, default=None):
+        return params.get(name, [default])[0]
+
+    city = (first('qDest') or '').lower()
+    check_in_my, check_out_my = first('qCiMy', ''), first('qCoMy', '')
+    try:
+        # Mois numérotés à partir de 0, comme sur le site réel (qCiMy=MMYYYY)
+        check_in = date(int(check_in_my[2:]), int(check_in_my[:2]) + 1, int(first('qCiD')))
+        check_out = date(int(check_out_my[2:]), int(check_out_my[:2]) + 1, int(first('qCoD')))
+    except (TypeError, ValueError):
+        raise ValueError("Paramètres de séjour invalides")
+    return city, check_in, max(1, (check_out - check_in).days), first('qCpid') or None
+
+
+class MockCatalog:
+    """Hôtels, chambres et tarifs synthétiques, déterministes pour un même séjour"""
+
+    def __init__(self, hotels=10, rooms=3, rates=len(PUBLIC_RATES), dead_code_ratio=0.2):
+        self.hotels = hotels
+        self.rooms = min(rooms, len(ROOM_TYPES))
+        self.rates = min(rates, len(PUBLIC_RATES))
+        self.dead_code_ratio = dead_code_ratio
+
+    def hotel_list(self, city):
+        prefix = ''.join(city.split())[:3].upper()
+        return [
+            {'id': f"{prefix}{index + 1:02d}", 'name': f"{BRANDS[index % len(BRANDS)]} {city.title()} {index + 1}"}
+            for index in range(self.hotels)
+        ]
+
+    def code_active(self, city, code):
+        """Un code corporate est mort dans une ville pour une fraction stable des paires (code, ville)"""
+        return _seed('code', city, code) % 1000 >= self.dead_code_ratio * 1000
+
+    def rooms_for(self, city, hotel_id, check_in, nights, code):
+        rng = random.Random(_seed(city, hotel_id, check_in, nights))
+        nightly = rng.uniform(90, 450)
+        templates = list(PUBLIC_RATES[:self.rates])
+        corporate = code is not None and self.code_active(city, code)
+        rooms = []
+        for index, room_name in enumerate(ROOM_TYPES[:self.rooms]):
+            room_price = nightly * nights * (1 + 0.25 * index)
+            rates = [
+                {'name': name, 'member': member, 'corporate': False, 'breakfast': breakfast,
+                 'eur': round(room_price * factor * rng.uniform(0.97, 1.03), 2)}
+                for name, member, breakfast, factor in templates
+            ]
+            if corporate:
+                name, member, breakfast, factor = CORPORATE_RATE
+                rates.append({'name': name, 'member': member, 'corporate': True, 'breakfast': breakfast,
+                              'eur': round(room_price * factor, 2)})
+            rooms.append({'name': room_name, 'rates': rates})
+        return rooms
+
+    def expected_rates(self, city, code=None, currencies=2):
+        """Nombre de tarifs qu'un scraping complet d'une tâche doit relever"""
+        per_room = self.rates + (1 if code is not None and self.code_active(city, code) else 0)
+        return self.hotels * self.rooms * per_room * currencies
+
+
+def page_settings(page, city, render_delay_ms=300, currency_delay_ms=300, page_size=10, banner='once'):
+    """Données PAGE lues par _PAGE_SCRIPT, hors hôtels et chambres"""
+    return {
+        'page': page,
+        'banner': banner,
+        'render_delay': render_delay_ms,
+        'expand_delay': render_delay_ms // 2,
+        'currency_delay': currency_delay_ms,
+        'page_size': page_size,
+        'currencies': CURRENCIES,
+        'default_currency': CITY_CURRENCIES.get(city, 'EUR'),
+        'currency_cookie': CURRENCY_COOKIE,
+        'consent_cookie': CONSENT_COOKIE,
+    }
+
+
+def search_page(catalog, params, **options):
+    """(données PAGE, titre) de la page de recherche ; chaque hôtel porte l'URL de sa page de chambres"""
+    city, _, _, _ = parse_stay(params)
+    query = {name: values[0] for name, values in params.items()}
+    hotels = [
+        dict(hotel, url=f"{ROOMS_PATH}?{urlencode(dict(query, qSlH=hotel['id']))}")
+        for hotel in catalog.hotel_list(city)
+    ]
+    return dict(page_settings('search', city, **options), hotels=hotels), f"Hôtels à {city.title()}"
+
+
+def rooms_page(catalog, params, **options):
+    """(données PAGE, titre) de la page de sélection des chambres d'un hôtel (qSlH)"""
+    city, check_in, nights, code = parse_stay(params)
+    hotel_id = params.get('qSlH', [''])[0]
+    rooms = catalog.rooms_for(city, hotel_id, check_in, nights, code)
+    return dict(page_settings('rooms', city, **options), rooms=rooms), f"Chambres {hotel_id}"
+
+
+class MockIHGRequestHandler(BaseHTTPRequestHandler):
+    """Pages de recherche et de sélection des chambres avec les sélecteurs du site réel"""
+
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+    server_version = 'MockIHG/1.0'
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        params = parse_qs(url.query)
+        server = self.server
+        try:
+            if url.path == SEARCH_PATH:
+                server.count('search')
+                self._send_page(self._search_page(params))
+            elif url.path == ROOMS_PATH:
+                server.count('rooms')
+                self._send_page(self._rooms_page(params))
+            elif url.path == '/health':
+                self._send(200, 'application/json', b'{"status": "ok"}')
+            else:
+                self._send(404, 'text/plain; charset=utf-8', b'not found')
+        except ValueError as e:
+            self._send(400, 'text/plain; charset=utf-8', str(e).encode('utf-8'))
+
+    def _page_options(self):
+        server = self.server
+        return {
+            'render_delay_ms': server.render_delay_ms,
+            'currency_delay_ms': server.currency_delay_ms,
+            'page_size': server.page_size,
+            'banner': server.banner,
+        }
+
+    def _search_page(self, params):
+        return search_page(self.server.catalog, params, **self._page_options())
+
+    def _rooms_page(self, params):
+        return rooms_page(self.server.catalog, params, **self._page_options())
+
+    def _send_page(self, page):
+        settings, title = page
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        self._send(200, 'text/html; charset=utf-8', page_html(settings, title).encode('utf-8'))
+
+    def _send(self, status, content_type, body):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('Cache-Control', 'no-store')
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logging.debug(f"{self.address_string()} - {format % args}")
+
+
+class MockIHGServer(ThreadingHTTPServer):
+    """Site IHG local : latence réseau (`latency`, secondes) et délais de rendu (millisecondes)"""
+
+    daemon_threads = True
+
+    def __init__(self, address, catalog=None, latency=0.0, render_delay_ms=300, currency_delay_ms=300,
+                 page_size=10, banner='once'):
+        super().__init__(address, MockIHGRequestHandler)
+        self.catalog = catalog or MockCatalog()
+        self.latency = latency
+        self.render_delay_ms = render_delay_ms
+        self.currency_delay_ms = currency_delay_ms
+        self.page_size = page_size
+        self.banner = banner
+        self.page_views = {}
+        self._lock = threading.Lock()
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def count(self, page):
+        with self._lock:
+            self.page_views[page] = self.page_views.get(page, 0) + 1
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    parser = argparse.ArgumentParser(description="Site IHG factice servi en local pour les tests de performance")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8090)
+    parser.add_argument('--hotels', type=int, default=10, help="Hôtels par ville")
+    parser.add_argument('--rooms', type=int, default=3, help="Chambres par hôtel")
+    parser.add_argument('--rates', type=int, default=len(PUBLIC_RATES), help="Tarifs publics par chambre")
+    parser.add_argument('--dead-code-ratio', type=float, default=0.2,
+                        help="Part des paires (code, ville) sans tarif corporate")
+    parser.add_argument('--latency', type=float, default=0.0, help="Délai de réponse des pages (secondes)")
+    parser.add_argument('--render-delay', type=int, default=300, help="Délai de rendu JavaScript (ms)")
+    parser.add_argument('--currency-delay', type=int, default=300, help="Délai de mise à jour des prix (ms)")
+    parser.add_argument('--page-size', type=int, default=10, help="Hôtels chargés par défilement (0 = tous)")
+    parser.add_argument('--banner', choices=BANNER_MODES, default='once', help="Affichage de la bannière de cookies")
+    args = parser.parse_args()
+
+    server = MockIHGServer(
+        (args.host, args.port),
+        MockCatalog(args.hotels, args.rooms, args.rates, args.dead_code_ratio),
+        latency=args.latency,
+        render_delay_ms=args.render_delay,
+        currency_delay_ms=args.currency_delay,
+        page_size=args.page_size,
+        banner=args.banner
+    )
+    logging.info(f"Site IHG factice sur {server.base_url}{SEARCH_PATH}")
+    logging.info(f"Lancer le scraper avec IHG_BASE_URL={server.base_url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
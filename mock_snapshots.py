@@ -0,0 +1,79 @@
+import argparse
+import logging
+import queue
+import sys
+from datetime import datetime
+from urllib.parse import parse_qs, urlparse
+
+from app_workers import ScrapingTask, ScrapingWorker
+from mock_ihg_site import MockCatalog, rendered_page_html, rooms_page, search_page
+from page_snapshots import SnapshotRecorder, load_manifest
+
+MOCK_BASE_URL = 'http://127.0.0.1:8090'
+
+
+class _StaticPage:
+    """Page rendue hors navigateur, présentée à SnapshotRecorder comme un driver"""
+
+    def __init__(self, html, url):
+        self.page_source = html
+        self.current_url = url
+
+
+def record_mock_snapshots(directory, catalog, city, check_in, nights=1, corporate_info=None, hotels=2):
+    """Enregistre les pages du site factice qu'un run parcourrait : liste d'hôtels, puis chambres en EUR et en USD
+
+    Les pages sont produites par rendered_page_html (DOM final du rendu client
+    de mock_ihg_site.py), sans navigateur. Une tâche publique et, si
+    `corporate_info` est donné, la même tâche avec ce code corporate.
+    """
+    recorder = SnapshotRecorder(directory, per_variant=hotels)
+    worker = ScrapingWorker(0, queue.Queue(), directory, error_log=None)
+    worker.base_url = MOCK_BASE_URL
+    tasks = [ScrapingTask(city, check_in, nights)]
+    if corporate_info:
+        tasks.append(ScrapingTask(city, check_in, nights, corporate_info))
+
+    for task in tasks:
+        search_url = worker._generate_url(task)
+        settings, title = search_page(catalog, parse_qs(urlparse(search_url).query))
+        recorder.record(_StaticPage(rendered_page_html(settings, title), search_url), 'hotel_list', task)
+        for hotel in settings['hotels'][:hotels]:
+            rooms_url = f"{MOCK_BASE_URL}{hotel['url']}"
+            rooms, rooms_title = rooms_page(catalog, parse_qs(urlparse(rooms_url).query))
+            for currency in ('EUR', 'USD'):
+                page = _StaticPage(rendered_page_html(rooms, rooms_title, currency), rooms_url)
+                recorder.record(page, 'rooms', task, currency, hotel['name'])
+    return recorder.recorded
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Écrit un jeu d'instantanés DOM du site factice (mock_ihg_site.py) pour replay_snapshots.py"
+    )
+    parser.add_argument('directory', help="Répertoire d'instantanés à créer")
+    parser.add_argument('--city', default='paris')
+    parser.add_argument('--check-in', default='2025-03-10', help="Date d'arrivée (AAAA-MM-JJ)")
+    parser.add_argument('--nights', type=int, default=1)
+    parser.add_argument('--company', default='Oracle', help="Entreprise de la tâche corporate")
+    parser.add_argument('--code', default='100183394', help="Code corporate (vide = tâche publique seule)")
+    parser.add_argument('--hotels', type=int, default=2, help="Hôtels dont les chambres sont enregistrées")
+    parser.add_argument('--rooms', type=int, default=2, help="Chambres par hôtel")
+    args = parser.parse_args()
+
+    if load_manifest(args.directory):
+        parser.error(f"{args.directory} contient déjà des instantanés")
+    corporate_info = (args.company, args.code) if args.code else None
+
+    recorded = record_mock_snapshots(
+        args.directory, MockCatalog(hotels=max(4, args.hotels), rooms=args.rooms), args.city,
+        datetime.strptime(args.check_in, '%Y-%m-%d'), args.nights, corporate_info, args.hotels
+    )
+    print(f"{recorded} instantanés enregistrés dans {args.directory}")
+    print(f"Références : python replay_snapshots.py {args.directory} --update")
+    sys.exit(0 if recorded else 1)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(levelname)s - %(message)s')
+    main()
@@ -0,0 +1,106 @@
+from rate_buffer import iter_entry_rates, rate_fields
+
+# Version du format normalisé des fichiers de résultats
+FORMAT = 'normalized/2'
+
+
+def split_stay_rates(stay, rates):
+    """Sépare les tarifs d'une tâche en partie publique et partie corporate
+
+    Les tarifs membres et non membres sont identiques quel que soit le code
+    corporate : ils sont rattachés au séjour public (sans code). Seuls les
+    tarifs corporate restent rattachés au séjour du code. `rates` est une liste
+    de (RateClass, devise, centimes) ; retourne une liste de (séjour, tarifs)
+    sans partie vide.
+    """
+    if not stay.get('code'):
+        return [(stay, rates)] if rates else []
+
+    public_rates = [rate for rate in rates if not rate[0].corporate]
+    corporate_rates = [rate for rate in rates if rate[0].corporate]
+
+    parts = []
+    if public_rates:
+        parts.append((dict(stay, company=None, code=None), public_rates))
+    if corporate_rates:
+        parts.append((stay, corporate_rates))
+    return parts
+
+
+def public_key(entry):
+    """Clé du séjour public correspondant à une entrée"""
+    return (
+        f"{entry['Hotel']}|{entry['Chambre']}|{entry['Date_Arrivee']}|"
+        f"{entry['Date_Depart']}|{entry['Nombre_Nuits']}"
+    )
+
+
+def to_document(entries):
+    """Construit le document normalisé à partir d'entrées au format plat
+
+    Les tarifs publics sont stockés une seule fois par séjour dans 'public' ;
+    'corporate' ne contient que les tarifs corporate de chaque code. Les tarifs
+    sont stockés sous forme structurée.
+    """
+    public = {}
+    corporate = {}
+    for entry_key, entry in entries.items():
+        rates = [rate_fields(*rate) for rate in iter_entry_rates(entry)]
+        if not entry.get('Code_Corporate'):
+            # Une recherche corporate a pu créer ce séjour avant : ses tarifs absents de l'entrée publique sont gardés
+            shared = public.setdefault(entry_key, {'Tarifs': []})
+            known = {_rate_slot(rate) for rate in rates}
+            seen_in_corporate = [rate for rate in shared['Tarifs'] if _rate_slot(rate) not in known]
+            public[entry_key] = dict(entry, Tarifs=rates + seen_in_corporate)
+            continue
+
+        corporate[entry_key] = dict(entry, Tarifs=[rate for rate in rates if rate['Corporate']])
+        public_rates = [rate for rate in rates if not rate['Corporate']]
+        if public_rates:
+            # Tarifs publics vus uniquement lors d'une recherche corporate
+            shared = public.setdefault(
+                public_key(entry), dict(entry, Entreprise_Cliente=None, Code_Corporate=None, Tarifs=[])
+            )
+            known = {_rate_slot(rate) for rate in shared['Tarifs']}
+            shared['Tarifs'].extend(rate for rate in public_rates if _rate_slot(rate) not in known)
+
+    return {'format': FORMAT, 'public': public, 'corporate': corporate}
+
+
+def iter_flat_entries(document):
+    """Vue à plat d'un fichier de résultats : itère sur (clé, entrée)
+
+    Accepte le format normalisé comme l'ancien format plat. Pour le format
+    normalisé, chaque entrée corporate est recomposée avec les tarifs publics
+    de son séjour.
+    """
+    if not str(document.get('format', '')).startswith('normalized/'):
+        yield from document.items()
+        return
+
+    public = document.get('public', {})
+    yield from public.items()
+
+    for entry_key, entry in document.get('corporate', {}).items():
+        public_entry = public.get(public_key(entry))
+        public_rates = _as_rate_list(public_entry) if public_entry else []
+        yield entry_key, dict(entry, Tarifs=public_rates + _as_rate_list(entry))
+
+
+def iter_stored_entries(document):
+    """Itère sur les entrées telles que stockées (tarifs publics et corporate séparés)"""
+    if document.get('format') != FORMAT:
+        document = to_document(dict(iter_flat_entries(document)))
+    yield from document['public'].values()
+    yield from document['corporate'].values()
+
+
+def _as_rate_list(entry):
+    """Tarifs structurés d'une entrée, quel que soit son format"""
+    if isinstance(entry.get('Tarifs'), list):
+        return list(entry['Tarifs'])
+    return [rate_fields(*rate) for rate in iter_entry_rates(entry)]
+
+
+def _rate_slot(rate):
+    return (rate['Corporate'], rate['Membre'], rate['Annulation_Gratuite'], rate['Petit_Dejeuner'], rate['Devise'])
@@ -0,0 +1,414 @@
+import gzip
+import json
+import logging
+import os
+import re
+import threading
+import time
+from datetime import datetime
+from functools import lru_cache
+from html.parser import HTMLParser
+
+from selenium.common.exceptions import InvalidSelectorException, NoSuchElementException
+from selenium.webdriver.common.by import By
+
+MANIFEST = 'manifest.jsonl'
+
+# Éléments sans balise fermante, et contenus jamais affichés (exclus de .text)
+_VOID_TAGS = frozenset(('area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'link', 'meta', 'source', 'track', 'wbr'))
+_HIDDEN_TAGS = frozenset(('script', 'style', 'template', 'noscript', 'head'))
+# Éléments fermés implicitement par l'ouverture d'un frère de même balise (<li>1<li>2)
+_SIBLING_CLOSED_TAGS = frozenset(('li', 'p', 'option', 'tr', 'td', 'th', 'dt', 'dd'))
+
+
+class SnapshotRecorder:
+    """Enregistre le DOM des pages parcourues pendant un run normal (liste d'hôtels, chambres et tarifs)
+
+    Un fichier HTML compressé par instantané et une ligne par instantané dans
+    manifest.jsonl (type de page, ville, séjour, code corporate, devise,
+    hôtel). Au plus `per_variant` instantanés par combinaison (type de page,
+    ville, code corporate, devise) : l'échantillon couvre devises et codes sans
+    enregistrer tout le run. Partagé entre les workers.
+    """
+
+    def __init__(self, directory, per_variant=3):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.per_variant = per_variant
+        self.recorded = 0
+        self._lock = threading.Lock()
+        self._counts = {}  # variante -> instantanés enregistrés
+        self._manifest = os.path.join(directory, MANIFEST)
+        # Reprise d'un répertoire existant : numérotation et quotas continuent
+        self._next_index = 0
+        for entry in load_manifest(directory):
+            variant = _variant(entry['kind'], entry['city'], entry['code'], entry['currency'])
+            self._counts[variant] = self._counts.get(variant, 0) + 1
+            self._next_index += 1
+
+    def record(self, driver, kind, task, currency=None, hotel=None, worker_id=None):
+        """Enregistre la page courante si le quota de sa variante n'est pas atteint"""
+        code = task.corporate_info[1] if task.corporate_info else None
+        variant = _variant(kind, task.city, code, currency)
+        with self._lock:
+            if self._counts.get(variant, 0) >= self.per_variant:
+                return None
+            self._counts[variant] = self._counts.get(variant, 0) + 1
+            index = self._next_index
+            self._next_index += 1
+
+        try:
+            html = driver.page_source
+            url = driver.current_url
+        except Exception as e:
+            logging.warning(f"Instantané {kind} non enregistré: {str(e)}")
+            with self._lock:
+                self._counts[variant] -= 1
+            return None
+
+        filename = f"{index:05d}_{kind}.html.gz"
+        with gzip.open(os.path.join(self.directory, filename), 'wt', encoding='utf-8') as f:
+            f.write(html)
+        entry = {
+            'file': filename,
+            'kind': kind,
+            'url': url,
+            'city': task.city,
+            'check_in': task.check_in_date.strftime('%Y-%m-%d'),
+            'nights': task.duration,
+            'company': task.corporate_info[0] if task.corporate_info else None,
+            'code': code,
+            'currency': currency,
+            'hotel': hotel,
+            'worker': worker_id,
+            'recorded_at': datetime.now().isoformat(timespec='seconds'),
+        }
+        with self._lock:
+            with open(self._manifest, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + '\n')
+            self.recorded += 1
+        return filename
+
+
+def _variant(kind, city, code, currency):
+    return (kind, city, code or '', currency or '')
+
+
+def load_manifest(directory):
+    path = os.path.join(directory, MANIFEST)
+    if not os.path.exists(path):
+        return []
+    with open(path, 'r', encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def read_snapshot(directory, entry):
+    with gzip.open(os.path.join(directory, entry['file']), 'rt', encoding='utf-8') as f:
+        return f.read()
+
+
+def recorder_from_env():
+    """Enregistreur activé par SCRAPING_SNAPSHOT_DIR (quota par variante : SCRAPING_SNAPSHOT_PER_VARIANT), sinon None"""
+    directory = os.environ.get('SCRAPING_SNAPSHOT_DIR')
+    if not directory:
+        return None
+    return SnapshotRecorder(directory, int(os.environ.get('SCRAPING_SNAPSHOT_PER_VARIANT', 3)))
+
+
+class _Node:
+    __slots__ = ('tag', 'attrs', 'children', 'parent')
+
+    def __init__(self, tag, attrs, parent):
+        self.tag = tag
+        self.attrs = attrs
+        self.children = []  # Nœuds et textes, dans l'ordre du document
+        self.parent = parent
+
+    def iter_descendants(self):
+        stack = [child for child in reversed(self.children) if isinstance(child, _Node)]
+        while stack:
+            node = stack.pop()
+            yield node
+            stack.extend(child for child in reversed(node.children) if isinstance(child, _Node))
+
+    def text(self):
+        """Texte affiché approché : espaces regroupés, retours à la ligne sur <br>"""
+        parts = []
+        stack = [self]
+        while stack:
+            item = stack.pop()
+            if isinstance(item, str):
+                parts.append(item)
+            elif item.tag == 'br':
+                parts.append('\n')
+            elif item.tag not in _HIDDEN_TAGS and 'hidden' not in item.attrs:
+                stack.extend(reversed(item.children))
+        lines = (' '.join(line.split()) for line in ''.join(parts).split('\n'))
+        return '\n'.join(line for line in lines if line)
+
+
+class _DomBuilder(HTMLParser):
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.document = _Node(None, {}, None)
+        self._current = self.document
+
+    def handle_starttag(self, tag, attrs):
+        if tag in _SIBLING_CLOSED_TAGS and self._current.tag == tag:
+            self._current = self._current.parent
+        node = _Node(tag, {name: value if value is not None else '' for name, value in attrs}, self._current)
+        self._current.children.append(node)
+        if tag not in _VOID_TAGS:
+            self._current = node
+
+    def handle_startendtag(self, tag, attrs):
+        self._current.children.append(
+            _Node(tag, {name: value if value is not None else '' for name, value in attrs}, self._current)
+        )
+
+    def handle_endtag(self, tag):
+        # Balises mal imbriquées : on remonte jusqu'à l'élément ouvert correspondant, s'il existe
+        node = self._current
+        while node is not None and node.tag != tag:
+            node = node.parent
+        if node is not None and node.parent is not None:
+            self._current = node.parent
+
+    def handle_data(self, data):
+        self._current.children.append(data)
+
+
+def parse_html(html):
+    builder = _DomBuilder()
+    builder.feed(html)
+    builder.close()
+    return builder.document
+
+
+# Sélecteurs CSS pris en charge : balise, #id, .classe, [attr], [attr=v], [attr^=v], [attr$=v], [attr*=v],
+# [attr~=v], combinés par descendance (espace) ou filiation (>)
+_SIMPLE_SELECTOR = re.compile(
+    r"""(?P<tag>\*|[\w-]+)|\#(?P<id>[\w-]+)|\.(?P<cls>[\w-]+)"""
+    r"""|\[\s*(?P<attr>[\w:-]+)\s*(?:(?P<op>[\^$*~]?=)\s*(?:'(?P<sq>[^']*)'|"(?P<dq>[^"]*)"|(?P<bare>[^\]\s]*)))?\s*\]"""
+)
+
+
+@lru_cache(maxsize=256)
+def _parse_selector(selector):
+    """'div.total-price span.cash' -> ((' ', compound), (' ', compound)) ; compound = (balise, [(attr, op, valeur)])"""
+    steps = []
+    combinator = ' '
+    pos = 0
+    text = selector.strip()
+    while pos < len(text):
+        tag = None
+        conditions = []
+        start = pos
+        while pos < len(text):
+            match = _SIMPLE_SELECTOR.match(text, pos)
+            if not match or match.end() == pos:
+                break
+            if match.group('tag'):
+                if pos != start:
+                    raise InvalidSelectorException(f"Sélecteur non pris en charge en rejeu: {selector}")
+                tag = None if match.group('tag') == '*' else match.group('tag').lower()
+            elif match.group('id'):
+                conditions.append(('id', '=', match.group('id')))
+            elif match.group('cls'):
+                conditions.append(('class', '~=', match.group('cls')))
+            else:
+                value = next((v for v in match.group('sq', 'dq', 'bare') if v is not None), None)
+                conditions.append((match.group('attr').lower(), match.group('op'), value))
+            pos = match.end()
+        if pos == start:
+            raise InvalidSelectorException(f"Sélecteur non pris en charge en rejeu: {selector}")
+        steps.append((combinator, (tag, tuple(conditions))))
+
+        combinator = ' '
+        while pos < len(text) and text[pos] in ' \t\n>':
+            if text[pos] == '>':
+                combinator = '>'
+            pos += 1
+    return tuple(steps)
+
+
+def _matches_compound(node, compound):
+    tag, conditions = compound
+    if tag is not None and node.tag != tag:
+        return False
+    for name, op, value in conditions:
+        actual = node.attrs.get(name)
+        if actual is None:
+            return False
+        if op is None:
+            continue
+        if op == '=' and actual != value:
+            return False
+        if op == '~=' and value not in actual.split():
+            return False
+        if op == '^=' and not (value and actual.startswith(value)):
+            return False
+        if op == '$=' and not (value and actual.endswith(value)):
+            return False
+        if op == '*=' and not (value and value in actual):
+            return False
+    return True
+
+
+def _matches(node, steps, index):
+    combinator, compound = steps[index]
+    if not _matches_compound(node, compound):
+        return False
+    if index == 0:
+        return True
+    parent = node.parent
+    if combinator == '>':
+        return parent is not None and parent.tag is not None and _matches(parent, steps, index - 1)
+    while parent is not None and parent.tag is not None:
+        if _matches(parent, steps, index - 1):
+            return True
+        parent = parent.parent
+    return False
+
+
+def _css(by, value):
+    if by == By.CSS_SELECTOR:
+        return value
+    if by == By.CLASS_NAME:
+        return f".{value}"
+    if by == By.ID:
+        return f'[id="{value}"]'
+    if by == By.TAG_NAME:
+        return value
+    if by == By.NAME:
+        return f'[name="{value}"]'
+    raise InvalidSelectorException(f"Localisateur non pris en charge en rejeu: {by}")
+
+
+def _select(root, by, value, driver):
+    """Équivalent de querySelectorAll : le sélecteur entier est évalué dans le document,
+    les résultats restreints aux descendants de `root`"""
+    steps = _parse_selector(_css(by, value))
+    last = len(steps) - 1
+    return [ReplayElement(node, driver) for node in root.iter_descendants() if _matches(node, steps, last)]
+
+
+class ReplayElement:
+    """WebElement sur un nœud d'instantané : lecture seule, clics sans effet"""
+
+    def __init__(self, node, driver):
+        self._node = node
+        self.parent = driver
+
+    @property
+    def tag_name(self):
+        return self._node.tag
+
+    @property
+    def text(self):
+        return self._node.text()
+
+    def get_attribute(self, name):
+        return self._node.attrs.get(name)
+
+    get_dom_attribute = get_attribute
+
+    def is_displayed(self):
+        return 'hidden' not in self._node.attrs
+
+    def is_enabled(self):
+        return 'disabled' not in self._node.attrs
+
+    def is_selected(self):
+        return 'selected' in self._node.attrs or 'checked' in self._node.attrs
+
+    def click(self):
+        pass
+
+    def find_elements(self, by=By.ID, value=None):
+        return _select(self._node, by, value, self.parent)
+
+    def find_element(self, by=By.ID, value=None):
+        elements = self.find_elements(by, value)
+        if not elements:
+            raise NoSuchElementException(f"Élément absent de l'instantané: {by}={value}")
+        return elements[0]
+
+    def __eq__(self, other):
+        return isinstance(other, ReplayElement) and other._node is self._node
+
+    def __hash__(self):
+        return id(self._node)
+
+
+class ReplayDriver:
+    """Driver Selenium minimal servant un instantané DOM figé (sans navigateur ni réseau)
+
+    Les scripts JavaScript ne sont pas exécutés : défilements et clics sont
+    sans effet et document.body.scrollHeight est constant. Le DOM enregistré
+    contient déjà les hôtels chargés au défilement et les tarifs dépliés.
+    """
+
+    def __init__(self, html, url=''):
+        self.page_source = html
+        self.current_url = url
+        self.document = parse_html(html)
+        self.scripts = 0
+
+    def find_elements(self, by=By.ID, value=None):
+        return _select(self.document, by, value, self)
+
+    def find_element(self, by=By.ID, value=None):
+        elements = self.find_elements(by, value)
+        if not elements:
+            raise NoSuchElementException(f"Élément absent de l'instantané: {by}={value}")
+        return elements[0]
+
+    def execute_script(self, script, *args):
+        self.scripts += 1
+        if 'scrollHeight' in script:
+            return 10000
+        return None
+
+    def get(self, url):
+        self.current_url = url
+
+    def back(self):
+        pass
+
+    def refresh(self):
+        pass
+
+    def quit(self):
+        pass
+
+
+class VirtualClock:
+    """Horloge fictive : time.sleep avance time.monotonic au lieu d'attendre
+
+    Les pauses fixes du scraper et les attentes WebDriverWait (qui lisent
+    time.monotonic) s'écoulent instantanément pendant le rejeu ; `skipped`
+    cumule le temps ainsi évité. Remplacement global, à réserver au rejeu.
+    """
+
+    def __init__(self):
+        self.skipped = 0.0
+        self._originals = None
+
+    def __enter__(self):
+        self._originals = (time.sleep, time.monotonic)
+        monotonic = time.monotonic
+
+        def virtual_sleep(seconds):
+            self.skipped += max(0.0, seconds)
+
+        def virtual_monotonic():
+            return monotonic() + self.skipped
+
+        time.sleep = virtual_sleep
+        time.monotonic = virtual_monotonic
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        time.sleep, time.monotonic = self._originals
+        return False
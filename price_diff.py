@@ -0,0 +1,214 @@
+import argparse
+import gzip
+import json
+import logging
+import os
+import shutil
+import tempfile
+from collections import Counter
+from datetime import datetime
+
+from export_pipeline import list_result_files, load_result_file
+from normalized_results import iter_stored_entries
+from price_history import EVENTS_FILE, observation_key, read_events
+from rate_buffer import iter_entry_rates
+
+HISTORY_PREFIX = 'history:'
+
+# Champs d'une observation, dans l'ordre des enregistrements des partitions
+FIELDS = (
+    'hotel', 'room', 'city', 'check_in', 'check_out', 'code', 'company',
+    'rate_class', 'currency', 'scraped_at', 'price_cents'
+)
+_SCRAPED_AT = FIELDS.index('scraped_at')
+_PRICE = FIELDS.index('price_cents')
+
+
+def iter_run_observations(directory):
+    """Observations d'un dossier de résultats : (clé normalisée, champs)"""
+    for path in list_result_files([directory]):
+        document = load_result_file(path)
+        if document is None:
+            continue
+        for entry in iter_stored_entries(document):
+            for rate_class, currency, price_cents in iter_entry_rates(entry):
+                if price_cents is None:
+                    continue
+                code = entry.get('Code_Corporate') or ''
+                label = rate_class.label
+                key = observation_key(
+                    entry['Hotel'], entry['Chambre'], entry['Date_Arrivee'], entry['Date_Depart'],
+                    code, label, currency
+                )
+                yield key, (
+                    entry['Hotel'], entry['Chambre'], entry['Ville'], entry['Date_Arrivee'],
+                    entry['Date_Depart'], code, entry.get('Entreprise_Cliente') or '', label,
+                    currency, entry['Date_Scraping'], price_cents
+                )
+
+
+def iter_history_observations(history_dir, until):
+    """Observations de l'historique des prix telles qu'elles étaient à la date `until`
+
+    Le journal ne contient que les changements : le dernier événement antérieur
+    à `until` donne le prix de chaque observation à cette date.
+    """
+    for event in read_events(os.path.join(history_dir, EVENTS_FILE)):
+        if event['scraped_at'] > until:
+            continue
+        yield event['key'], (
+            event['hotel'], event['room'], event['city'], event['check_in'], event['check_out'],
+            event['code'] or '', event['company'] or '', event['rate_class'], event['currency'],
+            event['scraped_at'], event['price_cents']
+        )
+
+
+def iter_source(source, history_dir):
+    """Observations d'une source : dossier de run ou 'history:<date>'"""
+    if source.startswith(HISTORY_PREFIX):
+        until = source[len(HISTORY_PREFIX):].strip()
+        if len(until) == 10:
+            until += ' 23:59:59'
+        return iter_history_observations(history_dir, until)
+    if not os.path.isdir(source):
+        raise ValueError(f"Source introuvable: {source}")
+    return iter_run_observations(source)
+
+
+class Partitions:
+    """Partitionnement des observations en fichiers temporaires par empreinte de clé
+
+    Chaque côté de la jointure est écrit dans `bucket_count` fichiers : une
+    même clé tombe dans la partition de même numéro des deux côtés, et une
+    seule paire de partitions est chargée en mémoire à la fois.
+    """
+
+    def __init__(self, directory, side, bucket_count):
+        self.paths = [os.path.join(directory, f"{side}_{index:04d}.jsonl") for index in range(bucket_count)]
+        self._files = [open(path, 'w', encoding='utf-8') for path in self.paths]
+        self.count = 0
+
+    def add(self, key, fields):
+        self._files[int(key[:8], 16) % len(self._files)].write(
+            json.dumps([key, *fields], ensure_ascii=False) + '\n'
+        )
+        self.count += 1
+
+    def close(self):
+        for f in self._files:
+            f.close()
+
+
+def load_partition(path):
+    """Charge une partition en table de hachage {clé: champs} (le relevé le plus récent l'emporte)"""
+    table = {}
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            key, *fields = json.loads(line)
+            current = table.get(key)
+            if current is None or fields[_SCRAPED_AT] >= current[_SCRAPED_AT]:
+                table[key] = fields
+    return table
+
+
+def diff_partitions(old_path, new_path):
+    """Jointure par hachage d'une paire de partitions ; génère (type, ancien, nouveau)"""
+    old = load_partition(old_path)
+    for key, new_fields in load_partition(new_path).items():
+        old_fields = old.pop(key, None)
+        if old_fields is None:
+            yield 'added', None, new_fields
+        elif old_fields[_PRICE] != new_fields[_PRICE]:
+            yield 'changed', old_fields, new_fields
+        else:
+            yield 'unchanged', old_fields, new_fields
+    for old_fields in old.values():
+        yield 'removed', old_fields, None
+
+
+def change_record(change, old_fields, new_fields):
+    """Ligne compacte du rapport de changements"""
+    fields = new_fields or old_fields
+    old_price = old_fields[_PRICE] if old_fields else None
+    new_price = new_fields[_PRICE] if new_fields else None
+    record = {'change': change}
+    record.update(zip(FIELDS[:_SCRAPED_AT], fields))
+    record['old_cents'] = old_price
+    record['new_cents'] = new_price
+    if change == 'changed':
+        record['delta_cents'] = new_price - old_price
+        record['delta_pct'] = round(100 * (new_price - old_price) / old_price, 2) if old_price else None
+    return record
+
+
+def diff_sources(old_source, new_source, report_path, history_dir='price_history', bucket_count=64):
+    """Compare deux sources et écrit le rapport des changements (JSONL gzip)
+
+    La mémoire utilisée dépend de la taille d'une partition, pas du volume total :
+    augmenter `bucket_count` pour les très gros runs. Retourne le résumé.
+    """
+    summary = Counter()
+    by_city = {}
+    workdir = tempfile.mkdtemp(prefix='price_diff_')
+    try:
+        sides = []
+        for side, source in (('old', old_source), ('new', new_source)):
+            partitions = Partitions(workdir, side, bucket_count)
+            try:
+                for key, fields in iter_source(source, history_dir):
+                    partitions.add(key, fields)
+            finally:
+                partitions.close()
+            logging.info(f"{source}: {partitions.count} observations partitionnées")
+            sides.append(partitions)
+
+        with gzip.open(report_path, 'wt', encoding='utf-8') as report:
+            for old_path, new_path in zip(sides[0].paths, sides[1].paths):
+                for change, old_fields, new_fields in diff_partitions(old_path, new_path):
+                    summary[change] += 1
+                    if change == 'unchanged':
+                        continue
+                    city = (new_fields or old_fields)[FIELDS.index('city')]
+                    by_city.setdefault(city, Counter())[change] += 1
+                    report.write(json.dumps(change_record(change, old_fields, new_fields), ensure_ascii=False) + '\n')
+                os.remove(old_path)
+                os.remove(new_path)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    return {
+        'old': old_source,
+        'new': new_source,
+        'report': report_path,
+        'totals': dict(summary),
+        'by_city': {city: dict(counts) for city, counts in sorted(by_city.items())},
+    }
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    parser = argparse.ArgumentParser(description="Différences de prix entre deux runs ou deux dates de l'historique")
+    parser.add_argument('old', help="Dossier scraping_results_* ou 'history:YYYY-MM-DD[ HH:MM:SS]'")
+    parser.add_argument('new', help="Dossier scraping_results_* ou 'history:YYYY-MM-DD[ HH:MM:SS]'")
+    parser.add_argument('--history-dir', default='price_history')
+    parser.add_argument('--buckets', type=int, default=64, help="Nombre de partitions de la jointure")
+    parser.add_argument('--output-dir', default='price_diffs')
+    args = parser.parse_args()
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    current_time = datetime.now().strftime("%Y%m%d_%H%M%S")
+    report_path = os.path.join(args.output_dir, f"price_diff_{current_time}.jsonl.gz")
+    summary = diff_sources(args.old, args.new, report_path, args.history_dir, args.buckets)
+
+    with open(os.path.join(args.output_dir, f"price_diff_{current_time}_summary.json"), 'w', encoding='utf-8') as f:
+        json.dump(summary, f, indent=4, ensure_ascii=False)
+
+    totals = summary['totals']
+    logging.info(
+        f"Ajoutés: {totals.get('added', 0)}, supprimés: {totals.get('removed', 0)}, "
+        f"modifiés: {totals.get('changed', 0)}, inchangés: {totals.get('unchanged', 0)}"
+    )
+    for city, counts in summary['by_city'].items():
+        logging.info(f"  {city}: {counts}")
+    logging.info(f"Rapport des changements: {report_path}")
@@ -0,0 +1,215 @@
+import argparse
+import hashlib
+import json
+import logging
+import os
+import threading
+from datetime import datetime
+
+from rate_buffer import DATE_FORMAT, DATETIME_FORMAT, iter_entry_rates
+from normalized_results import iter_stored_entries
+
+EVENTS_FILE = 'events.jsonl'
+
+
+def observation_key(hotel, room, check_in, check_out, code, rate_class, currency):
+    """Empreinte d'une observation (hôtel, chambre, séjour, code, classe de tarif, devise)"""
+    raw = '\x1f'.join((
+        hotel, room, _format_date(check_in), _format_date(check_out),
+        code or '', rate_class, currency
+    ))
+    return hashlib.blake2b(raw.encode('utf-8'), digest_size=12).hexdigest()
+
+
+def read_events(events_path):
+    """Lit un journal d'événements en streaming, sans l'ouvrir en écriture"""
+    if not os.path.exists(events_path):
+        return
+    with open(events_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                yield json.loads(line)
+            except ValueError:
+                continue
+
+
+class PriceHistory:
+    """Historique des prix sous forme de journal d'événements
+
+    Un événement n'est ajouté que lorsque le prix d'une observation diffère de la
+    dernière valeur connue : les relevés inchangés ne coûtent qu'une recherche
+    dans l'index en mémoire. La position de chaque événement dans le journal est
+    indexée par empreinte : timeline() ne relit que les lignes de l'observation.
+    """
+
+    def __init__(self, directory='price_history', fsync_every=50):
+        self.directory = directory
+        self.events_path = os.path.join(directory, EVENTS_FILE)
+        self.fsync_every = fsync_every
+        self._last_price = {}
+        self._offsets = {}  # empreinte -> positions de ses événements dans le journal
+        self._lock = threading.Lock()
+        self._batches_since_sync = 0
+        self.observations = 0
+        self.events_written = 0
+
+        os.makedirs(directory, exist_ok=True)
+        self._size = 0
+        complete = True
+        if os.path.exists(self.events_path):
+            with open(self.events_path, 'rb') as f:
+                for line in f:
+                    offset = self._size
+                    self._size += len(line)
+                    complete = line.endswith(b'\n')
+                    try:
+                        event = json.loads(line)
+                    except ValueError:
+                        continue
+                    self._last_price[event['key']] = event['price_cents']
+                    self._offsets.setdefault(event['key'], []).append(offset)
+        self._file = open(self.events_path, 'ab')
+        if not complete:
+            # Dernière ligne tronquée par un arrêt brutal : ne pas y coller le prochain événement
+            self._file.write(b'\n')
+            self._size += 1
+
+    def iter_events(self):
+        """Parcourt le journal en streaming (les lignes tronquées par un arrêt brutal sont ignorées)"""
+        return read_events(self.events_path)
+
+    def last_price(self, key):
+        """Dernier prix connu (en centimes) pour une empreinte d'observation"""
+        return self._last_price.get(key)
+
+    def record_stay(self, stay, rates):
+        """Enregistre les tarifs d'un séjour ; retourne le nombre d'événements ajoutés
+
+        `stay` suit le format de RateBuffer.add_stay et `rates` est une liste de
+        (RateClass, devise, prix en centimes).
+        """
+        scraped_at = stay['scraped_at']
+        if isinstance(scraped_at, datetime):
+            scraped_at = scraped_at.strftime(DATETIME_FORMAT)
+
+        lines = []
+        keys = []
+        with self._lock:
+            for rate_class, currency, price_cents in rates:
+                if price_cents is None:
+                    continue
+                self.observations += 1
+                key = observation_key(
+                    stay['hotel'], stay['room'], stay['check_in'], stay['check_out'],
+                    stay['code'], rate_class.label, currency
+                )
+                previous = self._last_price.get(key)
+                if previous == price_cents:
+                    continue
+
+                self._last_price[key] = price_cents
+                keys.append(key)
+                lines.append(json.dumps({
+                    'key': key,
+                    'scraped_at': scraped_at,
+                    'hotel': stay['hotel'],
+                    'room': stay['room'],
+                    'city': stay['city'],
+                    'check_in': _format_date(stay['check_in']),
+                    'check_out': _format_date(stay['check_out']),
+                    'code': stay['code'],
+                    'company': stay['company'],
+                    'rate_class': rate_class.label,
+                    'currency': currency,
+                    'price_cents': price_cents,
+                    'previous_cents': previous
+                }, ensure_ascii=False))
+
+            if lines:
+                encoded = [(line + '\n').encode('utf-8') for line in lines]
+                for key, line in zip(keys, encoded):
+                    self._offsets.setdefault(key, []).append(self._size)
+                    self._size += len(line)
+                self._file.write(b''.join(encoded))
+                self._file.flush()
+                self.events_written += len(lines)
+                self._batches_since_sync += 1
+                if self._batches_since_sync >= self.fsync_every:
+                    self._sync()
+        return len(lines)
+
+    def record_entry(self, entry):
+        """Enregistre une entrée de fichier de résultats (dictionnaire avec 'Tarifs')"""
+        stay = {
+            'scraped_at': entry['Date_Scraping'],
+            'hotel': entry['Hotel'],
+            'room': entry['Chambre'],
+            'city': entry['Ville'],
+            'check_in': entry['Date_Arrivee'],
+            'check_out': entry['Date_Depart'],
+            'code': entry.get('Code_Corporate'),
+            'company': entry.get('Entreprise_Cliente')
+        }
+        return self.record_stay(stay, list(iter_entry_rates(entry)))
+
+    def timeline(self, key):
+        """Liste chronologique des changements de prix d'une observation"""
+        with self._lock:
+            offsets = list(self._offsets.get(key, ()))
+        events = []
+        with open(self.events_path, 'rb') as f:
+            for offset in offsets:
+                f.seek(offset)
+                events.append(json.loads(f.readline()))
+        return events
+
+    def close(self):
+        with self._lock:
+            self._sync()
+            self._file.close()
+
+    def _sync(self):
+        try:
+            os.fsync(self._file.fileno())
+        except OSError as e:
+            logging.error(f"Erreur fsync historique des prix: {str(e)}")
+        self._batches_since_sync = 0
+
+
+def _format_date(value):
+    return value if isinstance(value, str) else value.strftime(DATE_FORMAT)
+
+
+def ingest_directories(history, directories):
+    """Importe des dossiers de résultats existants, du plus ancien relevé au plus récent"""
+    entries = []
+    for directory in directories:
+        for filename in sorted(os.listdir(directory)):
+            if not filename.endswith('.json'):
+                continue
+            try:
+                with open(os.path.join(directory, filename), 'r', encoding='utf-8') as f:
+                    entries.extend(iter_stored_entries(json.load(f)))
+            except Exception as e:
+                logging.error(f"Erreur lors de la lecture de {filename}: {str(e)}")
+
+    entries.sort(key=lambda entry: entry['Date_Scraping'])
+    for entry in entries:
+        history.record_entry(entry)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    parser = argparse.ArgumentParser(description="Importe des résultats de scraping dans l'historique des prix")
+    parser.add_argument('directories', nargs='*', help="Dossiers scraping_results_* (tous par défaut)")
+    parser.add_argument('--history-dir', default='price_history')
+    args = parser.parse_args()
+
+    directories = args.directories or sorted(
+        item for item in os.listdir('.') if os.path.isdir(item) and item.startswith('scraping_results')
+    )
+    history = PriceHistory(args.history_dir)
+    ingest_directories(history, directories)
+    history.close()
+    logging.info(f"{history.observations} observations, {history.events_written} changements enregistrés")
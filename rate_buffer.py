@@ -0,0 +1,343 @@
+import array
+import re
+from datetime import datetime, date, timedelta
+
+from rate_class import RateClass
+
+DATE_FORMAT = '%Y-%m-%d'
+DATETIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+# Valeur sentinelle pour un prix illisible (les prix sont stockés en centimes)
+MISSING_PRICE = -1
+
+_EPOCH = datetime(1970, 1, 1)
+
+_PRICE_PATTERN = re.compile(r'\d+(?:\.\d+)?')
+_PRICE_CLEANUP = str.maketrans({'€': None, '$': None, ',': '.'})
+
+
+def price_to_cents(price_str):
+    """Convertit une chaîne de prix ("1 234,56 €") en centimes entiers"""
+    if not isinstance(price_str, str):
+        return None
+
+    # Même nettoyage que l'ancien extract_price : symboles, espaces de milliers, virgule décimale
+    cleaned = ''.join(price_str.translate(_PRICE_CLEANUP).split())
+    match = _PRICE_PATTERN.search(cleaned)
+    if not match:
+        return None
+    return int(round(float(match.group()) * 100))
+
+
+def split_tarif_key(tarif_key):
+    """Sépare une clé de tarif historique en (classe de tarif, devise)"""
+    rate_class, _, currency = tarif_key.rpartition(' - ')
+    return rate_class, currency
+
+
+def rate_fields(rate_class, currency, price_cents):
+    """Tarif structuré tel que stocké dans les fichiers de résultats"""
+    fields = rate_class.to_fields()
+    fields['Devise'] = currency
+    fields['Prix_Centimes'] = price_cents
+    return fields
+
+
+def iter_entry_rates(entry):
+    """Itère sur les tarifs d'une entrée : (RateClass, devise, prix en centimes)
+
+    Les tarifs structurés sont lus tels quels ; les anciennes clés composites
+    ("<classe> - <devise>" avec un prix texte) ne sont analysées qu'à la lecture
+    des fichiers historiques.
+    """
+    tarifs = entry.get('Tarifs', ())
+    if isinstance(tarifs, dict):
+        for tarif_key, price_str in tarifs.items():
+            label, currency = split_tarif_key(tarif_key)
+            yield RateClass.from_label(label), currency, price_to_cents(price_str)
+    else:
+        for fields in tarifs:
+            yield RateClass.from_fields(fields), fields['Devise'], fields['Prix_Centimes']
+
+
+def iter_entry_rate_slots(entry):
+    """Itère sur les (RateClass, devise) d'une entrée, sans analyser les prix"""
+    tarifs = entry.get('Tarifs', ())
+    if isinstance(tarifs, dict):
+        for tarif_key in tarifs:
+            label, currency = split_tarif_key(tarif_key)
+            yield RateClass.from_label(label), currency
+    else:
+        for fields in tarifs:
+            yield RateClass.from_fields(fields), fields['Devise']
+
+
+class StringPool:
+    """Table d'internement : associe chaque chaîne à un identifiant entier"""
+
+    __slots__ = ('_ids', '_values')
+
+    def __init__(self):
+        self._ids = {}
+        self._values = []
+
+    def intern(self, value):
+        """Retourne l'identifiant de la chaîne, en l'ajoutant si nécessaire (-1 pour None)"""
+        if value is None:
+            return -1
+        ident = self._ids.get(value)
+        if ident is None:
+            ident = len(self._values)
+            self._ids[value] = ident
+            self._values.append(value)
+        return ident
+
+    def get(self, ident):
+        """Retourne la chaîne associée à un identifiant"""
+        return None if ident < 0 else self._values[ident]
+
+    def __len__(self):
+        return len(self._values)
+
+    def nbytes(self):
+        """Estimation de la mémoire occupée par les chaînes internées"""
+        return sum(len(value.encode('utf-8')) for value in self._values) + 16 * len(self._values)
+
+
+class RateRow:
+    """Vue décodée d'une observation de tarif"""
+
+    __slots__ = (
+        'scraped_at', 'hotel', 'chain', 'room', 'company', 'code', 'city', 'country',
+        'check_in', 'check_out', 'nights', 'rate_class', 'currency', 'price_cents'
+    )
+
+    def __init__(self, **fields):
+        for name in self.__slots__:
+            setattr(self, name, fields.get(name))
+
+    @property
+    def price(self):
+        """Prix en unités de devise (float) ou None"""
+        if self.price_cents is None or self.price_cents == MISSING_PRICE:
+            return None
+        return self.price_cents / 100
+
+    @property
+    def tarif_key(self):
+        """Clé de tarif historique ("<classe> - <devise>")"""
+        return f"{self.rate_class.label} - {self.currency}"
+
+
+class RateBuffer:
+    """Stockage colonnaire compact des observations de tarifs
+
+    Les séjours (hôtel, chambre, dates, code corporate...) sont stockés une seule fois
+    dans une table de séjours ; chaque observation ne contient que l'identifiant du
+    séjour, le code de la classe de tarif, la devise et le prix en centimes.
+    """
+
+    def __init__(self):
+        self.strings = StringPool()
+
+        # Table des séjours (une ligne par entrée historique)
+        self.stay_scraped_at = array.array('q')
+        self.stay_hotel = array.array('i')
+        self.stay_chain = array.array('i')
+        self.stay_room = array.array('i')
+        self.stay_company = array.array('i')
+        self.stay_code = array.array('i')
+        self.stay_city = array.array('i')
+        self.stay_country = array.array('i')
+        self.stay_check_in = array.array('i')
+        self.stay_check_out = array.array('i')
+        self.stay_nights = array.array('h')
+        self._stay_index = {}
+
+        # Table des observations
+        self.obs_stay = array.array('i')
+        self.obs_rate_class = array.array('b')
+        self.obs_currency = array.array('i')
+        self.obs_price = array.array('q')
+
+    def __len__(self):
+        return len(self.obs_price)
+
+    @property
+    def stay_count(self):
+        return len(self.stay_hotel)
+
+    def add_stay(self, scraped_at, hotel, chain, room, company, code, city, country,
+                 check_in, check_out, nights):
+        """Ajoute un séjour (ou retourne l'existant) et retourne son identifiant
+
+        Un séjour est identifié par hôtel | chambre | arrivée | départ | nuits | code
+        corporate : les métadonnées du premier enregistrement sont conservées.
+        """
+        intern = self.strings.intern
+        hotel_id = intern(hotel)
+        room_id = intern(room)
+        code_id = intern(code)
+        check_in_ord = _to_ordinal(check_in)
+        check_out_ord = _to_ordinal(check_out)
+        key = (hotel_id, room_id, check_in_ord, check_out_ord, int(nights), code_id)
+
+        stay_id = self._stay_index.get(key)
+        if stay_id is not None:
+            return stay_id
+
+        stay_id = len(self.stay_hotel)
+        self._stay_index[key] = stay_id
+        self.stay_scraped_at.append(_to_timestamp(scraped_at))
+        self.stay_hotel.append(hotel_id)
+        self.stay_chain.append(intern(chain))
+        self.stay_room.append(room_id)
+        self.stay_company.append(intern(company))
+        self.stay_code.append(code_id)
+        self.stay_city.append(intern(city))
+        self.stay_country.append(intern(country))
+        self.stay_check_in.append(check_in_ord)
+        self.stay_check_out.append(check_out_ord)
+        self.stay_nights.append(int(nights))
+        return stay_id
+
+    def add_rate(self, stay_id, rate_class, currency, price_cents):
+        """Ajoute une observation de tarif (rate_class est une RateClass) pour un séjour"""
+        self.obs_stay.append(stay_id)
+        self.obs_rate_class.append(rate_class.code)
+        self.obs_currency.append(self.strings.intern(currency))
+        self.obs_price.append(MISSING_PRICE if price_cents is None else price_cents)
+
+    def add_entry(self, entry):
+        """Ajoute une entrée de fichier de résultats (dictionnaire avec 'Tarifs')"""
+        stay_id = self.add_stay(
+            scraped_at=entry['Date_Scraping'],
+            hotel=entry['Hotel'],
+            chain=entry['Chaine'],
+            room=entry['Chambre'],
+            company=entry.get('Entreprise_Cliente'),
+            code=entry.get('Code_Corporate'),
+            city=entry['Ville'],
+            country=entry.get('Pays'),
+            check_in=entry['Date_Arrivee'],
+            check_out=entry['Date_Depart'],
+            nights=entry['Nombre_Nuits']
+        )
+        for rate_class, currency, price_cents in iter_entry_rates(entry):
+            self.add_rate(stay_id, rate_class, currency, price_cents)
+        return stay_id
+
+    @classmethod
+    def from_entries(cls, entries):
+        """Construit un buffer à partir d'entrées de fichiers de résultats"""
+        buffer = cls()
+        for entry in entries:
+            buffer.add_entry(entry)
+        return buffer
+
+    def stay(self, stay_id):
+        """Retourne les métadonnées d'un séjour sous forme de dictionnaire"""
+        get = self.strings.get
+        return {
+            'scraped_at': (_EPOCH + timedelta(seconds=self.stay_scraped_at[stay_id])).strftime(DATETIME_FORMAT),
+            'hotel': get(self.stay_hotel[stay_id]),
+            'chain': get(self.stay_chain[stay_id]),
+            'room': get(self.stay_room[stay_id]),
+            'company': get(self.stay_company[stay_id]),
+            'code': get(self.stay_code[stay_id]),
+            'city': get(self.stay_city[stay_id]),
+            'country': get(self.stay_country[stay_id]),
+            'check_in': date.fromordinal(self.stay_check_in[stay_id]).strftime(DATE_FORMAT),
+            'check_out': date.fromordinal(self.stay_check_out[stay_id]).strftime(DATE_FORMAT),
+            'nights': self.stay_nights[stay_id],
+        }
+
+    def row(self, index):
+        """Retourne l'observation décodée à l'index donné"""
+        fields = self.stay(self.obs_stay[index])
+        fields['rate_class'] = RateClass.from_code(self.obs_rate_class[index])
+        fields['currency'] = self.strings.get(self.obs_currency[index])
+        fields['price_cents'] = self.obs_price[index]
+        return RateRow(**fields)
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self.row(index)
+
+    def rate_classes_by_currency(self):
+        """Retourne {devise: ensemble des classes de tarif observées}"""
+        get = self.strings.get
+        rate_types = {}
+        for rate_class_code, currency_id in set(zip(self.obs_rate_class, self.obs_currency)):
+            rate_types.setdefault(get(currency_id), set()).add(RateClass.from_code(rate_class_code))
+        return rate_types
+
+    def iter_stay_rates(self):
+        """Itère sur (métadonnées du séjour, {(RateClass, devise): centimes}) par séjour
+
+        Pour une même classe et une même devise, la dernière observation l'emporte.
+        """
+        rates_by_stay = {}
+        for stay_id, rate_class_code, currency_id, price in zip(
+                self.obs_stay, self.obs_rate_class, self.obs_currency, self.obs_price):
+            rates_by_stay.setdefault(stay_id, {})[(rate_class_code, currency_id)] = price
+
+        get = self.strings.get
+        for stay_id in range(self.stay_count):
+            rates = {
+                (RateClass.from_code(rate_class_code), get(currency_id)): price
+                for (rate_class_code, currency_id), price in rates_by_stay.get(stay_id, {}).items()
+            }
+            yield self.stay(stay_id), rates
+
+    def to_entries(self):
+        """Reconstruit le dictionnaire d'entrées (tarifs structurés) des fichiers de résultats"""
+        entries = {}
+        for stay, rates in self.iter_stay_rates():
+            entry_key = stay_key(stay)
+            entries[entry_key] = {
+                'Date_Scraping': stay['scraped_at'],
+                'Hotel': stay['hotel'],
+                'Chaine': stay['chain'],
+                'Chambre': stay['room'],
+                'Entreprise_Cliente': stay['company'],
+                'Code_Corporate': stay['code'],
+                'Ville': stay['city'],
+                'Pays': stay['country'],
+                'Date_Arrivee': stay['check_in'],
+                'Date_Depart': stay['check_out'],
+                'Nombre_Nuits': stay['nights'],
+                'Tarifs': [
+                    rate_fields(rate_class, currency, None if price == MISSING_PRICE else price)
+                    for (rate_class, currency), price in rates.items()
+                ]
+            }
+        return entries
+
+    def nbytes(self):
+        """Estimation de la mémoire occupée par le buffer (hors index des séjours)"""
+        columns = [getattr(self, name) for name in vars(self) if isinstance(getattr(self, name), array.array)]
+        return sum(column.buffer_info()[1] * column.itemsize for column in columns) + self.strings.nbytes()
+
+
+def stay_key(stay):
+    """Clé d'entrée d'un séjour (le code corporate n'apparaît que pour les séjours corporate)"""
+    key = f"{stay['hotel']}|{stay['room']}|{stay['check_in']}|{stay['check_out']}|{stay['nights']}"
+    if stay.get('code'):
+        key += f"|{stay['code']}"
+    return key
+
+
+def _to_ordinal(value):
+    """Convertit une date (chaîne 'YYYY-MM-DD', date ou datetime) en ordinal"""
+    if isinstance(value, str):
+        value = datetime.strptime(value, DATE_FORMAT)
+    return value.toordinal()
+
+
+def _to_timestamp(value):
+    """Convertit une date de scraping (chaîne ou datetime) en timestamp entier"""
+    if isinstance(value, str):
+        value = datetime.strptime(value, DATETIME_FORMAT)
+    # Horodatage naïf (sans fuseau) pour un aller-retour exact
+    return int((value - _EPOCH).total_seconds())
@@ -0,0 +1,99 @@
+from collections import namedtuple
+from functools import lru_cache
+
+CORPORATE_LABEL = "Tarif corporate (GOLD)"
+BREAKFAST_SUFFIX = " avec petit déjeuner"
+MEMBER_LABEL = "REMISE MEMBRE"
+REFUNDABLE_LABEL = "Annulation gratuite"
+
+
+class RateClass(namedtuple('RateClass', 'corporate member refundable breakfast')):
+    """Classification structurée d'un tarif, déterminée une seule fois au scraping"""
+
+    __slots__ = ()
+
+    @classmethod
+    def from_scrape(cls, is_member, is_corporate, rate_name, has_breakfast):
+        """Classe un tarif à partir des informations lues sur la carte de tarif"""
+        return cls(
+            corporate=bool(is_corporate),
+            member=bool(is_member) and not is_corporate,
+            refundable=REFUNDABLE_LABEL in rate_name,
+            breakfast=bool(has_breakfast)
+        )
+
+    @property
+    def code(self):
+        """Code entier compact (4 bits) pour le stockage colonnaire"""
+        return self.corporate << 3 | self.member << 2 | self.refundable << 1 | self.breakfast
+
+    @classmethod
+    def from_code(cls, code):
+        return _FROM_CODE[code]
+
+    @property
+    def label(self):
+        """Libellé historique de la classe, utilisé comme nom de colonne à l'export
+
+        Chaque classe a son libellé : un tarif corporate annulable porte le
+        suffixe « - Annulation gratuite ». Le libellé corporate sans suffixe des
+        anciens fichiers se lit comme non remboursable.
+        """
+        breakfast = BREAKFAST_SUFFIX if self.breakfast else ''
+        if self.corporate:
+            member = f" - {MEMBER_LABEL}" if self.member else ''
+            refundable = f" - {REFUNDABLE_LABEL}" if self.refundable else ''
+            return f"{CORPORATE_LABEL}{member}{refundable}{breakfast}"
+        prefix = MEMBER_LABEL if self.member else "SANS REMISE"
+        suffix = REFUNDABLE_LABEL if self.refundable else "Non remboursable"
+        return f"{prefix} - {suffix}{breakfast}"
+
+    @staticmethod
+    @lru_cache(maxsize=None)
+    def from_label(label):
+        """Retrouve la classe d'un libellé historique (résultat mis en cache par libellé)"""
+        breakfast = label.endswith(BREAKFAST_SUFFIX)
+        if breakfast:
+            label = label[:-len(BREAKFAST_SUFFIX)]
+        if label.startswith(CORPORATE_LABEL):
+            options = label[len(CORPORATE_LABEL):].split(' - ')
+            return RateClass(
+                corporate=True,
+                member=MEMBER_LABEL in options,
+                refundable=REFUNDABLE_LABEL in options,
+                breakfast=breakfast
+            )
+        return RateClass(
+            corporate=False,
+            member=label.startswith(MEMBER_LABEL),
+            refundable=label.endswith(REFUNDABLE_LABEL),
+            breakfast=breakfast
+        )
+
+    def public_reference(self, member=False):
+        """Tarif public comparable à un tarif corporate : même annulation, même petit déjeuner"""
+        return RateClass(corporate=False, member=member, refundable=self.refundable, breakfast=self.breakfast)
+
+    def to_fields(self):
+        """Champs structurés stockés dans les fichiers de résultats"""
+        return {
+            'Corporate': self.corporate,
+            'Membre': self.member,
+            'Annulation_Gratuite': self.refundable,
+            'Petit_Dejeuner': self.breakfast,
+        }
+
+    @classmethod
+    def from_fields(cls, fields):
+        return cls(
+            corporate=fields['Corporate'],
+            member=fields['Membre'],
+            refundable=fields['Annulation_Gratuite'],
+            breakfast=fields['Petit_Dejeuner']
+        )
+
+
+_FROM_CODE = [
+    RateClass(bool(code & 8), bool(code & 4), bool(code & 2), bool(code & 1))
+    for code in range(16)
+]
@@ -0,0 +1,228 @@
+import argparse
+import json
+import logging
+import os
+import threading
+import time
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from export_pipeline import list_result_files, merge_result_files
+from export_state import ExportState
+from rate_buffer import iter_entry_rates
+
+# Filtres indexés : paramètre de requête -> champ de l'enregistrement
+INDEXED_FIELDS = ('hotel', 'city', 'code', 'check_in', 'check_out', 'nights')
+
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 1000
+
+
+def entry_record(entry):
+    """Enregistrement servi par l'API pour une entrée fusionnée (prix en unités monétaires)"""
+    return {
+        'hotel': entry['Hotel'],
+        'chain': entry['Chaine'],
+        'room': entry['Chambre'],
+        'city': entry['Ville'],
+        'country': entry.get('Pays'),
+        'check_in': entry['Date_Arrivee'],
+        'check_out': entry['Date_Depart'],
+        'nights': str(entry['Nombre_Nuits']),
+        'company': entry.get('Entreprise_Cliente') or '',
+        'code': entry.get('Code_Corporate') or '',
+        'scraped_at': entry['Date_Scraping'],
+        'rates': [
+            {
+                'rate_class': rate_class.label,
+                'currency': currency,
+                'price': price_cents / 100
+            }
+            for rate_class, currency, price_cents in iter_entry_rates(entry)
+            if price_cents is not None
+        ]
+    }
+
+
+class RateStore:
+    """Derniers prix connus, en mémoire, avec un index par champ filtrable
+
+    Une requête intersecte les listes d'identifiants des champs demandés, en
+    partant de la plus courte : le coût dépend du nombre de résultats, pas du
+    nombre total d'enregistrements. Les réponses sérialisées sont gardées dans
+    un cache LRU propre à cette instance (un rechargement repart d'un cache vide).
+    """
+
+    def __init__(self, entries, cache_size=4096):
+        records = [entry_record(entry) for entry in entries]
+        records.sort(key=lambda record: (record['hotel'], record['check_in'], record['nights'], record['room'], record['code']))
+        self.records = records
+        self.indexes = {field: {} for field in INDEXED_FIELDS}
+        for record_id, record in enumerate(records):
+            for field in INDEXED_FIELDS:
+                self.indexes[field].setdefault(record[field], []).append(record_id)
+        self._posting_sets = {}
+        self.query_json = lru_cache(maxsize=cache_size)(self._query_json)
+
+    def __len__(self):
+        return len(self.records)
+
+    def match(self, filters):
+        """Identifiants (triés) des enregistrements satisfaisant tous les filtres"""
+        if not filters:
+            return range(len(self.records))
+
+        postings = []
+        for field, value in filters:
+            posting = self.indexes[field].get(value)
+            if not posting:
+                return []
+            postings.append(posting)
+        postings.sort(key=len)
+
+        if len(postings) == 1:
+            return postings[0]
+        others = [self._posting_set(posting) for posting in postings[1:]]
+        return [record_id for record_id in postings[0] if all(record_id in other for other in others)]
+
+    def _posting_set(self, posting):
+        """Version ensemble d'une liste d'identifiants, construite une seule fois"""
+        posting_set = self._posting_sets.get(id(posting))
+        if posting_set is None:
+            posting_set = self._posting_sets[id(posting)] = frozenset(posting)
+        return posting_set
+
+    def query(self, filters, currency=None, offset=0, limit=DEFAULT_LIMIT):
+        """Page de résultats : {'total', 'offset', 'limit', 'next_offset', 'items'}"""
+        ids = self.match(filters)
+        page = ids[offset:offset + limit]
+        items = []
+        for record_id in page:
+            record = self.records[record_id]
+            if currency:
+                record = dict(record, rates=[rate for rate in record['rates'] if rate['currency'] == currency])
+            items.append(record)
+        next_offset = offset + limit if offset + limit < len(ids) else None
+        return {'total': len(ids), 'offset': offset, 'limit': limit, 'next_offset': next_offset, 'items': items}
+
+    def _query_json(self, filters, currency, offset, limit):
+        return json.dumps(self.query(filters, currency, offset, limit), ensure_ascii=False).encode('utf-8')
+
+
+def load_store(use_state=True, workers=None, cache_size=4096):
+    """Construit un RateStore à partir des derniers résultats fusionnés"""
+    directories = sorted(item for item in os.listdir('.') if os.path.isdir(item) and item.startswith('scraping_results'))
+    files = list_result_files(directories)
+    if use_state:
+        state = ExportState()
+        try:
+            state.update(files, workers=workers)
+            store = RateStore(state.iter_entries(), cache_size)
+        finally:
+            state.close()
+    else:
+        store = RateStore(merge_result_files(files, workers).values(), cache_size)
+    logging.info(f"{len(store)} séjours chargés depuis {len(files)} fichiers")
+    return store
+
+
+class RatesRequestHandler(BaseHTTPRequestHandler):
+    """GET /rates?hotel=&city=&code=&check_in=&check_out=&nights=&currency=&offset=&limit=
+
+    `code=` (vide) sélectionne les tarifs publics. GET /stats donne l'état du cache.
+    """
+
+    protocol_version = 'HTTP/1.1'  # Connexions persistantes
+    # En-têtes et corps partent en deux segments : sans TCP_NODELAY, chaque réponse
+    # attend l'ACK retardé du client (~40 ms)
+    disable_nagle_algorithm = True
+    server_version = 'RatesAPI/1.0'
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        store = self.server.store
+        try:
+            if url.path == '/rates':
+                params = parse_qs(url.query, keep_blank_values=True)
+                filters = tuple(sorted(
+                    (field, params[field][0]) for field in INDEXED_FIELDS if field in params
+                ))
+                currency = params.get('currency', [None])[0]
+                offset = max(0, int(params.get('offset', ['0'])[0]))
+                limit = min(MAX_LIMIT, max(1, int(params.get('limit', [str(DEFAULT_LIMIT)])[0])))
+                self._send(200, store.query_json(filters, currency, offset, limit))
+            elif url.path == '/stats':
+                info = store.query_json.cache_info()
+                self._send(200, json.dumps({
+                    'records': len(store),
+                    'cache_hits': info.hits,
+                    'cache_misses': info.misses,
+                    'cache_size': info.currsize,
+                }).encode('utf-8'))
+            elif url.path == '/health':
+                self._send(200, b'{"status": "ok"}')
+            else:
+                self._send(404, b'{"error": "not found"}')
+        except ValueError as e:
+            self._send(400, json.dumps({'error': str(e)}).encode('utf-8'))
+
+    def _send(self, status, body):
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logging.debug(f"{self.address_string()} - {format % args}")
+
+
+class RatesServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, store):
+        super().__init__(address, RatesRequestHandler)
+        self.store = store
+        self._reload_lock = threading.Lock()
+
+    def reload(self, loader):
+        """Recharge les données ; les requêtes en cours terminent sur l'ancien store"""
+        with self._reload_lock:
+            self.store = loader()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    parser = argparse.ArgumentParser(description="API locale de lecture des derniers prix")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--no-state', action='store_true', help="Fusionner les fichiers sans état persistant")
+    parser.add_argument('--workers', type=int, default=None, help="Nombre de processus de lecture")
+    parser.add_argument('--cache-size', type=int, default=4096, help="Taille du cache LRU des réponses")
+    parser.add_argument('--refresh', type=float, default=0, help="Rechargement périodique (secondes, 0 = jamais)")
+    args = parser.parse_args()
+
+    def loader():
+        return load_store(use_state=not args.no_state, workers=args.workers, cache_size=args.cache_size)
+
+    server = RatesServer((args.host, args.port), loader())
+
+    if args.refresh > 0:
+        def refresh_loop():
+            while True:
+                time.sleep(args.refresh)
+                try:
+                    server.reload(loader)
+                except Exception as e:
+                    logging.error(f"Erreur lors du rechargement: {str(e)}")
+        threading.Thread(target=refresh_loop, name="RatesRefresh", daemon=True).start()
+
+    logging.info(f"API des prix sur http://{args.host}:{args.port}/rates")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
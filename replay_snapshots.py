@@ -0,0 +1,199 @@
+import argparse
+import json
+import logging
+import os
+import queue
+import sys
+import time
+from datetime import datetime
+
+from selenium.common.exceptions import NoSuchElementException
+from selenium.webdriver.common.by import By
+
+from app_workers import ScrapingTask, ScrapingWorker
+from page_snapshots import ReplayDriver, VirtualClock, load_manifest, read_snapshot
+
+EXPECTED = 'expected.json'
+# Statuts qui font échouer le rejeu (code de sortie 1)
+FAILURES = ('différent', 'échec', 'sans référence')
+
+
+class _ErrorCounter(logging.Handler):
+    """Compte les erreurs journalisées par le worker pendant un rejeu"""
+
+    def __init__(self):
+        super().__init__(logging.ERROR)
+        self.messages = []
+        self._last = None
+
+    def emit(self, record):
+        if record is not self._last:  # Même message reçu par error_logger puis par la racine
+            self._last = record
+            self.messages.append(record.getMessage())
+
+
+def _task(entry):
+    corporate_info = (entry['company'], entry['code']) if entry.get('code') else None
+    return ScrapingTask(entry['city'], datetime.strptime(entry['check_in'], '%Y-%m-%d'), entry['nights'], corporate_info)
+
+
+def _extract_hotel_list(worker, driver):
+    hotels = worker._scroll_and_count_hotels()
+    names = []
+    for card in driver.find_elements(By.CLASS_NAME, "hotel-card-list-view-container"):
+        try:
+            names.append(card.find_element(By.CSS_SELECTOR, "[data-slnm-ihg='brandHotelNameSID']").text)
+        except NoSuchElementException:
+            names.append(None)
+    return {'hotels': hotels, 'names': names}
+
+
+def _extract_rooms(worker, entry):
+    hotel_name = entry['hotel']
+    # Les tarifs sont déjà dépliés dans l'instantané : pas de clic sur « Voir les prix »
+    worker._scrape_rooms(hotel_name, hotel_name.split()[0], _task(entry), entry['currency'], first_currency=False)
+    rates = []
+    rooms = set()
+    while not worker.save_queue.empty():
+        item = worker.save_queue.get_nowait()
+        rooms.add(item['stay']['room'])
+        for rate_class, currency, cents in item['rates']:
+            rates.append([item['stay']['room'], rate_class.label, currency, cents])
+    return {'rooms': len(rooms), 'rates': rates}
+
+
+def replay_snapshot(worker, directory, entry):
+    """Rejoue l'extraction du worker sur un instantané : (résultat, durées en secondes, pauses évitées)"""
+    html = read_snapshot(directory, entry)
+    start = time.perf_counter()
+    driver = ReplayDriver(html, entry['url'])
+    parsed = time.perf_counter()
+
+    worker.driver = driver
+    errors = _ErrorCounter()
+    worker.error_logger.addHandler(errors)
+    root_logger = logging.getLogger()
+    root_logger.addHandler(errors)  # _scrape_rates journalise aussi via le logger racine
+    try:
+        with VirtualClock() as clock:
+            if entry['kind'] == 'hotel_list':
+                result = _extract_hotel_list(worker, driver)
+            else:
+                result = _extract_rooms(worker, entry)
+    finally:
+        worker.error_logger.removeHandler(errors)
+        root_logger.removeHandler(errors)
+    extracted = time.perf_counter()
+
+    result['errors'] = len(errors.messages)
+    timings = {'parse': parsed - start, 'extract': extracted - parsed}
+    return result, timings, clock.skipped
+
+
+def _describe_difference(expected, actual):
+    if expected.get('errors') != actual.get('errors'):
+        yield f"erreurs {expected.get('errors')} -> {actual.get('errors')}"
+    if 'hotels' in expected and expected['hotels'] != actual.get('hotels'):
+        yield f"hôtels {expected['hotels']} -> {actual.get('hotels')}"
+    if 'names' in expected and expected['names'] != actual.get('names'):
+        yield "noms d'hôtels différents"
+    if 'rates' in expected:
+        before = {tuple(rate) for rate in expected['rates']}
+        after = {tuple(rate) for rate in actual.get('rates', [])}
+        for rate in sorted(before - after)[:3]:
+            yield f"tarif disparu {rate}"
+        for rate in sorted(after - before)[:3]:
+            yield f"tarif nouveau {rate}"
+        if len(expected['rates']) != len(actual.get('rates', [])):
+            yield f"tarifs {len(expected['rates'])} -> {len(actual.get('rates', []))}"
+
+
+def replay_all(directory, kinds=None, update=False):
+    """Rejoue tous les instantanés et compare aux résultats de référence (expected.json)
+
+    Un instantané sans référence est en échec ('sans référence') : les
+    références ne sont écrites qu'avec `update` (différences affichées, à
+    relire avant de valider le nouvel expected.json).
+    """
+    entries = [entry for entry in load_manifest(directory) if not kinds or entry['kind'] in kinds]
+    expected_path = os.path.join(directory, EXPECTED)
+    expected = {}
+    if os.path.exists(expected_path):
+        with open(expected_path, 'r', encoding='utf-8') as f:
+            expected = json.load(f)
+
+    worker = ScrapingWorker(0, queue.Queue(), directory, error_log=None)
+    outcomes = []
+    timings = {}
+    skipped = 0.0
+    for entry in entries:
+        try:
+            result, timing, clock_skipped = replay_snapshot(worker, directory, entry)
+        except Exception as e:
+            outcomes.append((entry, 'échec', [str(e)]))
+            continue
+        skipped += clock_skipped
+        stats = timings.setdefault(entry['kind'], {'snapshots': 0, 'parse': 0.0, 'extract': 0.0})
+        stats['snapshots'] += 1
+        stats['parse'] += timing['parse']
+        stats['extract'] += timing['extract']
+
+        reference = expected.get(entry['file'])
+        if reference is None:
+            status = 'ajouté' if update else 'sans référence'
+            differences = [] if update else ["référence à enregistrer avec --update"]
+        else:
+            differences = list(_describe_difference(reference, result))
+            status = ('mis à jour' if update else 'différent') if differences else 'ok'
+        outcomes.append((entry, status, differences))
+        if update:
+            expected[entry['file']] = result
+
+    if update:
+        with open(expected_path, 'w', encoding='utf-8') as f:
+            json.dump(expected, f, indent=1, ensure_ascii=False)
+    return outcomes, timings, skipped
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rejoue l'extraction sur des instantanés DOM enregistrés (sans navigateur)")
+    parser.add_argument('directory', help="Répertoire d'instantanés (SCRAPING_SNAPSHOT_DIR d'un run)")
+    parser.add_argument('--kind', action='append', choices=['hotel_list', 'rooms'], help="Types de page à rejouer")
+    parser.add_argument('--update', action='store_true',
+                        help="Enregistrer les résultats actuels comme référence (expected.json)")
+    parser.add_argument('--verbose', action='store_true', help="Afficher aussi les instantanés conformes")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    outcomes, timings, skipped = replay_all(args.directory, args.kind, args.update)
+    elapsed = time.perf_counter() - start
+
+    failures = 0
+    for entry, status, details in outcomes:
+        if status in FAILURES:
+            failures += 1
+        if status != 'ok' or args.verbose:
+            where = f"{entry['city']} {entry.get('code') or ''} {entry.get('currency') or ''} {entry.get('hotel') or ''}"
+            print(f"{status:<14} {entry['file']:<28} {' '.join(where.split())}")
+            for detail in details:
+                print(f"               - {detail}")
+
+    counts = {}
+    for _, status, _ in outcomes:
+        counts[status] = counts.get(status, 0) + 1
+    print(f"\n{len(outcomes)} instantanés rejoués en {elapsed:.2f} s "
+          f"({', '.join(f'{count} {status}' for status, count in sorted(counts.items()))}), "
+          f"{skipped:.0f} s de pauses évitées")
+    for kind, stats in sorted(timings.items()):
+        print(f"{kind:<12} {stats['snapshots']:>5} pages, analyse HTML {1000 * stats['parse'] / stats['snapshots']:.1f} ms, "
+              f"extraction {1000 * stats['extract'] / stats['snapshots']:.1f} ms par page")
+    if args.update:
+        print(f"Références mises à jour dans {os.path.join(args.directory, EXPECTED)}")
+    if not outcomes:
+        print(f"Aucun instantané dans {args.directory}", file=sys.stderr)
+    sys.exit(1 if failures or not outcomes else 0)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(levelname)s - %(message)s')
+    main()
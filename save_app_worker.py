@@ -13,16 +13,8 @@ import queue
 import threading
 import os
 from tqdm import tqdm
+from log_setup import setup_logging
 
-# Configuration du logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('scraping.log'),
-        logging.StreamHandler()
-    ]
-)
 
 class ScrapingTask:
     def __init__(self, city, check_in_date, duration, corporate_info=None):
@@ -126,7 +118,7 @@ class ScrapingWorker:
                 with threading.Lock():
                     with open(output_file, 'w', encoding='utf-8') as f:
                         json.dump(current_data, f, ensure_ascii=False, indent=4)
-                    logging.info(f"Sauvegarde effectuée pour {city} - Worker {self.worker_id} - {len(current_data[entry_key]['Tarifs'])} tarifs")
+                    logging.debug(f"Sauvegarde effectuée pour {city} - Worker {self.worker_id} - {len(current_data[entry_key]['Tarifs'])} tarifs")
                 
             except Exception as e:
                 logging.error(f"Erreur sauvegarde worker {self.worker_id}: {str(e)}")
@@ -404,7 +396,7 @@ class ScrapingWorker:
             
             # Trouver tous les tarifs
             rate_cards = room.find_elements(By.CSS_SELECTOR, "app-rate-card")
-            logging.info(f"Nombre de tarifs trouvés: {len(rate_cards)}")
+            logging.debug(f"Nombre de tarifs trouvés: {len(rate_cards)}")
             
             # Créer une liste pour stocker tous les tarifs avant de les sauvegarder
             all_rates = []
@@ -437,7 +429,7 @@ class ScrapingWorker:
                     }
                     
                     all_rates.append(rate_info)
-                    logging.info(f"Tarif trouvé: {rate_name} - {price} {currency}")
+                    logging.debug(f"Tarif trouvé: {rate_name} - {price} {currency}")
                     
                 except Exception as e:
                     logging.error(f"Erreur scraping tarif individuel: {str(e)}")
@@ -641,5 +633,7 @@ class IHGScraper:
             logging.error(f"Erreur lors de l'exécution: {str(e)}")
 
 if __name__ == "__main__":
+    # Journal JSON asynchrone (le détail par tarif est au niveau DEBUG : SCRAPING_LOG_LEVELS=save_app_worker=DEBUG)
+    setup_logging('scraping.jsonl')
     scraper = IHGScraper()
     scraper.run()
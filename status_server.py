@@ -0,0 +1,253 @@
+import json
+import logging
+import os
+import queue
+import re
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_PORT = 8091
+
+# Fenêtre du débit récent (secondes)
+RECENT_WINDOW = 300
+
+# « Worker 3 - Erreur devise USD: Message: ... » -> worker 3, classe « Erreur devise USD »
+_ERROR_PATTERN = re.compile(r'^Worker (\d+) - ([^:]*)')
+_NUMBERS = re.compile(r'\d+')
+
+
+def error_class(message):
+    """(worker, classe d'erreur) d'un message du logger d'erreurs, chiffres normalisés"""
+    match = _ERROR_PATTERN.match(message)
+    if not match:
+        return None, _NUMBERS.sub('N', message.split(':', 1)[0]).strip()[:80]
+    return int(match.group(1)), _NUMBERS.sub('N', match.group(2)).strip()[:80]
+
+
+class StatusBoard:
+    """État d'avancement d'un run, alimenté par les workers sans jamais les bloquer
+
+    Les workers déposent des événements dans une SimpleQueue (`post`, sans
+    verrou côté producteur) ; un thread les applique à l'état que le serveur
+    HTTP lit sous verrou.
+    """
+
+    def __init__(self, task_queue=None, total_tasks=0):
+        self.task_queue = task_queue
+        self.total_tasks = total_tasks
+        self.started_at = time.time()
+        self._events = queue.SimpleQueue()
+        self._lock = threading.Lock()
+        self._workers = {}
+        self._tasks_done = 0
+        self._tasks_failed = 0
+        self._hotels_done = 0
+        self._rates = 0
+        self._recent_hotels = deque()  # Horodatage des hôtels terminés dans la fenêtre récente
+        self._errors = {}  # classe -> nombre
+        self._recycles = {}  # raison de relance du navigateur -> nombre
+        self._thread = threading.Thread(target=self._consume, name="StatusBoard", daemon=True)
+        self._thread.start()
+
+    def post(self, worker_id, event, **fields):
+        self._events.put((time.time(), worker_id, event, fields))
+
+    def close(self):
+        self._events.put(None)
+        self._thread.join()
+
+    def _consume(self):
+        while True:
+            item = self._events.get()
+            if item is None:
+                break
+            try:
+                with self._lock:
+                    self._apply(*item)
+            except Exception as e:
+                logging.error(f"Événement de suivi invalide {item!r}: {str(e)}")
+
+    def _worker(self, worker_id):
+        worker = self._workers.get(worker_id)
+        if worker is None:
+            worker = self._workers[worker_id] = {
+                'state': 'démarrage', 'task': None, 'city': None, 'hotel': None, 'task_started_at': None,
+                'tasks_done': 0, 'tasks_failed': 0, 'hotels_done': 0, 'errors': 0, 'last_update': None,
+                'browser': None, 'browser_recycles': 0,
+            }
+        return worker
+
+    def _apply(self, timestamp, worker_id, event, fields):
+        worker = self._worker(worker_id) if worker_id is not None else None
+        if worker is not None:
+            worker['last_update'] = timestamp
+
+        if event == 'task_started':
+            worker.update(state='scraping', task=fields['task'], city=fields['city'], hotel=None,
+                          task_started_at=timestamp)
+        elif event == 'hotel_started':
+            worker['hotel'] = fields['hotel']
+        elif event == 'hotel_done':
+            worker['hotels_done'] += 1
+            self._hotels_done += 1
+            self._recent_hotels.append(timestamp)
+        elif event == 'rates':
+            self._rates += fields['count']
+        elif event == 'task_done':
+            worker.update(state='en attente', task=None, city=None, hotel=None, task_started_at=None)
+            worker['tasks_done'] += 1
+            self._tasks_done += 1
+        elif event == 'task_failed':
+            worker.update(state='en attente', task=None, city=None, hotel=None, task_started_at=None)
+            worker['tasks_failed'] += 1
+            self._tasks_failed += 1
+        elif event == 'error':
+            if worker is not None:
+                worker['errors'] += 1
+            self._errors[fields['kind']] = self._errors.get(fields['kind'], 0) + 1
+        elif event == 'browser_sample':
+            worker['browser'] = fields['sample']
+        elif event == 'browser_recycled':
+            worker['browser_recycles'] += 1
+            for reason in fields['reasons']:
+                self._recycles[reason] = self._recycles.get(reason, 0) + 1
+        elif event == 'worker_stopped':
+            worker.update(state='terminé', task=None, city=None, hotel=None, task_started_at=None)
+
+    def snapshot(self):
+        now = time.time()
+        elapsed = max(now - self.started_at, 1e-6)
+        minutes = elapsed / 60
+        queued = self.task_queue.qsize() if self.task_queue is not None else None
+
+        with self._lock:
+            while self._recent_hotels and self._recent_hotels[0] < now - RECENT_WINDOW:
+                self._recent_hotels.popleft()
+            workers = {
+                str(worker_id): dict(
+                    worker,
+                    task_seconds=round(now - worker['task_started_at'], 1) if worker['task_started_at'] else None,
+                    task_started_at=_format_time(worker['task_started_at']),
+                    last_update=_format_time(worker['last_update'])
+                )
+                for worker_id, worker in sorted(self._workers.items())
+            }
+            in_progress = sum(1 for worker in self._workers.values() if worker['task'] is not None)
+            tasks_done, tasks_failed = self._tasks_done, self._tasks_failed
+            hotels_done, rates = self._hotels_done, self._rates
+            recent_hotels = len(self._recent_hotels)
+            errors = dict(self._errors)
+            recycles = dict(self._recycles)
+
+        # Les tâches en échec sont remises dans la queue : il reste la queue et les tâches en cours
+        remaining = (queued or 0) + in_progress
+        throughput = tasks_done / elapsed
+        eta_seconds = remaining / throughput if throughput > 0 else None
+        error_total = sum(errors.values())
+        return {
+            'started_at': _format_time(self.started_at),
+            'elapsed_seconds': round(elapsed, 1),
+            'tasks': {
+                'total': self.total_tasks,
+                'queued': queued,
+                'in_progress': in_progress,
+                'done': tasks_done,
+                'failed': tasks_failed,
+                'remaining': remaining,
+            },
+            'hotels': {
+                'done': hotels_done,
+                'per_minute': round(hotels_done / minutes, 2),
+                'per_minute_recent': round(recent_hotels / min(minutes, RECENT_WINDOW / 60), 2),
+            },
+            'rates': rates,
+            'eta_seconds': round(eta_seconds) if eta_seconds is not None else None,
+            'eta': _format_time(now + eta_seconds) if eta_seconds is not None else None,
+            'workers': workers,
+            'browser_recycles': recycles,
+            'errors': {
+                'total': error_total,
+                'per_minute': round(error_total / minutes, 2),
+                'per_task': round(error_total / (tasks_done + tasks_failed), 2) if tasks_done + tasks_failed else None,
+                'by_class': {
+                    kind: {'count': count, 'per_minute': round(count / minutes, 2)}
+                    for kind, count in sorted(errors.items(), key=lambda item: -item[1])
+                },
+            },
+        }
+
+
+class StatusLogHandler(logging.Handler):
+    """Transmet les messages du logger d'erreurs au tableau de suivi, classés par type"""
+
+    def __init__(self, board):
+        super().__init__(logging.ERROR)
+        self.board = board
+
+    def emit(self, record):
+        try:
+            worker_id, kind = error_class(record.getMessage())
+            self.board.post(worker_id, 'error', kind=kind)
+        except Exception:
+            self.handleError(record)
+
+
+class StatusRequestHandler(BaseHTTPRequestHandler):
+    """GET /status : avancement du run en JSON"""
+
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+    server_version = 'ScrapingStatus/1.0'
+
+    def do_GET(self):
+        if self.path.split('?', 1)[0] in ('/', '/status'):
+            body = json.dumps(self.server.board.snapshot(), indent=2, ensure_ascii=False).encode('utf-8')
+            self._send(200, body)
+        elif self.path == '/health':
+            self._send(200, b'{"status": "ok"}')
+        else:
+            self._send(404, b'{"error": "not found"}')
+
+    def _send(self, status, body):
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logging.debug(f"{self.address_string()} - {format % args}")
+
+
+class StatusServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, board):
+        super().__init__(address, StatusRequestHandler)
+        self.board = board
+
+
+def start_status_server(board, host='127.0.0.1', port=None):
+    """Démarre le serveur de suivi en arrière-plan (port : SCRAPING_STATUS_PORT, 0 = désactivé)
+
+    Retourne le serveur, ou None s'il est désactivé ou si le port est occupé.
+    """
+    if port is None:
+        port = int(os.environ.get('SCRAPING_STATUS_PORT', DEFAULT_PORT))
+    if not port:
+        return None
+    try:
+        server = StatusServer((host, port), board)
+    except OSError as e:
+        logging.error(f"Serveur de suivi indisponible sur le port {port}: {str(e)}")
+        return None
+    threading.Thread(target=server.serve_forever, name="StatusServer", daemon=True).start()
+    logging.info(f"Suivi du run sur http://{host}:{port}/status")
+    return server
+
+
+def _format_time(timestamp):
+    return datetime.fromtimestamp(timestamp).strftime('%Y-%m-%d %H:%M:%S') if timestamp else None
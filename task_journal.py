@@ -0,0 +1,71 @@
+import json
+import logging
+import os
+import threading
+from datetime import date, datetime
+
+TASKS_FILE = 'tasks.jsonl'
+
+# Issue d'une tentative de tâche
+DONE = 'terminée'
+FAILED = 'échec'
+
+
+class TaskJournal:
+    """Journal des tâches tentées pendant un run : une ligne JSON par tentative dans tasks.jsonl
+
+    Chaque ligne donne l'issue de la tentative (une tâche en échec est remise
+    en file et peut réapparaître), les hôtels et chambres relevés et le nombre
+    de tarifs corporate vus. Une tâche jamais planifiée ou interrompue par
+    l'arrêt du run n'a pas de ligne. Partagé entre les workers.
+    """
+
+    def __init__(self, directory):
+        self.path = os.path.join(directory, TASKS_FILE)
+        self._lock = threading.Lock()
+
+    def record(self, task, status, hotels, rooms, corporate_rates, worker_id=None):
+        line = {
+            'city': task.city,
+            'check_in': task.check_in_date.strftime('%Y-%m-%d'),
+            'nights': task.duration,
+            'company': task.corporate_info[0] if task.corporate_info else None,
+            'code': task.corporate_info[1] if task.corporate_info else None,
+            'status': status,
+            'hotels': hotels,
+            'rooms': rooms,
+            'corporate_rates': corporate_rates,
+            'worker': worker_id,
+            'recorded_at': datetime.now().isoformat(timespec='seconds'),
+        }
+        with self._lock:
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(line, ensure_ascii=False) + '\n')
+
+
+def load_task_journal(directory):
+    """Tentatives enregistrées dans le journal d'un run ([] pour un run antérieur au journal)"""
+    path = os.path.join(directory, TASKS_FILE)
+    if not os.path.exists(path):
+        return []
+    attempts = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                attempts.append(json.loads(line))
+            except ValueError:
+                # Dernière ligne tronquée par un arrêt brutal
+                logging.warning(f"Ligne illisible ignorée dans {path}")
+    return attempts
+
+
+def is_dead_code(dead_codes, city, code, today=None):
+    """Vrai si le code est à ignorer dans la ville jusqu'à sa date de revérification (corporate_analytics.py)
+
+    Les listes sans date de l'ancien format de dead_corporate_codes.json sont
+    ignorées : les codes qu'elles contiennent sont de nouveau essayés.
+    """
+    codes = dead_codes.get(city)
+    if not isinstance(codes, dict) or code not in codes:
+        return False
+    return codes[code]['recheck_after'] > (today or date.today()).isoformat()
@@ -0,0 +1,87 @@
+import json
+import os
+
+from checkpoint import TMP_SUFFIX, CheckpointWriter, recover_checkpoints, recover_run_directories
+
+
+def _write(path, text, mtime=1_000_000):
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(text)
+    os.utime(path, (mtime, mtime))
+    return str(path)
+
+
+def _read(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return f.read()
+
+
+def _snapshot(directory):
+    return {name: (_read(os.path.join(directory, name)), os.stat(os.path.join(directory, name)).st_mtime)
+            for name in sorted(os.listdir(directory))}
+
+
+def test_valid_temp_file_is_promoted(tmp_path):
+    # Arrêt entre l'écriture du temporaire et le renommage d'un premier fichier
+    tmp = _write(tmp_path / f"hotel.json{TMP_SUFFIX}", '{"k1": 1}')
+
+    assert recover_checkpoints(str(tmp_path)) == [('promu', str(tmp_path / 'hotel.json'))]
+    assert not os.path.exists(tmp)
+    assert json.loads(_read(tmp_path / 'hotel.json')) == {'k1': 1}
+
+
+def test_invalid_temp_file_is_removed_and_target_kept(tmp_path):
+    target = _write(tmp_path / 'hotel.json', '{"k1": 1}')
+    tmp = _write(tmp_path / f"hotel.json{TMP_SUFFIX}", '{"k1": 1, "k2"')
+
+    assert recover_checkpoints(str(tmp_path)) == [('supprimé', tmp)]
+    assert json.loads(_read(target)) == {'k1': 1}
+
+
+def test_valid_temp_file_does_not_replace_valid_target(tmp_path):
+    # Le renommage a eu lieu : le temporaire restant est un doublon
+    target = _write(tmp_path / 'hotel.json', '{"k1": 2}')
+    tmp = _write(tmp_path / f"hotel.json{TMP_SUFFIX}", '{"k1": 1}')
+
+    assert recover_checkpoints(str(tmp_path)) == [('supprimé', tmp)]
+    assert json.loads(_read(target)) == {'k1': 2}
+
+
+def test_partially_written_target_is_replaced_by_temp_file(tmp_path):
+    target = _write(tmp_path / 'hotel.json', '{"k1": 1, "k2": {"Tar')
+    _write(tmp_path / f"hotel.json{TMP_SUFFIX}", '{"k1": 1, "k2": 2}')
+
+    assert recover_checkpoints(str(tmp_path)) == [('promu', target)]
+    assert json.loads(_read(target)) == {'k1': 1, 'k2': 2}
+
+
+def test_partially_written_target_without_valid_temp_is_left_for_load_json(tmp_path):
+    # Rien de mieux à promouvoir : la cible reste en place (load_json la mettra de côté)
+    target = _write(tmp_path / 'hotel.json', '{"k1": 1, "k2": {"Tar')
+    tmp = _write(tmp_path / f"hotel.json{TMP_SUFFIX}", '{"k1"')
+
+    assert recover_checkpoints(str(tmp_path)) == [('supprimé', tmp)]
+    assert _read(target) == '{"k1": 1, "k2": {"Tar'
+
+
+def test_complete_directory_is_left_alone(tmp_path):
+    writer = CheckpointWriter(fsync_every=1)
+    for name in ('a.json', 'b.json'):
+        writer.write_json(str(tmp_path / name), {'hotel': name})
+    before = _snapshot(tmp_path)
+
+    assert recover_checkpoints(str(tmp_path)) == []
+    assert _snapshot(tmp_path) == before
+
+
+def test_recover_run_directories_skips_current_run(tmp_path):
+    previous = tmp_path / 'scraping_results_20250301_100000'
+    current = tmp_path / 'scraping_results_20250302_100000'
+    for directory in (previous, current):
+        directory.mkdir()
+        _write(directory / f"hotel.json{TMP_SUFFIX}", '{"k1": 1}')
+
+    actions = recover_run_directories(str(tmp_path / 'scraping_results_*'), exclude=str(current))
+    assert actions == [('promu', str(previous / 'hotel.json'))]
+    # Le dossier du run en cours (neuf) n'est pas parcouru : son écriture en cours reste intacte
+    assert os.listdir(current) == [f"hotel.json{TMP_SUFFIX}"]
@@ -0,0 +1,84 @@
+import json
+from datetime import date, datetime, timedelta
+
+from app_workers import ScrapingTask
+from corporate_analytics import corporate_comparisons, dead_codes, load_attempts, load_observations
+from rate_class import RateClass
+from task_journal import DONE, FAILED, TaskJournal, is_dead_code
+
+STAY = {'Hotel': 'Crowne Plaza Paris', 'Chaine': 'Crowne', 'Ville': 'paris', 'Pays': 'France',
+        'Chambre': '1 lit King', 'Date_Arrivee': '2025-03-10', 'Date_Depart': '2025-03-11',
+        'Nombre_Nuits': 1, 'Date_Scraping': '2025-03-01 10:00:00'}
+
+
+def _tarifs(*rates):
+    return {f"{rate_class.label} - EUR": f"{euros},00 €" for rate_class, euros in rates}
+
+
+def _write_run(tmp_path, entries):
+    run = tmp_path / 'scraping_results_20250301_100000'
+    run.mkdir()
+    with open(run / 'Crowne Plaza Paris.json', 'w', encoding='utf-8') as f:
+        json.dump(entries, f, ensure_ascii=False)
+    return str(run)
+
+
+def test_corporate_rate_compared_with_same_cancellation_policy(tmp_path):
+    public = dict(STAY, Entreprise_Cliente=None, Code_Corporate=None, Tarifs=_tarifs(
+        (RateClass(False, False, True, False), 200),   # Public annulable
+        (RateClass(False, False, False, False), 160),  # Public non remboursable
+        (RateClass(False, True, True, False), 190),    # Membre annulable
+        (RateClass(False, True, False, False), 150),   # Membre non remboursable
+    ))
+    corporate = dict(STAY, Entreprise_Cliente='Oracle', Code_Corporate='100183394', Tarifs=_tarifs(
+        (RateClass(True, False, True, False), 180),
+        (RateClass(True, False, False, False), 144),
+    ))
+    key = 'Crowne Plaza Paris|1 lit King|2025-03-10|2025-03-11|1'
+    run = _write_run(tmp_path, {key: public, f"{key}|100183394": corporate})
+
+    comparisons = corporate_comparisons(load_observations([run], workers=1)).set_index('rate_code')
+    refundable = comparisons.loc[RateClass(True, False, True, False).code]
+    non_refundable = comparisons.loc[RateClass(True, False, False, False).code]
+
+    assert (refundable['public_cents'], refundable['member_cents']) == (20000, 19000)
+    assert round(refundable['discount_public'], 6) == 10.0
+    # Non remboursable : comparé au public non remboursable (160 €), pas au tarif annulable (200 €)
+    assert (non_refundable['public_cents'], non_refundable['member_cents']) == (16000, 15000)
+    assert round(non_refundable['discount_public'], 6) == 10.0
+
+
+def _journal_run(tmp_path, name, *attempts):
+    """Run dont le journal contient les tentatives (ville, code, issue, chambres, tarifs corporate)"""
+    run = tmp_path / name
+    run.mkdir()
+    journal = TaskJournal(str(run))
+    for city, code, status, rooms, corporate_rates in attempts:
+        journal.record(ScrapingTask(city, datetime(2025, 3, 10), 1, ('Oracle', code)), status, 1, rooms, corporate_rates)
+    return str(run)
+
+
+def test_code_dead_only_after_unproductive_runs(tmp_path):
+    runs = [
+        _journal_run(tmp_path, 'scraping_results_20250301_100000', ('paris', 'A', DONE, 5, 0), ('paris', 'B', DONE, 5, 3)),
+        # Tâche en échec ou sans chambre relevée : pas une tentative
+        _journal_run(tmp_path, 'scraping_results_20250302_100000', ('paris', 'B', FAILED, 0, 0), ('paris', 'C', DONE, 0, 0)),
+        _journal_run(tmp_path, 'scraping_results_20250303_100000', ('paris', 'B', DONE, 5, 0), ('paris', 'C', FAILED, 2, 0)),
+    ]
+    dead = dead_codes(load_attempts(runs), min_runs=2, recheck_days=30)
+    assert dead == {}
+
+    runs.append(_journal_run(tmp_path, 'scraping_results_20250304_100000', ('paris', 'A', DONE, 5, 0),
+                             ('paris', 'B', DONE, 4, 0)))
+    dead = dead_codes(load_attempts(runs), min_runs=2, recheck_days=30)
+    # A : deux runs improductifs ; B : productif au premier run, puis deux runs sans tarif corporate
+    assert sorted(dead['paris']) == ['A', 'B']
+    assert dead['paris']['A']['runs'] == 2
+    today = date.fromisoformat(dead['paris']['A']['last_attempt'])
+    assert is_dead_code(dead, 'paris', 'A', today)
+    assert not is_dead_code(dead, 'paris', 'A', today + timedelta(days=30))
+    assert not is_dead_code(dead, 'paris', 'C', today)
+
+
+def test_legacy_dead_code_list_is_rechecked():
+    assert not is_dead_code({'paris': ['A']}, 'paris', 'A')
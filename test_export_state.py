@@ -0,0 +1,108 @@
+import json
+import os
+
+import export_state
+from export_state import ExportState
+
+NON_REFUNDABLE = 'SANS REMISE - Non remboursable'
+FLEXIBLE = 'SANS REMISE - Annulation gratuite'
+
+
+def _entry(room, scraped_at, price, rate=NON_REFUNDABLE):
+    return {
+        'Hotel': 'Crowne Plaza Paris', 'Chaine': 'Crowne', 'Ville': 'paris', 'Pays': 'France', 'Chambre': room,
+        'Date_Arrivee': '2025-03-10', 'Date_Depart': '2025-03-11', 'Nombre_Nuits': 1,
+        'Date_Scraping': scraped_at, 'Entreprise_Cliente': None, 'Code_Corporate': None,
+        'Tarifs': {f"{rate} - EUR": f"{price},00 €"},
+    }
+
+
+def _write(path, entries, mtime):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({entry['Chambre']: entry for entry in entries}, f)
+    os.utime(path, (mtime, mtime))
+    return str(path)
+
+
+def _entries(state):
+    return sorted(state.iter_entries(), key=lambda entry: entry['Chambre'])
+
+
+def _assert_matches_rebuild(state, files, tmp_path):
+    rebuilt = ExportState(str(tmp_path / 'rebuilt.sqlite'))
+    try:
+        rebuilt.update(files, workers=1, full=True)
+        assert _entries(state) == _entries(rebuilt)
+        assert state.columns == rebuilt.columns
+    finally:
+        rebuilt.close()
+
+
+def _two_files(tmp_path):
+    older = _write(tmp_path / 'a.json', [_entry('k1', '2025-03-01 10:00:00', 100),
+                                         _entry('k2', '2025-03-01 10:00:00', 200)], 1_000_000)
+    newer = _write(tmp_path / 'b.json', [_entry('k1', '2025-03-02 10:00:00', 110),
+                                         _entry('k3', '2025-03-02 10:00:00', 300, FLEXIBLE)], 1_000_000)
+    state = ExportState(str(tmp_path / 'state.sqlite'))
+    state.update([older, newer], workers=1)
+    return state, older, newer
+
+
+def test_touched_file_is_not_reread(tmp_path):
+    state, older, newer = _two_files(tmp_path)
+    os.utime(newer, (2_000_000, 2_000_000))  # Date changée, contenu identique
+
+    assert state.update([older, newer], workers=1) == 0
+    assert state.connection.execute("SELECT mtime FROM files WHERE path = ?", (newer,)).fetchone()[0] == 2_000_000
+    _assert_matches_rebuild(state, [older, newer], tmp_path)
+    state.close()
+
+
+def test_changed_file_hands_key_back_to_older_candidate(tmp_path):
+    state, older, newer = _two_files(tmp_path)
+    assert {entry['Chambre']: entry['Date_Scraping'] for entry in state.iter_entries()}['k1'] == '2025-03-02 10:00:00'
+
+    # k1 disparaît du fichier qui le remportait : l'entrée de a.json doit revenir
+    _write(newer, [_entry('k3', '2025-03-03 10:00:00', 310, FLEXIBLE)], 2_000_000)
+    assert state.update([older, newer], workers=1) == 1
+    assert {entry['Chambre']: entry['Date_Scraping'] for entry in state.iter_entries()}['k1'] == '2025-03-01 10:00:00'
+    _assert_matches_rebuild(state, [older, newer], tmp_path)
+    state.close()
+
+
+def test_deleted_file_removes_its_entries_and_rate_columns(tmp_path):
+    state, older, newer = _two_files(tmp_path)
+    assert any(FLEXIBLE in column for column in state.rate_columns)
+
+    os.remove(newer)
+    state.update([older], workers=1)
+    assert [entry['Chambre'] for entry in _entries(state)] == ['k1', 'k2']
+    assert not any(FLEXIBLE in column for column in state.rate_columns)
+    _assert_matches_rebuild(state, [older], tmp_path)
+    state.close()
+
+
+def test_file_rewritten_during_read_is_retried(tmp_path, monkeypatch):
+    state, older, newer = _two_files(tmp_path)
+    _write(newer, [_entry('k3', '2025-03-03 10:00:00', 320, FLEXIBLE)], 2_000_000)
+
+    load_partial_map = export_state.load_partial_map
+
+    def load_while_saving(path):
+        partial = load_partial_map(path)
+        if path != newer:
+            return partial
+        # Le thread de sauvegarde réécrit le fichier pendant la lecture
+        _write(path, [_entry('k3', '2025-03-04 10:00:00', 330, FLEXIBLE),
+                      _entry('k4', '2025-03-04 10:00:00', 400)], 3_000_000)
+        return partial
+
+    monkeypatch.setattr(export_state, 'load_partial_map', load_while_saving)
+    state.update([older, newer], workers=1)
+    assert state.connection.execute("SELECT 1 FROM files WHERE path = ?", (newer,)).fetchone() is None
+
+    monkeypatch.setattr(export_state, 'load_partial_map', load_partial_map)
+    assert state.update([older, newer], workers=1) == 1
+    assert {entry['Chambre'] for entry in state.iter_entries()} == {'k1', 'k2', 'k3', 'k4'}
+    _assert_matches_rebuild(state, [older, newer], tmp_path)
+    state.close()
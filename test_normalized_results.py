@@ -0,0 +1,37 @@
+from normalized_results import iter_flat_entries, to_document
+from rate_buffer import rate_fields
+from rate_class import RateClass
+
+STAY = {'Hotel': 'Crowne Plaza Paris', 'Chambre': '1 lit King', 'Date_Arrivee': '2025-03-10',
+        'Date_Depart': '2025-03-11', 'Nombre_Nuits': 1}
+KEY = 'Crowne Plaza Paris|1 lit King|2025-03-10|2025-03-11|1'
+
+FLEXIBLE = RateClass(False, False, True, False)
+MEMBER = RateClass(False, True, True, False)
+CORPORATE = RateClass(True, False, True, False)
+
+
+def _entries(public_first):
+    public = dict(STAY, Entreprise_Cliente=None, Code_Corporate=None,
+                  Tarifs=[rate_fields(FLEXIBLE, 'EUR', 20000)])
+    # Le tarif membre n'a été vu que lors de la recherche corporate
+    corporate = dict(STAY, Entreprise_Cliente='Oracle', Code_Corporate='100183394',
+                     Tarifs=[rate_fields(FLEXIBLE, 'EUR', 20100), rate_fields(MEMBER, 'EUR', 19000),
+                             rate_fields(CORPORATE, 'EUR', 17000)])
+    items = [(KEY, public), (KEY + '|100183394', corporate)]
+    return dict(items if public_first else reversed(items))
+
+
+def test_public_entry_keeps_rates_seen_in_corporate_search():
+    for public_first in (True, False):
+        document = to_document(_entries(public_first))
+        rates = document['public'][KEY]['Tarifs']
+        assert [(rate['Membre'], rate['Prix_Centimes']) for rate in rates] == [(False, 20000), (True, 19000)]
+        assert document['public'][KEY]['Code_Corporate'] is None
+        assert [rate['Prix_Centimes'] for rate in document['corporate'][KEY + '|100183394']['Tarifs']] == [17000]
+
+
+def test_document_independent_of_entry_order():
+    first = to_document(_entries(True))
+    second = to_document(_entries(False))
+    assert dict(iter_flat_entries(first)) == dict(iter_flat_entries(second))
@@ -0,0 +1,24 @@
+from rate_class import RateClass
+
+
+def test_label_round_trip():
+    # Libellé -> classe -> code : chaque classe a un libellé distinct
+    labels = set()
+    for code in range(16):
+        label = RateClass.from_code(code).label
+        assert RateClass.from_label(label).code == code, label
+        labels.add(label)
+    assert len(labels) == 16
+
+
+def test_corporate_refundable():
+    refundable = RateClass.from_scrape(False, True, "Tarif entreprise - Annulation gratuite", False)
+    non_refundable = RateClass.from_scrape(False, True, "Tarif entreprise - Non remboursable", False)
+    assert refundable.refundable and not non_refundable.refundable
+    assert refundable.label != non_refundable.label
+
+
+def test_legacy_corporate_label():
+    # Anciens fichiers : le libellé corporate ne précisait pas l'annulation
+    assert RateClass.from_label("Tarif corporate (GOLD)") == RateClass(True, False, False, False)
+    assert RateClass.from_label("Tarif corporate (GOLD) avec petit déjeuner") == RateClass(True, False, False, True)
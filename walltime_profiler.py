@@ -0,0 +1,216 @@
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+
+from selenium.webdriver.support.wait import WebDriverWait
+
+from metrics import write_text
+
+# Catégories de temps mesurées ; le reste du temps d'un worker est du CPU Python (et divers)
+CATEGORIES = ('sleep', 'wait', 'webdriver', 'save_queue')
+CATEGORY_LABELS = {
+    'sleep': "Pauses fixes (time.sleep)",
+    'wait': "Attentes explicites (WebDriverWait)",
+    'webdriver': "Entrées/sorties WebDriver",
+    'save_queue': "Attente sauvegarde (file pleine, fin)",
+    'python': "CPU Python et divers",
+}
+
+
+class _ThreadStats:
+    __slots__ = ('wall', 'cpu', 'seconds', 'active')
+
+    def __init__(self):
+        self.wall = 0.0
+        self.cpu = 0.0
+        self.seconds = dict.fromkeys(CATEGORIES, 0.0)
+        self.active = None  # Catégorie en cours : les appels imbriqués lui sont attribués
+
+
+class WallTimeProfiler:
+    """Ventile le temps réel de chaque worker entre pauses, attentes, WebDriver, sauvegarde et CPU
+
+    `install()` remplace time.sleep et WebDriverWait.until/until_not le temps
+    du profilage ; seuls les threads entrés dans `track()` sont comptés. Un
+    appel imbriqué (pause de scrutation d'un WebDriverWait, commande WebDriver
+    d'une attente) revient à la catégorie englobante. Les pauses sont aussi
+    regroupées par ligne d'appel pour savoir lesquelles coûtent le plus.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._threads = {}  # nom du thread -> _ThreadStats
+        self._sleep_sites = {}  # (fichier, ligne, fonction) -> [appels, secondes]
+        self._originals = None
+
+    def install(self):
+        if self._originals is not None:
+            return self
+        self._originals = (time.sleep, WebDriverWait.until, WebDriverWait.until_not)
+        sleep, until, until_not = self._originals
+        profiler = self
+
+        def profiled_sleep(seconds):
+            caller = sys._getframe(1)
+            site = (os.path.basename(caller.f_code.co_filename), caller.f_lineno, caller.f_code.co_name)
+            profiler._timed('sleep', sleep, (seconds,), site)
+
+        def profiled_until(self, method, message=''):
+            return profiler._timed('wait', until, (self, method, message))
+
+        def profiled_until_not(self, method, message=''):
+            return profiler._timed('wait', until_not, (self, method, message))
+
+        time.sleep = profiled_sleep
+        WebDriverWait.until = profiled_until
+        WebDriverWait.until_not = profiled_until_not
+        return self
+
+    def uninstall(self):
+        if self._originals is not None:
+            time.sleep, WebDriverWait.until, WebDriverWait.until_not = self._originals
+            self._originals = None
+
+    def attach(self, driver):
+        """Compte les commandes WebDriver de ce driver dans la catégorie 'webdriver'"""
+        executor = driver.command_executor
+        execute = executor.execute
+
+        def profiled_execute(command, params):
+            return self._timed('webdriver', execute, (command, params))
+
+        executor.execute = profiled_execute
+        return driver
+
+    @contextmanager
+    def track(self):
+        """Compte le temps du thread courant pendant le bloc (à placer autour du corps d'un worker)"""
+        name = threading.current_thread().name
+        with self._lock:
+            stats = self._threads.get(name)
+            if stats is None:
+                stats = self._threads[name] = _ThreadStats()
+        self._local.stats = stats
+        wall_started, cpu_started = time.perf_counter(), time.thread_time()
+        try:
+            yield stats
+        finally:
+            stats.wall += time.perf_counter() - wall_started
+            stats.cpu += time.thread_time() - cpu_started
+            self._local.stats = None
+
+    def section(self, category):
+        """Bloc attribué à `category` (ex. 'save_queue' autour d'une attente du thread de sauvegarde)"""
+        return _Section(self, category)
+
+    def _timed(self, category, func, args, site=None):
+        stats = getattr(self._local, 'stats', None)
+        if stats is None or stats.active is not None:
+            return func(*args)
+        stats.active = category
+        start = time.perf_counter()
+        try:
+            return func(*args)
+        finally:
+            elapsed = time.perf_counter() - start
+            stats.active = None
+            stats.seconds[category] += elapsed
+            if site is not None:
+                with self._lock:
+                    calls = self._sleep_sites.setdefault(site, [0, 0.0])
+                    calls[0] += 1
+                    calls[1] += elapsed
+
+    def summary(self, top=20):
+        """Ventilation par worker et pour l'ensemble du run, et pauses les plus coûteuses"""
+        with self._lock:
+            threads = {name: (stats.wall, stats.cpu, dict(stats.seconds)) for name, stats in self._threads.items()}
+            sites = sorted(self._sleep_sites.items(), key=lambda item: -item[1][1])
+
+        def breakdown(wall, cpu, seconds):
+            seconds = dict(seconds, python=max(0.0, wall - sum(seconds.values())))
+            return {
+                'wall_seconds': round(wall, 3),
+                'thread_cpu_seconds': round(cpu, 3),
+                'seconds': {category: round(value, 3) for category, value in seconds.items()},
+                'percent': {category: round(100 * value / wall, 1) if wall else 0.0 for category, value in seconds.items()},
+            }
+
+        run_seconds = dict.fromkeys(CATEGORIES, 0.0)
+        for _, _, seconds in threads.values():
+            for category, value in seconds.items():
+                run_seconds[category] += value
+        return {
+            'run': breakdown(sum(wall for wall, _, _ in threads.values()),
+                             sum(cpu for _, cpu, _ in threads.values()), run_seconds),
+            'workers': {name: breakdown(*values) for name, values in sorted(threads.items())},
+            'sleep_sites': [
+                {'file': filename, 'line': line, 'function': function, 'calls': calls, 'seconds': round(seconds, 3)}
+                for (filename, line, function), (calls, seconds) in sites[:top]
+            ],
+        }
+
+    def report(self, top=20):
+        summary = self.summary(top)
+        run = summary['run']
+        lines = [f"Temps réel cumulé des workers : {run['wall_seconds']:.1f} s "
+                 f"(CPU du thread : {run['thread_cpu_seconds']:.1f} s)", ""]
+        for category, label in CATEGORY_LABELS.items():
+            lines.append(f"{label:<40}{run['seconds'][category]:>10.1f} s{run['percent'][category]:>7.1f} %")
+
+        lines += ["", f"{'Worker':<24}" + ''.join(f"{category:>12}" for category in CATEGORY_LABELS)]
+        for name, worker in summary['workers'].items():
+            lines.append(f"{name:<24}" + ''.join(f"{worker['percent'][category]:>11.1f}%" for category in CATEGORY_LABELS))
+
+        lines += ["", "Pauses les plus coûteuses", f"{'Appel':<48}{'Appels':>8}{'Total (s)':>12}"]
+        for site in summary['sleep_sites']:
+            where = f"{site['file']}:{site['line']} ({site['function']})"
+            lines.append(f"{where:<48}{site['calls']:>8}{site['seconds']:>12.1f}")
+        return '\n'.join(lines) + '\n'
+
+    def write_report(self, path_prefix, top=20):
+        """Écrit <préfixe>.txt (lisible) et <préfixe>.json"""
+        write_text(f"{path_prefix}.txt", self.report(top))
+        write_text(f"{path_prefix}.json", json.dumps(self.summary(top), indent=4, ensure_ascii=False))
+
+
+class _Section:
+    __slots__ = ('profiler', 'category', 'stats', 'start')
+
+    def __init__(self, profiler, category):
+        self.profiler = profiler
+        self.category = category
+
+    def __enter__(self):
+        stats = getattr(self.profiler._local, 'stats', None)
+        self.stats = stats if stats is not None and stats.active is None else None
+        if self.stats is not None:
+            self.stats.active = self.category
+            self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if self.stats is not None:
+            self.stats.active = None
+            self.stats.seconds[self.category] += time.perf_counter() - self.start
+        return False
+
+
+def wall_section(profiler, category):
+    """Section du profileur, ou bloc neutre si le profilage n'est pas activé"""
+    return profiler.section(category) if profiler is not None else nullcontext()
+
+
+def wall_track(profiler):
+    return profiler.track() if profiler is not None else nullcontext()
+
+
+def walltime_profiler_from_env():
+    """Profileur activé par SCRAPING_PROFILE_WALLTIME=1 (et installé), sinon None"""
+    if os.environ.get('SCRAPING_PROFILE_WALLTIME', '').lower() in ('1', 'true', 'yes'):
+        return WallTimeProfiler().install()
+    return None